@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+
+# file: benchmarks/bench_block_writer.py
+# 2026-10-19
+
+
+"""
+Measure the lines/second the transform stage writes to a pipe, for a
+range of BlockWriter block sizes.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python benchmarks/bench_block_writer.py
+
+A block size of 0 writes each line as it is made, as the stage did
+before it used a BlockWriter.
+"""
+import argparse
+import os
+import threading
+import time
+
+from src.transform.do_transform import Transform
+from tests.file_access_wrappers import FakeFileReadWrapper
+
+
+NIGHT_LINES = ['action: b, time: 23:00, hours: 8.00',
+               'action: w, time: 4:15, hours: 5.25',
+               'action: s, time: 5:00',
+               'action: w, time: 7:45, hours: 2.75']
+
+
+def make_input(weeks):
+    """
+    :return: extract stage output for weeks weeks of complete nights
+    """
+    lines = []
+    for week in range(weeks):
+        lines += ['', 'Week of Sunday, 2017-01-01:', '=' * 26]
+        for day in range(7):
+            lines.append('    2017-01-{:02d}'.format(day + 1))
+            lines += NIGHT_LINES
+    return '\n'.join(lines) + '\n'
+
+
+def drain(read_fd):
+    """Read and discard everything written to the pipe"""
+    while os.read(read_fd, 1 << 16):
+        pass
+
+
+def time_transform(text, block_size):
+    """
+    Run the transform stage over text, writing to a pipe.
+
+    :return: (output lines, seconds)
+    """
+    read_fd, write_fd = os.pipe()
+    drainer = threading.Thread(target=drain, args=(read_fd,))
+    drainer.start()
+    with open(write_fd, 'w') as outfile:
+        transform = Transform(FakeFileReadWrapper(text), outfile, block_size,
+                              False)
+        start = time.perf_counter()
+        transform.read_each_line()
+        elapsed = time.perf_counter() - start
+    drainer.join()
+    os.close(read_fd)
+    return text.count('action: b') + text.count('action: w'), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--weeks', type=int, default=20000,
+                        help='Weeks of input to generate')
+    parser.add_argument('-b', '--block-sizes', type=int, nargs='+',
+                        default=[0, 4096, 65536, 1 << 20])
+    args = parser.parse_args()
+    text = make_input(args.weeks)
+    for block_size in args.block_sizes:
+        lines, elapsed = time_transform(text, block_size)
+        print('block size {:>8}: {:>10,.0f} lines/second'.
+              format(block_size, lines / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+
+# file: benchmarks/bench_chart_parse.py
+# 2026-10-19
+
+
+"""
+Measure how fast Chart.read_file() parses chart input (the output of
+the extract stage) into Triples, in lines per second, over a chart
+input of several years.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python benchmarks/bench_chart_parse.py \\
+          [--years 10]
+"""
+import argparse
+from argparse import Namespace
+from datetime import date, timedelta
+import os
+import tempfile
+import time
+
+from src.chart.chart_new import Chart
+
+
+DAY_ACTIONS = ['action: w, time: 3:45, hours: 4.00',
+               'action: s, time: 4:45',
+               'action: w, time: 6:15, hours: 1.50',
+               'action: s, time: 11:30',
+               'action: w, time: 12:15, hours: 0.75',
+               'action: s, time: 16:45',
+               'action: w, time: 17:30, hours: 0.75',
+               'action: b, time: 23:45, hours: 4.00']
+
+
+def make_chart_input(years):
+    """
+    :return: the text of years years of chart input, a night of four
+             naps for each day
+    """
+    first_sunday = date(2016, 12, 4)
+    lines = []
+    for day_num in range(years * 365):
+        a_date = first_sunday + timedelta(days=day_num)
+        if a_date.weekday() == 6:
+            lines.extend(['', 'Week of Sunday, {}:'.format(a_date),
+                          '=' * 26])
+        lines.append('    {}'.format(a_date))
+        if not day_num:
+            lines.append('action: Y, time: 0:00')
+        lines.extend(DAY_ACTIONS)
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+    text = make_chart_input(args.years)
+    num_lines = text.count('\n')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chart_input = os.path.join(tmp_dir, 'chart_input.txt')
+        with open(chart_input, 'w') as outfile:
+            outfile.write(text)
+        best = None
+        for _ in range(3):
+            chart = Chart(Namespace(debug=False))
+            chart.infilename = chart_input
+            start = time.perf_counter()
+            triples = sum(1 for _ in chart.read_file())
+            secs = time.perf_counter() - start
+            best = secs if best is None else min(best, secs)
+    print('{} years, {} lines, {} Triples: {:.3f}s, {:,.0f} lines/s'.format(
+            args.years, num_lines, triples, best, num_lines / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+
+# file: benchmarks/bench_check_sheet.py
+# 2026-10-19
+
+
+"""
+Compare the time taken to read a sheet with run_it.py --check against
+the time taken by a full extract of the same sheet.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python benchmarks/bench_check_sheet.py
+"""
+import argparse
+import io
+import time
+from types import SimpleNamespace
+
+from check_sheet import SheetChecker
+from read_fns import Extract
+from tests.test_watch_sheet import HEADER, DAY, week_rows
+
+
+def make_sheet(weeks):
+    """
+    :return: the .csv text of weeks weeks of complete nights
+    """
+    text = [HEADER]
+    for _ in range(weeks):
+        text.append(week_rows('12/4/2016', [DAY] * 7))
+    return ''.join(text)
+
+
+def time_extract(text):
+    args = SimpleNamespace(store_in_db='True', print_chart='False',
+                           print_debug_chart='False')
+    extract = Extract(io.StringIO(text), args)
+    out_stream = io.StringIO()
+    extract._write_line = lambda line: out_stream.write(line + '\n')
+    start = time.perf_counter()
+    extract.lines_in_weeks_out()
+    return time.perf_counter() - start
+
+
+def time_check(text):
+    checker = SheetChecker(io.StringIO(text))
+    start = time.perf_counter()
+    checker.check()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-w', '--weeks', type=int, default=5000)
+    args = parser.parse_args()
+    sheet = make_sheet(args.weeks)
+    extract_secs = min(time_extract(sheet) for _ in range(3))
+    check_secs = min(time_check(sheet) for _ in range(3))
+    print('extract {:8.3f}s'.format(extract_secs))
+    print('check   {:8.3f}s   ({:.1f}x)'.format(check_secs,
+                                                extract_secs / check_secs))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+
+# file: benchmarks/bench_startup.py
+# 2026-10-19
+
+
+"""
+Report the cold start import time of each stage, as measured by
+python -X importtime.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python benchmarks/bench_startup.py
+"""
+import argparse
+import statistics
+
+from tests.test_startup import STAGE_MODULES, imported_modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--runs', type=int, default=5,
+                        help='Fresh interpreters to start for each stage')
+    args = parser.parse_args()
+    for module_name in STAGE_MODULES:
+        times = [imported_modules(module_name)[module_name]
+                 for _ in range(args.runs)]
+        print('{:<28} {:>8.1f} ms'.format(module_name,
+                                           statistics.median(times) / 1000))
+
+
+if __name__ == '__main__':
+    main()
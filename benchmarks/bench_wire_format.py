@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+
+# file: benchmarks/bench_wire_format.py
+# 2026-10-19
+
+
+"""
+Compare the bytes on the wire, and the time the receiver takes to make
+a LogRecord from each, of pickled and compact log records.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python benchmarks/bench_wire_format.py
+"""
+import logging
+import logging.handlers
+import pickle
+import timeit
+
+from src.logging.wire_format import CompactSocketHandler, decode_record
+
+
+def make_record():
+    return logging.LogRecord('root', logging.INFO, '/src/load/load.py', 889,
+                             'reload: %d inserted, %d updated, %d deleted',
+                             (12, 3, 0), None, func='update_db')
+
+
+if __name__ == '__main__':
+    record = make_record()
+    pickled = logging.handlers.SocketHandler('localhost', 0).makePickle(record)
+    compact = CompactSocketHandler('localhost', 0).makePickle(record)
+    number = 100000
+    for name, frame, make_record in (
+            ('pickle', pickled,
+             lambda data: logging.makeLogRecord(pickle.loads(data))),
+            ('compact', compact, decode_record)):
+        payload = frame[4:]
+        secs = min(timeit.repeat(lambda: make_record(payload), number=number,
+                                 repeat=3))
+        print('{:8} {:5d} bytes  {:6.2f} us/record'.format(
+                name, len(frame), secs / number * 1e6))
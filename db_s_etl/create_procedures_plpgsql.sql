@@ -3,61 +3,149 @@
 -- 2017-04-05
 
 
+CREATE OR REPLACE FUNCTION sl_subject_id(subject_name text) RETURNS integer AS $$
+-- The subject_id of the subject named subject_name, who is added to
+-- sl_subject if not there already.
+
+DECLARE
+    found_id integer;
+
+BEGIN
+    INSERT INTO sl_subject (name) VALUES (subject_name) ON CONFLICT (name) DO NOTHING;
+    SELECT subject_id INTO found_id FROM sl_subject WHERE name = subject_name;
+    RETURN found_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP FUNCTION IF EXISTS sl_insert_night(date, time without time zone, boolean,
+                                     boolean);
+
+DROP FUNCTION IF EXISTS sl_insert_night(date, time without time zone, boolean,
+                                     boolean, text);
+
+DROP FUNCTION IF EXISTS sl_insert_night(date, time without time zone, boolean,
+                                     boolean, text, integer);
+
 CREATE OR REPLACE FUNCTION sl_insert_night(new_start_date date,
     new_start_time time without time zone,
     new_start_no_data boolean,
-    new_end_no_data boolean) RETURNS text AS $$
-DECLARE
-  sl_night_row sl_night%ROWTYPE;
+    new_end_no_data boolean,
+    new_fingerprint text DEFAULT NULL,
+    new_subject_id integer DEFAULT 1,
+    OUT night_id_out integer,
+    OUT mesg text) AS $$
 
 BEGIN
-    SELECT * INTO sl_night_row FROM sl_night WHERE start_date = new_start_date AND
-                                                   start_time = new_start_time AND
-                                                   start_no_data = new_start_no_data AND
-                                                   end_no_data = new_end_no_data;
+    SELECT night_id INTO night_id_out FROM sl_night WHERE start_date = new_start_date AND
+                                                          start_time = new_start_time AND
+                                                          start_no_data = new_start_no_data AND
+                                                          end_no_data = new_end_no_data AND
+                                                          subject_id = new_subject_id;
     IF FOUND THEN
-        RETURN 'sl_insert_night() failed: row already in table';
+        mesg := 'sl_insert_night() failed: row already in table';
+        RETURN;
     END IF;
 
-    INSERT INTO sl_night (night_id, start_date, start_time, start_no_data, end_no_data)
+    INSERT INTO sl_night (night_id, start_date, start_time, start_no_data, end_no_data,
+                          fingerprint, subject_id)
     values (nextval('sl_night_night_id_seq'), new_start_date, new_start_time, new_start_no_data,
-            new_end_no_data);
-    RETURN 'sl_insert_night() succeeded';
+            new_end_no_data, new_fingerprint, new_subject_id)
+    RETURNING night_id INTO night_id_out;
+    mesg := 'sl_insert_night() succeeded';
 
     EXCEPTION
         WHEN OTHERS THEN
-            RETURN 'error inserting night into db';
+            night_id_out := NULL;
+            mesg := 'error inserting night into db: SQLSTATE ' || SQLSTATE;
 END;
 $$ LANGUAGE plpgsql;
 
 
+DROP FUNCTION IF EXISTS sl_insert_nap(time without time zone, interval hour to minute,
+                                   integer);
+
+DROP FUNCTION IF EXISTS sl_insert_nap(time without time zone, interval hour to minute,
+                                   integer, tsrange);
+
 CREATE OR REPLACE FUNCTION sl_insert_nap(new_start_time time without time zone,
                                          new_duration interval hour to minute,
-                                         new_night_id integer)
+                                         new_night_id integer,
+                                         new_sleep_period tsrange DEFAULT NULL,
+                                         new_night_start_date date DEFAULT NULL)
                                          RETURNS text AS $$
 
 DECLARE
     sl_nap_row sl_nap%ROWTYPE;
-    fk_night_id INTEGER;
+    fk_night_start_date date := new_night_start_date;
 
 BEGIN
+    -- the night's start date routes the nap to the right partition
+    IF fk_night_start_date IS NULL THEN
+        SELECT start_date INTO fk_night_start_date FROM sl_night WHERE night_id = new_night_id;
+    END IF;
+
     SELECT * INTO sl_nap_row FROM sl_nap WHERE start_time = new_start_time AND
                                                duration = new_duration AND
-                                               night_id = new_night_id;
+                                               night_id = new_night_id AND
+                                               night_start_date = fk_night_start_date;
 
     IF FOUND THEN
         RETURN 'sl_insert_nap() failed: row already in table';
     END IF;
 
-    SELECT currval('sl_night_night_id_seq') INTO fk_night_id;
-
-    INSERT INTO sl_nap (nap_id, start_time, duration, night_id)
-    VALUES (nextval('sl_nap_nap_id_seq'), new_start_time, new_duration, fk_night_id);
+    INSERT INTO sl_nap (nap_id, start_time, duration, night_id, night_start_date,
+                        sleep_period)
+    VALUES (nextval('sl_nap_nap_id_seq'), new_start_time, new_duration, new_night_id,
+            fk_night_start_date, new_sleep_period);
     RETURN 'sl_insert_nap() succeeded';
 
     EXCEPTION
         WHEN OTHERS THEN
-            RETURN 'error inserting nap into db';
+            RETURN 'error inserting nap into db: SQLSTATE ' || SQLSTATE;
+
+END;
+$$ LANGUAGE plpgsql;
 
+
+CREATE OR REPLACE FUNCTION sl_create_year_partitions(part_year integer) RETURNS text AS $$
+-- Add the sl_night and sl_nap partitions for a year, if they are missing.
+-- The advisory lock keeps concurrent loads from racing to create the same
+-- partitions; it is taken only while they are still missing. Creating a
+-- partition locks sl_night and sl_nap until the end of the transaction, so
+-- the loader calls this in a short transaction of its own, never in the
+-- one that stores the year's nights.
+
+BEGIN
+    IF to_regclass(format('sl_nap_%s', part_year)) IS NOT NULL THEN
+        RETURN 'sl_create_year_partitions(): partitions already exist';
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('sl_create_year_partitions'), part_year);
+    EXECUTE format('CREATE TABLE IF NOT EXISTS sl_night_%s PARTITION OF sl_night '
+                   'FOR VALUES FROM (%L) TO (%L)',
+                   part_year, make_date(part_year, 1, 1), make_date(part_year + 1, 1, 1));
+    EXECUTE format('CREATE TABLE IF NOT EXISTS sl_nap_%s PARTITION OF sl_nap '
+                   'FOR VALUES FROM (%L) TO (%L)',
+                   part_year, make_date(part_year, 1, 1), make_date(part_year + 1, 1, 1));
+    RETURN 'sl_create_year_partitions() succeeded';
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION sl_detach_year_partitions(part_year integer) RETURNS text AS $$
+-- Detach a year's sl_night and sl_nap partitions, which are left in
+-- place as the stand-alone tables sl_night_<year> and sl_nap_<year>.
+-- The year's sl_night_summary rows, which can be rebuilt by reloading
+-- the year, are deleted.
+
+BEGIN
+    DELETE FROM sl_night_summary
+    WHERE start_date >= make_date(part_year, 1, 1) AND start_date < make_date(part_year + 1, 1, 1);
+    EXECUTE format('ALTER TABLE sl_nap DETACH PARTITION sl_nap_%s', part_year);
+    EXECUTE format('ALTER TABLE sl_nap_%s DROP CONSTRAINT IF EXISTS sl_nap_night_fk',
+                   part_year);
+    EXECUTE format('ALTER TABLE sl_night DETACH PARTITION sl_night_%s', part_year);
+    RETURN 'sl_detach_year_partitions() succeeded';
 END;
 $$ LANGUAGE plpgsql;
@@ -2,26 +2,95 @@
 -- andrew jarcho
 -- 2017-02-16
 
+-- sl_night and sl_nap are partitioned by year; the loader adds a year's
+-- partitions, through sl_create_year_partitions(), before storing
+-- nights in that year.
+
+DROP TABLE IF EXISTS sl_subject CASCADE;
+
+-- the people whose sleep is tracked, each in a sheet of their own
+CREATE TABLE sl_subject (
+    subject_id SERIAL PRIMARY KEY,
+    name text NOT NULL UNIQUE
+);
+
+-- subject 1 owns the nights of every load that names no subject
+INSERT INTO sl_subject (name) VALUES ('default');
+
+
 DROP TABLE IF EXISTS sl_night CASCADE;
 
 CREATE TABLE sl_night (
-    night_id SERIAL UNIQUE,
+    night_id SERIAL,
     start_date date NOT NULL,
     start_time time NOT NULL,
     start_no_data boolean,
     end_no_data boolean,
-    PRIMARY KEY (night_id),
+    fingerprint text,  -- identifies a night's content; see load.night_fingerprint()
+    subject_id integer NOT NULL DEFAULT 1 REFERENCES sl_subject (subject_id),
+    PRIMARY KEY (night_id, start_date),
     CHECK (start_no_data IS FALSE OR end_no_data IS FALSE)
-);
+) PARTITION BY RANGE (start_date);
+
+CREATE INDEX sl_night_start_date_idx ON sl_night (start_date);
+
+-- keeps one subject's nights together, so a query for one person reads
+-- only their rows however many subjects there are; like every index on
+-- a partitioned table, it is created on each year's partition
+CREATE INDEX sl_night_subject_start_date_idx ON sl_night (subject_id, start_date);
 
 
 DROP TABLE IF EXISTS sl_nap;
 
 CREATE TABLE sl_nap (
-    nap_id SERIAL UNIQUE, 
+    nap_id SERIAL,
     start_time time NOT NULL,
     duration interval hour to minute NOT NULL,
     night_id integer NOT NULL,
-    PRIMARY KEY (nap_id),
-    FOREIGN KEY (night_id) REFERENCES sl_night (night_id)
+    night_start_date date NOT NULL,  -- the partition key: sl_night.start_date
+    sleep_period tsrange,  -- start_time and duration, placed on the calendar
+    PRIMARY KEY (nap_id, night_start_date),
+    CONSTRAINT sl_nap_night_fk FOREIGN KEY (night_id, night_start_date)
+        REFERENCES sl_night (night_id, start_date)
+) PARTITION BY RANGE (night_start_date);
+
+CREATE INDEX sl_nap_night_id_idx ON sl_nap (night_id);
+
+-- lets queries for the sleep overlapping any window use an index scan
+CREATE INDEX sl_nap_sleep_period_idx ON sl_nap USING gist (sleep_period);
+
+
+DROP TABLE IF EXISTS sl_night_summary;
+
+-- one row per night, written by the loader along with the night's naps
+CREATE TABLE sl_night_summary (
+    night_id integer NOT NULL,
+    start_date date NOT NULL,
+    start_time time NOT NULL,
+    total_sleep interval hour to minute NOT NULL,
+    first_sleep_start time,
+    first_sleep_duration interval hour to minute,
+    nap_count integer NOT NULL,
+    subject_id integer NOT NULL DEFAULT 1 REFERENCES sl_subject (subject_id),
+    PRIMARY KEY (night_id),
+    FOREIGN KEY (night_id, start_date) REFERENCES sl_night (night_id, start_date)
+);
+
+CREATE INDEX sl_night_summary_start_date_idx ON sl_night_summary (start_date);
+
+CREATE INDEX sl_night_summary_subject_start_date_idx
+    ON sl_night_summary (subject_id, start_date);
+
+
+DROP TABLE IF EXISTS sl_load_checkpoint;
+
+-- how far a load has got: the loader commits a batch of nights, and
+-- updates this row, in a single transaction; load.py --resume restarts
+-- just after it
+CREATE TABLE sl_load_checkpoint (
+    source text PRIMARY KEY,  -- the input file name, '-' for stdin, after
+                              -- '<subject_id>:' for a named subject
+    last_date date,  -- the start date of the last night committed
+    nights_done integer NOT NULL,  -- the nights read from the input so far
+    updated_at timestamp NOT NULL DEFAULT now()
 );
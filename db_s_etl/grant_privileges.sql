@@ -2,6 +2,11 @@
 -- andrew jarcho
 -- 2017-04-06
 
-GRANT SELECT, UPDATE, INSERT, DELETE ON sl_nap, sl_night TO sp_etl;
+GRANT SELECT, UPDATE, INSERT, DELETE ON sl_nap, sl_night, sl_night_summary,
+    sl_load_checkpoint, sl_subject TO sp_etl;
 GRANT USAGE ON sl_night_night_id_seq TO sp_etl;
+GRANT USAGE ON sl_subject_subject_id_seq TO sp_etl;
 GRANT USAGE ON sl_nap_nap_id_seq TO sp_etl;
+-- sl_create_year_partitions() adds tables, so the loader's role must be able to
+-- create them (and must own sl_night and sl_nap) in this schema
+GRANT CREATE ON SCHEMA public TO sp_etl;
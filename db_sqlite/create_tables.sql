@@ -0,0 +1,71 @@
+-- file: db_sqlite/create_tables.sql
+-- 2026-10-19
+
+-- The tables of the sleep db, for SQLite: see src/load/sqlite_store.py,
+-- which runs this file each time it opens a db, so every statement here
+-- must be safe to run again.
+--
+-- SQLite has no date, time, interval, or range types. Dates and times are
+-- stored as ISO 8601 text ('2016-12-07', '23:45', '2016-12-08 03:45'),
+-- which sorts and compares as the dates and times do; durations as whole
+-- minutes; and booleans as 0 or 1. Nothing is partitioned.
+
+
+CREATE TABLE IF NOT EXISTS sl_subject (
+    subject_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+-- subject 1 owns the nights of every load that names no subject
+INSERT OR IGNORE INTO sl_subject (subject_id, name) VALUES (1, 'default');
+
+
+CREATE TABLE IF NOT EXISTS sl_night (
+    night_id INTEGER PRIMARY KEY,
+    start_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    start_no_data INTEGER,
+    end_no_data INTEGER,
+    fingerprint TEXT,  -- identifies a night's content; see load.night_fingerprint()
+    subject_id INTEGER NOT NULL DEFAULT 1 REFERENCES sl_subject (subject_id),
+    CHECK (start_no_data = 0 OR end_no_data = 0)
+);
+
+-- the columns sl_insert_night() matches on to find a night already stored
+CREATE UNIQUE INDEX IF NOT EXISTS sl_night_subject_start_idx
+    ON sl_night (subject_id, start_date, start_time, start_no_data, end_no_data);
+
+CREATE INDEX IF NOT EXISTS sl_night_start_date_idx ON sl_night (start_date);
+
+
+CREATE TABLE IF NOT EXISTS sl_nap (
+    nap_id INTEGER PRIMARY KEY,
+    start_time TEXT NOT NULL,
+    duration INTEGER NOT NULL,  -- minutes
+    night_id INTEGER NOT NULL REFERENCES sl_night (night_id),
+    night_start_date TEXT NOT NULL,
+    sleep_start TEXT,  -- start_time and duration, placed on the calendar,
+    sleep_end TEXT     -- as sleep_period is in PostgreSQL
+);
+
+-- the columns sl_insert_nap() matches on to find a nap already stored
+CREATE UNIQUE INDEX IF NOT EXISTS sl_nap_night_start_idx
+    ON sl_nap (night_id, start_time, duration);
+
+CREATE INDEX IF NOT EXISTS sl_nap_sleep_start_idx ON sl_nap (sleep_start);
+
+
+-- one row per night, written by the loader along with the night's naps
+CREATE TABLE IF NOT EXISTS sl_night_summary (
+    night_id INTEGER PRIMARY KEY REFERENCES sl_night (night_id),
+    start_date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    total_sleep INTEGER NOT NULL,  -- minutes
+    first_sleep_start TEXT,
+    first_sleep_duration INTEGER,  -- minutes
+    nap_count INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL DEFAULT 1 REFERENCES sl_subject (subject_id)
+);
+
+CREATE INDEX IF NOT EXISTS sl_night_summary_subject_start_date_idx
+    ON sl_night_summary (subject_id, start_date);
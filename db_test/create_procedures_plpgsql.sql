@@ -3,41 +3,129 @@
 -- 2017-04-05
 
 
+CREATE OR REPLACE FUNCTION slt_subject_id(subject_name text) RETURNS integer AS $$
+-- The subject_id of the subject named subject_name, who is added to
+-- slt_subject if not there already.
+
+DECLARE
+    found_id integer;
+
+BEGIN
+    INSERT INTO slt_subject (name) VALUES (subject_name) ON CONFLICT (name) DO NOTHING;
+    SELECT subject_id INTO found_id FROM slt_subject WHERE name = subject_name;
+    RETURN found_id;
+END;
+$$ LANGUAGE plpgsql;
+
+
+DROP FUNCTION IF EXISTS slt_insert_night(date, time without time zone, boolean,
+                                      boolean);
+
+DROP FUNCTION IF EXISTS slt_insert_night(date, time without time zone, boolean,
+                                      boolean, text);
+
+DROP FUNCTION IF EXISTS slt_insert_night(date, time without time zone, boolean,
+                                      boolean, text, integer);
+
 CREATE OR REPLACE FUNCTION slt_insert_night(new_start_date date,
     new_start_time time without time zone,
     new_start_no_data boolean,
-    new_end_no_data boolean) RETURNS text AS $$
+    new_end_no_data boolean,
+    new_fingerprint text DEFAULT NULL,
+    new_subject_id integer DEFAULT 1,
+    OUT night_id_out integer,
+    OUT mesg text) AS $$
 
 BEGIN
-    INSERT INTO slt_night (night_id, start_date, start_time, start_no_data, end_no_data)
+    INSERT INTO slt_night (night_id, start_date, start_time, start_no_data, end_no_data,
+                          fingerprint, subject_id)
     values (nextval('slt_night_night_id_seq'), new_start_date, new_start_time, new_start_no_data,
-            new_end_no_data);
-    RETURN 'slt_insert_night() succeeded';
+            new_end_no_data, new_fingerprint, new_subject_id)
+    RETURNING night_id INTO night_id_out;
+    mesg := 'slt_insert_night() succeeded';
 
     EXCEPTION
         WHEN OTHERS THEN
-            RETURN 'error inserting night into db';
+            night_id_out := NULL;
+            mesg := 'error inserting night into db: SQLSTATE ' || SQLSTATE;
 END;
 $$ LANGUAGE plpgsql;
 
 
+DROP FUNCTION IF EXISTS slt_insert_nap(time without time zone,
+                                    interval hour to minute);
+
+DROP FUNCTION IF EXISTS slt_insert_nap(time without time zone, interval hour to minute,
+                                    integer);
+
+DROP FUNCTION IF EXISTS slt_insert_nap(time without time zone, interval hour to minute,
+                                    integer, tsrange);
+
 CREATE OR REPLACE FUNCTION slt_insert_nap(new_start_time time without time zone,
-                                         new_duration interval hour to minute)
+                                         new_duration interval hour to minute,
+                                         new_night_id integer,
+                                         new_sleep_period tsrange DEFAULT NULL,
+                                         new_night_start_date date DEFAULT NULL)
                                          RETURNS text AS $$
 
 DECLARE
-    fk_night_id INTEGER;
+    fk_night_start_date date := new_night_start_date;
 
 BEGIN
-    SELECT currval('slt_night_night_id_seq') INTO fk_night_id;
+    -- the night's start date routes the nap to the right partition
+    IF fk_night_start_date IS NULL THEN
+        SELECT start_date INTO fk_night_start_date FROM slt_night WHERE night_id = new_night_id;
+    END IF;
 
-    INSERT INTO slt_nap (nap_id, start_time, duration, night_id)
-    VALUES (nextval('slt_nap_nap_id_seq'), new_start_time, new_duration, fk_night_id);
+    INSERT INTO slt_nap (nap_id, start_time, duration, night_id, night_start_date,
+                        sleep_period)
+    VALUES (nextval('slt_nap_nap_id_seq'), new_start_time, new_duration, new_night_id,
+            fk_night_start_date, new_sleep_period);
     RETURN 'slt_insert_nap() succeeded';
 
     EXCEPTION
         WHEN OTHERS THEN
-            RETURN 'error inserting nap into db';
+            RETURN 'error inserting nap into db: SQLSTATE ' || SQLSTATE;
 
 END;
 $$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION slt_create_year_partitions(part_year integer) RETURNS text AS $$
+-- Add the slt_night and slt_nap partitions for a year, if they are missing.
+-- The advisory lock keeps concurrent loads from racing to create the same
+-- partitions; it is taken only while they are still missing.
+
+BEGIN
+    IF to_regclass(format('slt_nap_%s', part_year)) IS NOT NULL THEN
+        RETURN 'slt_create_year_partitions(): partitions already exist';
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(hashtext('slt_create_year_partitions'), part_year);
+    EXECUTE format('CREATE TABLE IF NOT EXISTS slt_night_%s PARTITION OF slt_night '
+                   'FOR VALUES FROM (%L) TO (%L)',
+                   part_year, make_date(part_year, 1, 1), make_date(part_year + 1, 1, 1));
+    EXECUTE format('CREATE TABLE IF NOT EXISTS slt_nap_%s PARTITION OF slt_nap '
+                   'FOR VALUES FROM (%L) TO (%L)',
+                   part_year, make_date(part_year, 1, 1), make_date(part_year + 1, 1, 1));
+    RETURN 'slt_create_year_partitions() succeeded';
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION slt_detach_year_partitions(part_year integer) RETURNS text AS $$
+-- Detach a year's slt_night and slt_nap partitions, which are left in
+-- place as the stand-alone tables slt_night_<year> and slt_nap_<year>.
+-- The year's slt_night_summary rows, which can be rebuilt by reloading
+-- the year, are deleted.
+
+BEGIN
+    DELETE FROM slt_night_summary
+    WHERE start_date >= make_date(part_year, 1, 1) AND start_date < make_date(part_year + 1, 1, 1);
+    EXECUTE format('ALTER TABLE slt_nap DETACH PARTITION slt_nap_%s', part_year);
+    EXECUTE format('ALTER TABLE slt_nap_%s DROP CONSTRAINT IF EXISTS slt_nap_night_fk',
+                   part_year);
+    EXECUTE format('ALTER TABLE slt_night DETACH PARTITION slt_night_%s', part_year);
+    RETURN 'slt_detach_year_partitions() succeeded';
+END;
+$$ LANGUAGE plpgsql;
@@ -2,23 +2,95 @@
 -- andrew jarcho
 -- 2017-08-12
 
+-- slt_night and slt_nap are partitioned by year; the loader adds a year's
+-- partitions, through slt_create_year_partitions(), before storing
+-- nights in that year.
+
+DROP TABLE IF EXISTS slt_subject CASCADE;
+
+-- the people whose sleep is tracked, each in a sheet of their own
+CREATE TABLE slt_subject (
+    subject_id SERIAL PRIMARY KEY,
+    name text NOT NULL UNIQUE
+);
+
+-- subject 1 owns the nights of every load that names no subject
+INSERT INTO slt_subject (name) VALUES ('default');
+
+
 DROP TABLE IF EXISTS slt_night CASCADE;
 
 CREATE TABLE slt_night (
-    night_id SERIAL UNIQUE,
+    night_id SERIAL,
     start_date date NOT NULL,
     start_time time NOT NULL,
-    PRIMARY KEY (night_id)
-);
+    start_no_data boolean,
+    end_no_data boolean,
+    fingerprint text,  -- identifies a night's content; see load.night_fingerprint()
+    subject_id integer NOT NULL DEFAULT 1 REFERENCES slt_subject (subject_id),
+    PRIMARY KEY (night_id, start_date),
+    CHECK (start_no_data IS FALSE OR end_no_data IS FALSE)
+) PARTITION BY RANGE (start_date);
+
+CREATE INDEX slt_night_start_date_idx ON slt_night (start_date);
+
+-- keeps one subject's nights together, so a query for one person reads
+-- only their rows however many subjects there are; like every index on
+-- a partitioned table, it is created on each year's partition
+CREATE INDEX slt_night_subject_start_date_idx ON slt_night (subject_id, start_date);
 
 
 DROP TABLE IF EXISTS slt_nap;
 
 CREATE TABLE slt_nap (
-    nap_id SERIAL UNIQUE, 
+    nap_id SERIAL,
     start_time time NOT NULL,
     duration interval NOT NULL,
     night_id integer NOT NULL,
-    PRIMARY KEY (nap_id),
-    FOREIGN KEY (night_id) REFERENCES slt_night (night_id)
+    night_start_date date NOT NULL,  -- the partition key: slt_night.start_date
+    sleep_period tsrange,  -- start_time and duration, placed on the calendar
+    PRIMARY KEY (nap_id, night_start_date),
+    CONSTRAINT slt_nap_night_fk FOREIGN KEY (night_id, night_start_date)
+        REFERENCES slt_night (night_id, start_date)
+) PARTITION BY RANGE (night_start_date);
+
+CREATE INDEX slt_nap_night_id_idx ON slt_nap (night_id);
+
+-- lets queries for the sleep overlapping any window use an index scan
+CREATE INDEX slt_nap_sleep_period_idx ON slt_nap USING gist (sleep_period);
+
+
+DROP TABLE IF EXISTS slt_night_summary;
+
+-- one row per night, written by the loader along with the night's naps
+CREATE TABLE slt_night_summary (
+    night_id integer NOT NULL,
+    start_date date NOT NULL,
+    start_time time NOT NULL,
+    total_sleep interval hour to minute NOT NULL,
+    first_sleep_start time,
+    first_sleep_duration interval hour to minute,
+    nap_count integer NOT NULL,
+    subject_id integer NOT NULL DEFAULT 1 REFERENCES slt_subject (subject_id),
+    PRIMARY KEY (night_id),
+    FOREIGN KEY (night_id, start_date) REFERENCES slt_night (night_id, start_date)
+);
+
+CREATE INDEX slt_night_summary_start_date_idx ON slt_night_summary (start_date);
+
+CREATE INDEX slt_night_summary_subject_start_date_idx
+    ON slt_night_summary (subject_id, start_date);
+
+
+DROP TABLE IF EXISTS slt_load_checkpoint;
+
+-- how far a load has got: the loader commits a batch of nights, and
+-- updates this row, in a single transaction; load.py --resume restarts
+-- just after it
+CREATE TABLE slt_load_checkpoint (
+    source text PRIMARY KEY,  -- the input file name, '-' for stdin, after
+                              -- '<subject_id>:' for a named subject
+    last_date date,  -- the start date of the last night committed
+    nights_done integer NOT NULL,  -- the nights read from the input so far
+    updated_at timestamp NOT NULL DEFAULT now()
 );
@@ -2,9 +2,14 @@
 -- andrew jarcho
 -- 2017-04-06
 
-GRANT SELECT, UPDATE, INSERT, DELETE ON slt_nap, slt_night TO sp_etl;
+GRANT SELECT, UPDATE, INSERT, DELETE ON slt_nap, slt_night, slt_night_summary,
+    slt_load_checkpoint, slt_subject TO sp_etl;
 GRANT USAGE ON slt_night_night_id_seq TO sp_etl;
+GRANT USAGE ON slt_subject_subject_id_seq TO sp_etl;
 GRANT USAGE ON slt_nap_nap_id_seq TO sp_etl;
+-- slt_create_year_partitions() adds tables, so the loader's role must be able to
+-- create them (and must own slt_night and slt_nap) in this schema
+GRANT CREATE ON SCHEMA public TO sp_etl;
 -- GRANT SELECT ON ALL TABLES IN SCHEMA public TO sp_etl;
 
 -- GRANT SELECT, UPDATE, INSERT, DELETE ON slt_nap, slt_night TO andy;
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+
+# file: src/analytics/export.py
+# 2026-10-19
+
+
+"""
+Export nights and naps to columnar files, for analysis tools (pandas,
+polars, DuckDB, R's arrow) to read with typed columns and no parsing.
+
+The nights and naps are read from the output of the transform stage, or
+from the db, and written to two files in the output directory:
+
+    nights.<ext>    night_id       int32
+                    start_date     date32
+                    start_time     time32[s]
+                    start_no_data  bool
+                    end_no_data    bool
+                    total_sleep    duration[s]
+                    nap_count      int16
+
+    naps.<ext>      night_id       int32
+                    start_time     time32[s]
+                    duration       duration[s]
+                    sleep_start    timestamp[s]
+                    sleep_end      timestamp[s]
+
+where <ext> is 'parquet' or 'arrow' (the Arrow IPC file format). A nap's
+sleep_start and sleep_end place it on the calendar, as
+sleep_index.night_periods() does. Nights read from the db keep their
+db night_id; nights read from transform output are numbered from 1.
+
+The columns are built up in lists, and written out as a row group (an
+Arrow record batch) each row_group_size nights, so a history of any
+length is exported in bounded memory.
+
+Writing the files needs the pyarrow package, which is not otherwise
+required.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python src/analytics/export.py \\
+          <out_dir> [infile_name] [--format arrow] [--from-db]
+"""
+import argparse
+from datetime import date, datetime, timedelta
+import fileinput
+import itertools
+import os
+import sys
+
+from src.analytics.sleep_index import night_periods, parse_time
+
+
+ROW_GROUP_SIZE = 10000  # nights written at a time
+FILE_FORMATS = ('parquet', 'arrow')
+
+NIGHT_COLUMNS = ('night_id', 'start_date', 'start_time', 'start_no_data',
+                 'end_no_data', 'total_sleep', 'nap_count')
+NAP_COLUMNS = ('night_id', 'start_time', 'duration', 'sleep_start',
+               'sleep_end')
+
+
+def import_pyarrow():
+    """
+    :return: the pyarrow module
+    :raise ImportError: with a hint to install pyarrow, if it is missing
+    Called by: ColumnarWriter.__init__()
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Exporting nights and naps needs the pyarrow '
+                          'package (pip install pyarrow)') from None
+    return pyarrow
+
+
+def schemas(pa):
+    """
+    :param pa: the pyarrow module
+    :return: the (nights, naps) schemas
+    Called by: ColumnarWriter.__init__()
+    """
+    night_types = (pa.int32(), pa.date32(), pa.time32('s'), pa.bool_(),
+                   pa.bool_(), pa.duration('s'), pa.int16())
+    nap_types = (pa.int32(), pa.time32('s'), pa.duration('s'),
+                 pa.timestamp('s'), pa.timestamp('s'))
+    return (pa.schema(list(zip(NIGHT_COLUMNS, night_types))),
+            pa.schema(list(zip(NAP_COLUMNS, nap_types))))
+
+
+def decimal_to_timedelta(dec_str):
+    """
+    '04.75' => timedelta(hours=4, minutes=45)
+
+    The decimal part is a number of quarter hours, as in
+    load.decimal_to_interval().
+    """
+    hrs, dec_hrs = dec_str.split('.')
+    return timedelta(hours=int(hrs), minutes=int(dec_hrs) * 3 // 5)
+
+
+def nights_from_transform_output(lines):
+    """
+    Read nights from transform output: 'NIGHT, date, time, start_no_data,
+    end_no_data' lines, each followed by its 'NAP, time, duration' lines.
+
+    :yield: (night_id, start_date, start_time, start_no_data,
+             end_no_data, naps), where naps is a list of
+             (start time, duration) pairs
+    Called by: export()
+    """
+    night = None
+    night_id = 0
+    for line in lines:
+        line_list = line.rstrip().split(', ')
+        if line_list[0] == 'NIGHT':
+            if night:
+                yield night
+            night_id += 1
+            night = (night_id, date.fromisoformat(line_list[1]),
+                     parse_time(line_list[2]), line_list[3] == 'true',
+                     line_list[4] == 'true', [])
+        elif line_list[0] == 'NAP' and night:
+            night[5].append((parse_time(line_list[1]),
+                             decimal_to_timedelta(line_list[2])))
+        elif line_list[0] not in ('NIGHT', 'NAP') and line.strip():
+            break  # as load.read_nights() does
+    if night:
+        yield night
+
+
+def nights_from_db(connection, subject_id=None):
+    """
+    Read nights from sl_night and sl_nap, in date order, streaming the
+    rows rather than fetching them all at once.
+
+    :param subject_id: read only this subject's nights, or, if None,
+                       every subject's
+    :yield: as nights_from_transform_output()
+    Called by: export()
+    """
+    from sqlalchemy import text
+
+    where = 'WHERE sl_night.subject_id = :subject_id ' if subject_id else ''
+    result = connection.execution_options(stream_results=True).execute(text(
+        'SELECT sl_night.night_id, sl_night.start_date, '
+        'sl_night.start_time, sl_night.start_no_data, sl_night.end_no_data, '
+        'sl_nap.start_time AS nap_start, sl_nap.duration '
+        'FROM sl_night LEFT JOIN sl_nap '
+        'ON sl_nap.night_id = sl_night.night_id '
+        'AND sl_nap.night_start_date = sl_night.start_date ' + where +
+        'ORDER BY sl_night.start_date, sl_night.start_time, '
+        'sl_night.night_id, sl_nap.nap_id'), subject_id=subject_id)
+    for night_id, rows in itertools.groupby(result,
+                                            key=lambda row: row['night_id']):
+        rows = list(rows)
+        first = rows[0]
+        yield (night_id, first['start_date'], first['start_time'],
+               first['start_no_data'], first['end_no_data'],
+               [(row['nap_start'], row['duration']) for row in rows
+                if row['nap_start'] is not None])
+
+
+class ColumnBuffer:
+    """
+    The nights and naps of a row group, held as one list per column.
+    """
+    def __init__(self):
+        self.nights = {column: [] for column in NIGHT_COLUMNS}
+        self.naps = {column: [] for column in NAP_COLUMNS}
+        self.num_nights = 0
+
+    def add_night(self, night):
+        """
+        :param night: as yielded by nights_from_transform_output()
+        Called by: ColumnarWriter.write_nights()
+        """
+        night_id, start_date, start_time, start_no_data, end_no_data, naps = \
+            night
+        nights = self.nights
+        nights['night_id'].append(night_id)
+        nights['start_date'].append(start_date)
+        nights['start_time'].append(start_time)
+        nights['start_no_data'].append(start_no_data)
+        nights['end_no_data'].append(end_no_data)
+        nights['total_sleep'].append(sum((duration for _, duration in naps),
+                                         timedelta()))
+        nights['nap_count'].append(len(naps))
+        periods = night_periods(datetime.combine(start_date, start_time),
+                                naps)
+        for (nap_start, duration), (sleep_start, sleep_end) in zip(naps,
+                                                                   periods):
+            self.naps['night_id'].append(night_id)
+            self.naps['start_time'].append(nap_start)
+            self.naps['duration'].append(duration)
+            self.naps['sleep_start'].append(sleep_start)
+            self.naps['sleep_end'].append(sleep_end)
+        self.num_nights += 1
+
+
+class ColumnarWriter:
+    """
+    Write nights and naps to nights.<ext> and naps.<ext> in out_dir,
+    a row group at a time.
+    """
+    def __init__(self, out_dir, file_format='parquet',
+                 row_group_size=ROW_GROUP_SIZE):
+        if file_format not in FILE_FORMATS:
+            raise ValueError('file_format must be one of {}, not {!r}'.
+                             format(FILE_FORMATS, file_format))
+        self.pa = import_pyarrow()
+        self.night_schema, self.nap_schema = schemas(self.pa)
+        self.row_group_size = row_group_size
+        self.buffer = ColumnBuffer()
+        self.num_nights = 0
+        self.num_naps = 0
+        os.makedirs(out_dir, exist_ok=True)
+        self.night_writer = self._open(
+                os.path.join(out_dir, 'nights.' + file_format),
+                file_format, self.night_schema)
+        self.nap_writer = self._open(
+                os.path.join(out_dir, 'naps.' + file_format),
+                file_format, self.nap_schema)
+
+    def _open(self, path, file_format, schema):
+        """
+        Called by: __init__()
+        """
+        if file_format == 'parquet':
+            return self.pa.parquet.ParquetWriter(path, schema)
+        return self.pa.ipc.new_file(path, schema)
+
+    def write_nights(self, nights):
+        """
+        Called by: export()
+        """
+        for night in nights:
+            self.buffer.add_night(night)
+            if self.buffer.num_nights >= self.row_group_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Write the buffered nights and naps as a row group.
+
+        Called by: write_nights(), close()
+        """
+        buffer = self.buffer
+        if not buffer.num_nights:
+            return
+        self.night_writer.write_table(
+                self.pa.Table.from_pydict(buffer.nights, self.night_schema))
+        if buffer.naps['night_id']:
+            self.nap_writer.write_table(
+                    self.pa.Table.from_pydict(buffer.naps, self.nap_schema))
+        self.num_nights += buffer.num_nights
+        self.num_naps += len(buffer.naps['night_id'])
+        self.buffer = ColumnBuffer()
+
+    def close(self):
+        self.flush()
+        self.night_writer.close()
+        self.nap_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export(nights, out_dir, file_format='parquet',
+           row_group_size=ROW_GROUP_SIZE):
+    """
+    :param nights: as yielded by nights_from_transform_output() or
+                   nights_from_db()
+    :return: the number of (nights, naps) written
+    Called by: client code
+    """
+    with ColumnarWriter(out_dir, file_format, row_group_size) as writer:
+        writer.write_nights(nights)
+    return writer.num_nights, writer.num_naps
+
+
+def set_up_arg_parser():
+    """
+    Parse and return the c.l.a.'s
+
+    Called by: client code
+    """
+    parser = argparse.ArgumentParser(
+            description='Export nights and naps to columnar files')
+    parser.add_argument('out_dir',
+                        help='write nights.<ext> and naps.<ext> here')
+    parser.add_argument('infile_name', nargs='?', default='-',
+                        help='read transform output from this file instead '
+                             'of stdin')
+    parser.add_argument('-f', '--format', dest='file_format',
+                        choices=FILE_FORMATS, default='parquet',
+                        help='the file format (default: parquet)')
+    parser.add_argument('-d', '--from-db', action='store_true',
+                        help='read the nights from the db named by $DB_URL, '
+                             'not from transform output')
+    parser.add_argument('--subject-id', type=int,
+                        help='with --from-db, export only the nights of '
+                             'the subject with this subject_id')
+    parser.add_argument('-g', '--row-group-size', type=int,
+                        default=ROW_GROUP_SIZE,
+                        help='nights to write at a time (default: '
+                             '{})'.format(ROW_GROUP_SIZE))
+    return parser.parse_args()
+
+
+def main():
+    """
+    Called by: client code
+    """
+    args = set_up_arg_parser()
+    if args.from_db:
+        from src.load.load import connect
+
+        with connect().connect() as connection:
+            counts = export(nights_from_db(connection, args.subject_id),
+                            args.out_dir, args.file_format,
+                            args.row_group_size)
+    else:
+        with fileinput.input(args.infile_name) as data_source:
+            counts = export(nights_from_transform_output(data_source),
+                            args.out_dir, args.file_format,
+                            args.row_group_size)
+    print('Exported {} nights and {} naps to {}'.format(*counts,
+                                                         args.out_dir))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,287 @@
+# file: src/analytics/sleep_index.py
+# 2026-10-19
+
+
+"""
+An in-memory index of time asleep, for range queries such as 'total
+sleep between any two datetimes' or 'hours slept between 10pm and 6am'.
+
+Time is divided into quarter hours, 96 to a day: the same grid that
+chart_new.Chart draws. The index holds a running total of the quarters
+spent asleep, so the sleep within any range of datetimes is the
+difference of two entries, however long the range.
+
+An index can be built from the output of the extract stage (for
+instance, the chart input file), from the output of the transform
+stage, or from the db. It can be saved to, and reloaded from, a compact
+cache file, so that it need not be rebuilt for every query.
+"""
+from array import array
+from datetime import date, datetime, time, timedelta
+import itertools
+import os
+import struct
+import sys
+
+
+QS_IN_DAY = 96  # 24 * 4 quarter hours in a day
+QUARTER = timedelta(minutes=15)
+DEFAULT_SUBJECT_ID = 1  # as in sl_insert_night()
+
+CACHE_MAGIC = b'SLIX'
+CACHE_VERSION = 1
+# magic, version, ordinal of first date, source stamp (2 ints), entries
+CACHE_HEADER = struct.Struct('<4sHqqqQ')
+
+
+class SleepIndex:
+    """
+    cumulative[i] holds the number of quarter hours asleep from midnight
+    at the start of first_date up to the start of quarter i.
+    """
+    def __init__(self, first_date, cumulative):
+        self.first_date = first_date
+        self.cumulative = cumulative
+        self.origin = datetime.combine(first_date, time())
+
+    @classmethod
+    def from_periods(cls, periods):
+        """
+        Build an index from an iterable of (start, end) datetimes, one
+        for each period asleep.
+        """
+        periods = list(periods)
+        if not periods:
+            return cls(date.today(), array('I', [0]))
+        first_date = min(start for start, _ in periods).date()
+        last_date = max(end for _, end in periods).date()
+        origin = datetime.combine(first_date, time())
+        asleep = bytearray(((last_date - first_date).days + 1) * QS_IN_DAY)
+        for start, end in periods:
+            first_q = (start - origin) // QUARTER
+            last_q = -((origin - end) // QUARTER)  # round up
+            asleep[first_q: last_q] = b'\x01' * (last_q - first_q)
+        cumulative = array('I', [0])
+        cumulative.extend(itertools.accumulate(asleep))
+        return cls(first_date, cumulative)
+
+    @classmethod
+    def from_extract_output(cls, lines):
+        return cls.from_periods(periods_from_extract_output(lines))
+
+    @classmethod
+    def from_transform_output(cls, lines):
+        return cls.from_periods(periods_from_transform_output(lines))
+
+    @classmethod
+    def from_db(cls, connection, subject_id=DEFAULT_SUBJECT_ID):
+        return cls.from_periods(periods_from_db(connection, subject_id))
+
+    def quarters_asleep(self, start, end):
+        """
+        :return: the number of quarter hours asleep from start up to end;
+                 partial quarters at either end are not counted
+        """
+        first_q = self._quarter(start)
+        last_q = max(self._quarter(end, True), first_q)
+        return self.cumulative[last_q] - self.cumulative[first_q]
+
+    def hours_asleep(self, start, end):
+        """
+        :return: the hours asleep from start up to end, as a float
+        """
+        return self.quarters_asleep(start, end) / 4
+
+    def _quarter(self, dt, round_down=False):
+        """
+        :return: the index into self.cumulative of the first whole
+                 quarter at or after dt (at or before, if round_down),
+                 clamped to the range of the index
+        """
+        if round_down:
+            ix = (dt - self.origin) // QUARTER
+        else:
+            ix = -((self.origin - dt) // QUARTER)
+        return min(max(ix, 0), len(self.cumulative) - 1)
+
+    def save(self, path, stamp=(0, 0)):
+        """
+        Write the index to a cache file.
+
+        :param stamp: a pair of ints identifying the state of the source
+                      the index was built from
+        """
+        entries = array('I', self.cumulative)
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        with open(path, 'wb') as outfile:
+            outfile.write(CACHE_HEADER.pack(
+                CACHE_MAGIC, CACHE_VERSION, self.first_date.toordinal(),
+                stamp[0], stamp[1], len(entries)))
+            entries.tofile(outfile)
+
+    @classmethod
+    def load(cls, path, stamp=(0, 0)):
+        """
+        Read an index from a cache file.
+
+        :return: the index, or None if the file is missing, is from
+                 another version, or was saved with a different stamp
+        """
+        try:
+            with open(path, 'rb') as infile:
+                header = infile.read(CACHE_HEADER.size)
+                if len(header) < CACHE_HEADER.size:
+                    return None
+                magic, version, ordinal, stamp_0, stamp_1, num_entries = \
+                    CACHE_HEADER.unpack(header)
+                if (magic, version) != (CACHE_MAGIC, CACHE_VERSION) or \
+                        (stamp_0, stamp_1) != tuple(stamp):
+                    return None
+                entries = array('I')
+                entries.fromfile(infile, num_entries)
+        except (OSError, EOFError):
+            return None
+        if sys.byteorder != 'little':
+            entries.byteswap()
+        return cls(date.fromordinal(ordinal), entries)
+
+
+def load_or_build(source_path, cache_path=None):
+    """
+    Return the index for an extract or transform output file, from the
+    cache file if it is up to date, otherwise by building (and caching)
+    a new one.
+
+    The cache is considered up to date if the source file's size and
+    modification time are those recorded when the cache was saved.
+    """
+    cache_path = cache_path or source_path + '.slix'
+    source_stat = os.stat(source_path)
+    stamp = (source_stat.st_mtime_ns, source_stat.st_size)
+    index = SleepIndex.load(cache_path, stamp)
+    if index is None:
+        with open(source_path) as infile:
+            index = build_from_file(infile)
+        index.save(cache_path, stamp)
+    return index
+
+
+def build_from_file(infile):
+    """
+    Build an index from extract or transform output, telling the two
+    apart by the first non-blank line.
+    """
+    lines = [line for line in infile if line.strip()]
+    if lines and lines[0].startswith(('NIGHT', 'NAP')):
+        return SleepIndex.from_transform_output(lines)
+    return SleepIndex.from_extract_output(lines)
+
+
+def periods_from_extract_output(lines):
+    """
+    Read periods asleep from extract output: day headers ('    YYYY-MM-DD')
+    followed by action lines ('action: b, time: 23:45, hours: 7.50').
+
+    A period starts with a b, s, Y, or N action, and ends with the next
+    w action.
+
+    :yield: (start, end) datetimes
+    Called by: SleepIndex.from_extract_output()
+    """
+    curr_date = None
+    asleep_at = None
+    for line in lines:
+        line = line.strip()
+        if line[:1].isdigit():
+            curr_date = date.fromisoformat(line[:10])
+        elif line.startswith('action: ') and curr_date:
+            at = datetime.combine(curr_date, parse_time(line[17:]))
+            if line[8] in 'bsYN':
+                asleep_at = at
+            elif line[8] == 'w' and asleep_at:
+                yield asleep_at, at
+                asleep_at = None
+
+
+def periods_from_transform_output(lines):
+    """
+    Read periods asleep from transform output: 'NIGHT, date, time, ...'
+    lines, each followed by its 'NAP, time, duration' lines.
+
+    :yield: (start, end) datetimes
+    Called by: SleepIndex.from_transform_output()
+    """
+    night_start = None
+    naps = []
+    for line in lines:
+        line_list = line.rstrip().split(', ')
+        if line_list[0] == 'NIGHT':
+            if night_start:
+                yield from night_periods(night_start, naps)
+            night_start = datetime.combine(date.fromisoformat(line_list[1]),
+                                           parse_time(line_list[2]))
+            naps = []
+        elif line_list[0] == 'NAP':
+            hrs, dec_hrs = line_list[2].split('.')
+            duration = timedelta(hours=int(hrs),
+                                 minutes=int(dec_hrs) * 3 // 5)
+            naps.append((parse_time(line_list[1]), duration))
+    if night_start:
+        yield from night_periods(night_start, naps)
+
+
+def periods_from_db(connection, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Read the periods asleep of subject subject_id from sl_night and
+    sl_nap.
+
+    :yield: (start, end) datetimes
+    Called by: SleepIndex.from_db()
+    """
+    from sqlalchemy import text
+
+    result = connection.execute(text(
+        'SELECT sl_night.night_id, sl_night.start_date, sl_night.start_time, '
+        'sl_nap.start_time AS nap_start, sl_nap.duration '
+        'FROM sl_night JOIN sl_nap ON sl_nap.night_id = sl_night.night_id '
+        'AND sl_nap.night_start_date = sl_night.start_date '
+        'WHERE sl_night.subject_id = :subject_id '
+        'ORDER BY sl_night.start_date, sl_night.start_time, sl_nap.nap_id'),
+        subject_id=subject_id)
+    for _, rows in itertools.groupby(result, key=lambda row: row['night_id']):
+        rows = list(rows)
+        night_start = datetime.combine(rows[0]['start_date'],
+                                       rows[0]['start_time'])
+        yield from night_periods(night_start, [(row['nap_start'],
+                                                row['duration'])
+                                               for row in rows])
+
+
+def night_periods(night_start, naps):
+    """
+    Place a night's naps on the calendar.
+
+    A nap stores only its time of day, so its date is found by moving
+    forward from the start of the night (or from the start of the
+    previous nap) to the next time that time of day comes round.
+
+    :param night_start: the datetime at which the night began
+    :param naps: (start time, duration) pairs, in order
+    :yield: (start, end) datetimes
+    """
+    curr = night_start
+    for start_time, duration in naps:
+        start = datetime.combine(curr.date(), start_time)
+        if start < curr:
+            start += timedelta(days=1)
+        yield start, start + duration
+        curr = start
+
+
+def parse_time(time_str):
+    """
+    'h:mm' or 'hh:mm', possibly followed by ', hours: ...' => time
+    """
+    hrs, mins = time_str.split(',')[0].split(':')
+    return time(int(hrs), int(mins[:2]))
@@ -0,0 +1,132 @@
+# file: src/analytics/summary.py
+# 2026-10-19
+
+
+"""
+Answer the sample queries in db_s_etl/sql_queries.txt from the
+sl_night_summary table, and from the sleep_period ranges in sl_nap.
+
+The loader writes one sl_night_summary row per night, so each function
+here reads only the rows for the nights in its date range, rather than
+aggregating sl_nap joined to sl_night.
+
+Except where noted, each function takes an open db connection and an
+inclusive range of start dates, as 'YYYY-MM-DD' strings or
+datetime.date objects. Each reads the nights of one subject: subject_id,
+by default DEFAULT_SUBJECT_ID, the subject that owns the nights of every
+load that names no subject.
+"""
+from sqlalchemy import text
+
+
+DEFAULT_SUBJECT_ID = 1  # as in sl_insert_night()
+
+# Bedtimes fall either side of midnight, so times are averaged after
+# being moved 12 hours on: 23:30 and 00:30 average to 00:00, not 12:00.
+AVERAGE_TIME = ("time '00:00' + avg(({} + interval '12 hours') - time '00:00')"
+                " - interval '12 hours'")
+
+
+def total_sleep_per_night(connection, first_date, last_date,
+                          subject_id=DEFAULT_SUBJECT_ID):
+    """
+    :return: a list of (start_date, start_time, total_sleep) rows,
+             one per night, in date order
+    """
+    return connection.execute(
+        text('SELECT start_date, start_time, total_sleep '
+             'FROM sl_night_summary '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date '
+             'ORDER BY start_date, start_time'),
+        first_date=first_date, last_date=last_date,
+        subject_id=subject_id).fetchall()
+
+
+def average_first_sleep(connection, first_date, last_date,
+                        subject_id=DEFAULT_SUBJECT_ID):
+    """
+    :return: a row holding the average start time and the average
+             duration of the first sleep of each night
+    """
+    return connection.execute(
+        text('SELECT {} AS first_sleep_start, '
+             'avg(first_sleep_duration) AS first_sleep_duration '
+             'FROM sl_night_summary '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date'.
+             format(AVERAGE_TIME.format('first_sleep_start'))),
+        first_date=first_date, last_date=last_date,
+        subject_id=subject_id).fetchone()
+
+
+def average_naps_per_night(connection, first_date, last_date,
+                           subject_id=DEFAULT_SUBJECT_ID):
+    """
+    :return: the average number of sleeps/naps per night
+    """
+    return connection.execute(
+        text('SELECT avg(nap_count) FROM sl_night_summary '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date'),
+        first_date=first_date, last_date=last_date,
+        subject_id=subject_id).scalar()
+
+
+def average_sleep_length(connection, first_date, last_date,
+                         subject_id=DEFAULT_SUBJECT_ID):
+    """
+    :return: the average length of a sleep/nap over the date range
+    """
+    return connection.execute(
+        text('SELECT sum(total_sleep) / nullif(sum(nap_count), 0) '
+             'FROM sl_night_summary '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date'),
+        first_date=first_date, last_date=last_date,
+        subject_id=subject_id).scalar()
+
+
+def best_bedtimes(connection, first_date, last_date, limit=5,
+                  subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Rank bedtimes by the average duration of the first sleep that
+    followed them.
+
+    :return: a list of (start_time, first_sleep_duration, nights) rows,
+             longest average first sleep first
+    """
+    return connection.execute(
+        text('SELECT start_time, avg(first_sleep_duration) '
+             'AS first_sleep_duration, count(*) AS nights '
+             'FROM sl_night_summary '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date '
+             'AND first_sleep_duration IS NOT NULL '
+             'GROUP BY start_time '
+             'ORDER BY first_sleep_duration DESC '
+             'LIMIT :limit'),
+        first_date=first_date, last_date=last_date, limit=limit,
+        subject_id=subject_id).fetchall()
+
+
+def sleep_between(connection, start, end, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Total sleep between any two datetimes, e.g., between 10pm and 6am.
+
+    Only the part of each nap inside the window is counted. The overlap
+    test on sl_nap.sleep_period is answered from its GiST index.
+
+    :param start, end: the window, as datetimes or 'YYYY-MM-DD HH:MM'
+    :return: the total sleep, as a timedelta
+    """
+    return connection.execute(
+        text('SELECT coalesce(sum(upper(sleep_period * span) - '
+             'lower(sleep_period * span)), interval \'0\') '
+             'FROM sl_nap JOIN sl_night '
+             'ON sl_night.night_id = sl_nap.night_id '
+             'AND sl_night.start_date = sl_nap.night_start_date '
+             'CROSS JOIN tsrange(:start, :end) AS span '
+             'WHERE sl_night.subject_id = :subject_id '
+             'AND sleep_period && span'),
+        start=start, end=end, subject_id=subject_id).scalar()
@@ -0,0 +1,91 @@
+# file: src/block_writer.py
+# 2026-10-19
+
+
+"""
+Buffered output for the extract and transform stages.
+
+Both stages write one short line at a time to a pipe. Writing each line
+as it is made costs a write syscall per line; a BlockWriter instead
+gathers lines and writes them to the underlying stream in blocks of
+about block_size characters.
+
+When a downstream stage needs each night as soon as it is complete, the
+writer can also be told to flush at the end of every night.
+
+The defaults can be set from the environment:
+    ETL_BLOCK_SIZE   block size in characters; 0 writes each line at once
+    ETL_FLUSH_NIGHTS 'True' to flush at the end of every night
+"""
+import os
+
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+def block_size_from_env():
+    """
+    :return: the block size set by ETL_BLOCK_SIZE, or DEFAULT_BLOCK_SIZE
+    """
+    try:
+        return max(int(os.environ['ETL_BLOCK_SIZE']), 0)
+    except (KeyError, ValueError):
+        return DEFAULT_BLOCK_SIZE
+
+
+def flush_nights_from_env():
+    """
+    :return: True iff ETL_FLUSH_NIGHTS is 'True'
+    """
+    return os.environ.get('ETL_FLUSH_NIGHTS') == 'True'
+
+
+class BlockWriter:
+    def __init__(self, stream, block_size=None, flush_nights=None):
+        """
+        :param stream: an open text stream, e.g., sys.stdout
+        :param block_size: write to stream once this many characters
+                           are pending
+        :param flush_nights: if True, end_night() flushes the stream
+        """
+        self.stream = stream
+        self.block_size = (block_size_from_env() if block_size is None
+                           else block_size)
+        self.flush_nights = (flush_nights_from_env() if flush_nights is None
+                             else flush_nights)
+        self.lines = []
+        self.pending = 0
+
+    def write_line(self, line):
+        """
+        Add line, and a newline, to the block; write the block out if
+        it is full.
+        """
+        self.lines.append(line)
+        self.pending += len(line) + 1
+        if self.pending >= self.block_size:
+            self.write_block()
+
+    def write_block(self):
+        """
+        Write any pending lines to the stream in a single call.
+        """
+        if self.lines:
+            self.lines.append('')
+            self.stream.write('\n'.join(self.lines))
+            self.lines.clear()
+            self.pending = 0
+
+    def end_night(self):
+        """
+        Mark the end of a night; flush the stream if flush_nights is set.
+        """
+        if self.flush_nights:
+            self.flush()
+
+    def flush(self):
+        """
+        Write any pending lines, then flush the stream.
+        """
+        self.write_block()
+        self.stream.flush()
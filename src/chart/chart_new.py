@@ -11,8 +11,8 @@ import argparse
 from datetime import datetime, timedelta
 from collections import namedtuple
 import logging
-import logging.handlers
-import re
+
+from src.subject import CHART_INPUT_FILENAME, subject_from_env, subject_path
 
 
 BLACK_INK = u'\u2588'
@@ -65,9 +65,11 @@ action: w, time: 20:15, hours: 1.00
         self.QuartersCarried = namedtuple('QuartersCarried',
                                           ['length', 'symbol'],
                                           defaults=[0, self.NO_DATA])
+        self.GET_MORE_INPUT = self.Triple(-1, -1, -1)
         self.curr_line = ''
         self.curr_sunday = ''
-        self.infilename = '/tmp/chart_input_bDX03c.txt'
+        self.subject = subject_from_env()
+        self.infilename = subject_path(CHART_INPUT_FILENAME, self.subject)
         self.outfilename = None
         self.infile = None
         self.outfile = None
@@ -78,9 +80,7 @@ action: w, time: 20:15, hours: 1.00
         self.output_date = '2016-12-04'
         self.output_row = [self.NO_DATA] * self.QS_IN_DAY
         self.quarters_carried = self.QuartersCarried(0, self.NO_DATA)
-        self.re_decimal_hour = None
-        self.re_hr_min_time = None
-        self.re_iso_date = None
+        self.row_out = None
         self.sleep_state = self.NO_DATA
         self.spaces_left = self.QS_IN_DAY
 
@@ -124,11 +124,24 @@ action: w, time: 20:15, hours: 1.00
                      a unicode character (ASLEEP, AWAKE, or NO_DATA) (symbol)
         Called by: read_file()
         """
-        if not self.curr_line:
+        line = self.curr_line
+        if not line:
             raise ValueError('self.curr_line is empty in _parse_input_line()')
-        if re.match(r'\d{4}-\d{2}-\d{2}$', self.curr_line):
-            return self._handle_date_line(self.curr_line)
-        return self._handle_action_line(self.curr_line)
+        if self._is_iso_date(line):
+            return self._handle_date_line(line)
+        return self._handle_action_line(line)
+
+    @staticmethod
+    def _is_iso_date(line):
+        """
+        :return: True if line is a 'YYYY-MM-DD' date, and nothing else
+
+        Checked by position, rather than by a regex, as it is run on
+        every input line.
+        Called by: _parse_input_line()
+        """
+        return (len(line) == 10 and line[4] == '-' and line[7] == '-' and
+                (line[:4] + line[5:7] + line[8:]).isdigit())
 
     def _handle_date_line(self, line):
         """
@@ -142,13 +155,13 @@ action: w, time: 20:15, hours: 1.00
         if self.last_date_read is None:
             self.last_start_posn = 0
             self.last_date_read = line
-            return self.Triple(-1, -1, -1)  # get more input
+            return self.GET_MORE_INPUT
         if self.sleep_state == self.NO_DATA:
             quarters_to_output = self.QS_IN_DAY - self.last_start_posn
             return self.Triple(self.last_start_posn, quarters_to_output,
                                self.sleep_state)
         self.last_date_read = line
-        return self.Triple(-1, -1, -1)  # get more input
+        return self.GET_MORE_INPUT
 
     def _handle_action_line(self, line):
         """
@@ -165,22 +178,23 @@ action: w, time: 20:15, hours: 1.00
                      a unicode character (ASLEEP, AWAKE, NO_DATA)
         Called by: _parse_input_line()
         """
-        if line[8] in 'bsY':
+        action = line[8]
+        if action in 'bsY':
             self.last_sleep_time = self._get_time_part(line)
-            self.last_start_posn = self._get_start_posn(line)
+            self.last_start_posn = self._get_start_posn(self.last_sleep_time)
             self.sleep_state = self.ASLEEP
-            return self.Triple(-1, -1, -1)  # get more input
-        if line[8] == 'w':
+            return self.GET_MORE_INPUT
+        if action == 'w':
             wake_time = self._get_time_part(line)
             duration = self._get_duration(wake_time, self.last_sleep_time)
             length = self._get_num_chunks(duration)
             self.sleep_state = self.AWAKE
             return self.Triple(self.last_start_posn, length, self.ASLEEP)
-        if line[8] == 'N':
+        if action == 'N':
             self.last_sleep_time = self._get_time_part(line)
-            self.last_start_posn = self._get_start_posn(line)
+            self.last_start_posn = self._get_start_posn(self.last_sleep_time)
             self.sleep_state = self.NO_DATA
-            return self.Triple(-1, -1, -1)  # get more input
+            return self.GET_MORE_INPUT
         # raise ValueError(f"Bad 'action: ' value in line {line}")   DON'T DO THIS!
         return None
 
@@ -211,20 +225,14 @@ action: w, time: 20:15, hours: 1.00
         Returns: the calculated interval, whose value will be
                 non-negative.
         """
-        w_time_list = list(map(int, w_time.split(':')))
-        s_time_list = list(map(int, s_time.split(':')))
-        if w_time_list[1] < s_time_list[1]:  # wake minute < sleep minute
-            w_time_list[1] += 60
-            w_time_list[0] -= 1
-        if w_time_list[0] < s_time_list[0]:  # wake hour < sleep hour
-            w_time_list[0] += 24
-        dur_list = [(w_time_list[x] - s_time_list[x])
-                    for x in range(len(w_time_list))]
-        duration = str(dur_list[0])
-        if len(duration) == 1:  # change hour from '1' to '01', e.g.
-            duration = '0' + duration
-        duration += self._quarter_hour_to_decimal(dur_list[1])
-        return duration
+        w_hrs, w_mins = w_time.split(':')
+        s_hrs, s_mins = s_time.split(':')
+        # a wake time earlier in the day than the sleep time is on the
+        # next day
+        dur_hrs, dur_mins = divmod((int(w_hrs) - int(s_hrs)) * 60 +
+                                   int(w_mins) - int(s_mins), 60)
+        return '{:02d}{}'.format(dur_hrs % 24,
+                                 self._quarter_hour_to_decimal(dur_mins))
 
     def _quarter_hour_to_decimal(self, quarter):
         """
@@ -271,19 +279,25 @@ action: w, time: 20:15, hours: 1.00
             raise ValueError(f'q must be < 60 in {__name__}')
         return closest_quarter
 
-    def make_output(self, read_file_iterator):
+    def make_output(self, read_file_iterator, resume=False):
         """
         Fill a new day (output) row. Start the row with any
         left over quarters.
 
         :param: read_file_iterator yields parsed input lines (Triples)
+        :param resume: if True, carry on filling self.row_out, as an
+                       earlier call left it, rather than a new row
         :return: None
-        Called by: main()
+        Called by: main(), parallel_chart
         """
-        row_out = self.output_row[:]
-        self.spaces_left = self.QS_IN_DAY
+        if resume:
+            row_out = self.row_out
+        else:
+            row_out = self.output_row[:]
+            self.spaces_left = self.QS_IN_DAY
 
         while True:
+            self.row_out = row_out  # the row being filled, between Triples
             try:
                 curr_triple = next(read_file_iterator)
             except StopIteration:
@@ -418,52 +432,29 @@ action: w, time: 20:15, hours: 1.00
         Called by: read_file()
         """
         if my_str:
-            m = re.search(self.re_decimal_hour, my_str)
-            assert bool(m)
-            return (int(m.group(1)) * 4 +  # 4 chunks per hour
-                    int(m.group(2)) // 25) % self.QS_IN_DAY  # m.group(2) is decimal
+            hrs, dec_hrs = my_str.split('.')
+            return (int(hrs) * 4 +  # 4 chunks per hour
+                    int(dec_hrs[:2]) // 25) % self.QS_IN_DAY
         return 0
 
     def _get_start_posn(self, time_str):
         """
         Obtain, from a time string, its starting position in a line of output.
 
-        Called by: read_file()
-        :param time_str: a time expressed as 'HH:MM'
+        Called by: _handle_action_line()
+        :param time_str: a time expressed as 'HH:MM' or 'H:MM'
         :return: int: the starting position
         """
         if time_str:
-            self.compile_hr_min_time()
-            m = re.search(self.re_hr_min_time, time_str)
-            assert bool(m)
-            return (int(m.group(1)) * 4 +  # 4 output chars per hour
-                    int(m.group(2)) // 15) % self.QS_IN_DAY
+            hrs, mins = time_str.split(':')
+            return (int(hrs) * 4 +  # 4 output chars per hour
+                    int(mins[:2]) // 15) % self.QS_IN_DAY
         return 0
 
-    def compile_iso_date(self):
-        """
-        :return: None
-        Called by: main()
-        """
-        self.re_iso_date = re.compile(r' \d{4}-\d{2}-\d{2} \|')
-
-    def compile_decimal_hour(self):
-        """
-        :return: None
-        Called by: main()
-        """
-        self.re_decimal_hour = re.compile(r'(\d{1,2})\.(\d{2})')
-
-    def compile_hr_min_time(self):
-        """
-        :return:
-        Called by: main()
-        """
-        self.re_hr_min_time = re.compile(r'(\d{1,2}):(\d{2})')
-
     def create_outfile_name(self):
         dt = datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
         outfile_name = f'sleep_chart_{dt}'
+        outfile_name += f'_{self.subject}' if self.subject else ''
         outfile_name += '_debug' if self.DEBUG else ''
         return outfile_name + '.txt'
 
@@ -480,22 +471,24 @@ action: w, time: 20:15, hours: 1.00
 
 
 def set_up_loggers():
+    from src.logging.wire_format import make_socket_handler
+
     # from: https://docs.python.org/3/howto/
     # logging-cookbook.html#network-logging
     root_logger = logging.getLogger('')
     root_logger.setLevel(logging.INFO)
-    socket_handler = logging.handlers.SocketHandler('localhost',
-                                                    logging.handlers.
-                                                    DEFAULT_TCP_LOGGING_PORT)
+    socket_handler = make_socket_handler()
     # don't bother with a formatter, since a socket handler sends the event as
-    # an unformatted pickle
+    # an unformatted pickle or compact record
     root_logger.addHandler(socket_handler)
     # end cookbook code
 
     # read_logger will need a formatter since it is writing to file
     chart_logger = logging.getLogger('extract.read_fns')
     chart_logger.setLevel(logging.DEBUG)
-    file_handler = logging.FileHandler('src/extract/read_fns.log', mode='w')
+    file_handler = logging.FileHandler(
+            subject_path('src/extract/read_fns.log', subject_from_env()),
+            mode='w')
     formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
@@ -504,13 +497,10 @@ def set_up_loggers():
 
 
 def main():
+    args = get_parse_args()
     set_up_loggers()
     logging.info('chart start')
-    args = get_parse_args()
     chart = Chart(args)
-    chart.compile_decimal_hour()
-    chart.compile_hr_min_time()
-    chart.compile_iso_date()
     chart.outfilename = chart.create_outfile_name()
     read_file_iterator = chart.read_file()
     # TODO: come up with nicer way to do this ?
@@ -518,7 +508,12 @@ def main():
     with open(chart.outfilename, 'w') as chart.outfile:
         ruler_line = chart.create_ruler()
         print(ruler_line, file=chart.outfile)
-        chart.make_output(read_file_iterator)
+        if args.jobs > 1:
+            from src.chart.parallel_chart import make_output_parallel
+
+            make_output_parallel(chart, args.jobs)
+        else:
+            chart.make_output(read_file_iterator)
     logging.info('chart finish')
 
 
@@ -534,6 +529,8 @@ def get_parse_args():
     parser.add_argument('-d', '--debug',
                         help=("output X, o, - instead of '\u2588', '\u0020', "
                               "'\u2591'"), action='store_true')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='draw the chart in this many processes at once')
     return parser.parse_args()
 
 
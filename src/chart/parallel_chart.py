@@ -0,0 +1,275 @@
+# file: src/chart/parallel_chart.py
+# 2026-10-19
+
+
+"""
+Render a long chart in parallel, a few months of input to each process.
+
+Chart is a state machine: how it draws a day depends on what came
+before (a night that runs past midnight, the state of the last action,
+how much of the current row is filled). This state is the 'carry'. To
+draw a range of days on its own, a process needs the carry at the
+range's first day, which only the range before it can give.
+
+So each chunk of input starts WARMUP_DAYS early, and is drawn from a
+fresh Chart, which ignores wake actions until it has seen a sleep
+start; by the chunk's first day its carry has almost always caught up
+with that of the chunk before. Each chunk also runs
+OVERLAP_DAYS past its last day. Between each pair of Triples in both
+of these margins, a ChunkChart saves its carry, keyed by its position
+in the input. Where the carries of two neighbouring chunks first agree,
+at the same position, everything drawn from there on must be the same;
+the chunks are joined there.
+
+If two chunks' carries never agree, the later chunk is drawn again in
+this process, starting from the earlier chunk's carry: more slowly, but
+still correctly.
+
+The rows are numbered, dated, and separated by rulers only when they
+are joined, by the same Chart methods as in a serial run, so the output
+is identical to that of Chart.make_output().
+"""
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+from src.chart.chart_new import Chart
+
+
+MONTHS_PER_CHUNK = 6
+WARMUP_DAYS = 7
+OVERLAP_DAYS = 7
+
+# the attributes of a Chart that make up its carry, besides the row it
+# is filling and its quarters carried
+CARRY_ATTRS = ('last_date_read', 'last_sleep_state', 'last_sleep_time',
+               'last_start_posn', 'sleep_state', 'spaces_left')
+
+
+class LineReader:
+    """
+    A file-like view of a chunk of the lines of an input, which counts
+    its position from the start of the whole input.
+    """
+    def __init__(self, lines, first_line_num=0):
+        """
+        :param lines: the lines of the chunk
+        :param first_line_num: the position in the input of lines[0]
+        """
+        self.lines = iter(lines)
+        self.line_num = first_line_num
+
+    def readline(self):
+        line = next(self.lines, '')
+        if line:
+            self.line_num += 1
+        return line
+
+
+class ChunkChart(Chart):
+    """
+    A Chart that draws a chunk of input into a list of rows, rather
+    than to a file, saving its carry as it goes.
+    """
+    def __init__(self, args, reader, windows=(), warm_up=False):
+        """
+        :param reader: a LineReader, positioned at the chunk's start
+        :param windows: the ranges of input positions at which to save
+                        the carry
+        :param warm_up: if True, the chunk starts part way through the
+                        input, so wake actions are skipped until the
+                        first action that starts a sleep
+        """
+        super().__init__(args)
+        self.infile = reader
+        self.windows = windows
+        self.warm_up = warm_up
+        self.rows = []
+        self.carries = {}  # input position => (carry, rows drawn so far)
+
+    def read_file(self):
+        """
+        As Chart.read_file(), from self.infile, saving the carry after
+        each Triple has been drawn.
+
+        Called by: draw_chunk()
+        """
+        while self._get_a_line():
+            parsed_input_line = self._parse_input_line()
+            if parsed_input_line.start == -1:
+                continue
+            yield parsed_input_line
+            line_num = self.infile.line_num
+            if any(first <= line_num < last for first, last in self.windows):
+                self.carries[line_num] = (self.carry(), len(self.rows))
+
+    def carry(self):
+        """
+        :return: the carry, as plain values that can be compared, and
+                 pickled
+        """
+        return (tuple(getattr(self, attr) for attr in CARRY_ATTRS) +
+                (tuple(self.quarters_carried), ''.join(self.row_out)))
+
+    def set_carry(self, carry):
+        """
+        The inverse of carry()
+        """
+        for attr, value in zip(CARRY_ATTRS, carry):
+            setattr(self, attr, value)
+        self.quarters_carried = self.QuartersCarried(*carry[-2])
+        self.row_out = list(carry[-1])
+
+    def _handle_action_line(self, line):
+        if self.warm_up and self.last_sleep_time is None and line[8] == 'w':
+            return self.GET_MORE_INPUT
+        return super()._handle_action_line(line)
+
+    def _write_output(self, my_output_row):
+        self.rows.append(''.join(my_output_row))
+
+
+def draw_chunk(debug, chunk_lines, start, windows, carry=None):
+    """
+    Draw a chunk of input, from a fresh Chart, or from carry.
+
+    :param chunk_lines: the lines of the chunk
+    :param start: the position in the input of the chunk's first line
+    :param windows: as for ChunkChart
+    :return: the rows drawn, the carries saved within windows, and the
+             exception that stopped the drawing, or None
+    Called by: make_output_parallel() (in a worker process), join_chunks()
+    """
+    chart = ChunkChart(Namespace(debug=debug), LineReader(chunk_lines, start),
+                       windows, warm_up=start > 0 and carry is None)
+    if carry is not None:
+        chart.set_carry(carry)
+    try:
+        chart.make_output(chart.read_file(), resume=carry is not None)
+    except Exception as e:
+        # a fresh Chart may fail on input that follows on from earlier
+        # input; whether a serial run would fail too is decided by
+        # join_chunks()
+        return chart.rows, chart.carries, e
+    return chart.rows, chart.carries, None
+
+
+def split_input(lines, months_per_chunk=MONTHS_PER_CHUNK):
+    """
+    :return: a list of (first line, last line + 1) of each chunk; each
+             chunk but the first starts at the date line of the first day
+             of a month
+    Called by: make_output_parallel()
+    """
+    bounds = [0]
+    chunk_month = None
+    for line_num, line in enumerate(lines):
+        line = line.strip()
+        if not Chart._is_iso_date(line):
+            continue
+        month = int(line[:4]) * 12 + int(line[5:7])
+        if chunk_month is None:
+            chunk_month = month
+        elif month - chunk_month >= months_per_chunk:
+            bounds.append(line_num)
+            chunk_month = month
+    bounds.append(len(lines))
+    return list(zip(bounds, bounds[1:]))
+
+
+def days_from(lines, line_num, days):
+    """
+    :return: the position of the date line days date lines on from
+             line_num (back from it, if days < 0), or the start or end
+             of lines, if there are not that many
+    Called by: make_output_parallel()
+    """
+    step = 1 if days > 0 else -1
+    for _ in range(abs(days)):
+        line_num += step
+        while 0 < line_num < len(lines) and \
+                not Chart._is_iso_date(lines[line_num].strip()):
+            line_num += step
+        if not 0 < line_num < len(lines):
+            return max(0, min(line_num, len(lines)))
+    return line_num
+
+
+def join_chunks(debug, lines, chunks, drawn):
+    """
+    :param chunks: (start, stop, first line, last line + 1) of each chunk
+    :param drawn: the (rows, carries, error) of each chunk, as
+                  draw_chunk() returned them
+    :return: the rows of the whole chart, in order, or None if some
+             chunk saved no carry at which to join the next one
+    :raise: the exception a serial run would have raised
+    Called by: make_output_parallel()
+    """
+    rows, carries, error = drawn[0]
+    joined = []
+    from_row = 0
+    for (_, stop, first, _), (next_rows, next_carries, next_error) in zip(
+            chunks[1:], drawn[1:]):
+        # from the seam on, the chunk's rows are a serial run's rows
+        if error is not None:
+            raise error
+        seams = [line_num for line_num in sorted(carries) if line_num >= first]
+        if not seams:
+            return None
+        seam = next((line_num for line_num in seams
+                     if line_num in next_carries and
+                     next_carries[line_num][0] == carries[line_num][0]), None)
+        if seam is None:
+            logging.info('chart chunk at line %d redrawn from carry', first)
+            seam = seams[0]
+            next_rows, next_carries, next_error = draw_chunk(
+                    debug, lines[seam: stop], seam, [(seam, stop)],
+                    carries[seam][0])
+            next_carries[seam] = (carries[seam][0], 0)
+        joined.extend(rows[from_row: carries[seam][1]])
+        rows, carries, error = next_rows, next_carries, next_error
+        from_row = carries[seam][1]
+    if error is not None:
+        raise error
+    joined.extend(rows[from_row:])
+    return joined
+
+
+def make_output_parallel(chart, workers, months_per_chunk=MONTHS_PER_CHUNK):
+    """
+    As chart.make_output(chart.read_file()), drawing chunks of the input
+    in up to workers processes at once.
+
+    Falls back to drawing the chart serially if the input is a single
+    chunk, or if no process pool can be started.
+
+    Called by: chart_new.main()
+    """
+    with open(chart.infilename) as infile:
+        lines = infile.readlines()
+    bounds = split_input(lines, months_per_chunk)
+    rows = None
+    if workers > 1 and len(bounds) > 1:
+        chunks = []
+        for ix, (first, last) in enumerate(bounds):
+            start = days_from(lines, first, -WARMUP_DAYS) if ix else 0
+            stop = days_from(lines, last, OVERLAP_DAYS)
+            chunks.append((start, stop, first, last))
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(
+                        draw_chunk, chart.DEBUG, lines[start: stop], start,
+                        [(first, days_from(lines, first, OVERLAP_DAYS)),
+                         (last, stop)])
+                           for start, stop, first, last in chunks]
+                drawn = [future.result() for future in futures]
+        except (OSError, NotImplementedError) as e:
+            logging.warning('cannot start chart processes (%s); drawing '
+                            'the chart serially', e)
+        else:
+            rows = join_chunks(chart.DEBUG, lines, chunks, drawn)
+    if rows is None:
+        chart.make_output(chart.read_file())
+        return
+    for row in rows:
+        chart._write_output(row)
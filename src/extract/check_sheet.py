@@ -0,0 +1,111 @@
+# file: src/extract/check_sheet.py
+# 2026-10-19
+
+"""
+Check a freshly edited sheet without running the pipeline.
+
+SheetChecker reads the input as Extract does, validating each week's
+Sunday date and each segment, and tracking which nights are complete.
+It formats, buffers, and writes nothing: instead of logging each problem
+to read_fns.log, it collects them into a summary:
+
+    {"weeks": 52,                    weeks read
+     "complete_nights": 340,         'b' events that end a complete night
+     "non_sunday_dates": ["2017-11-14", ...],
+     "bad_segments": [{"date": "2016-12-06", "segment": ["b", "", ""]},
+                      ...],
+     "incomplete_nights": ["2016-12-08", ...]}
+                                     dates of the 'b' events before which
+                                     Extract discards incomplete nights
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src:src/extract python src/extract/run_it.py \\
+          <infile_name> --check
+"""
+from datetime import date
+from typing import List, Optional
+
+from container_objs import validate_segment
+from read_fns import Extract
+
+
+EMPTY_SEGMENT = ['', '', '']
+
+
+class SheetChecker(Extract):
+    def __init__(self, infile, cl_args=None) -> None:
+        super().__init__(infile, cl_args)
+        self.weeks = 0
+        self.complete_nights = 0
+        self.non_sunday_dates = []
+        self.bad_segments = []
+        self.incomplete_nights = []
+
+    def check(self) -> dict:
+        """
+        Read all of the input.
+
+        :return: the summary of problems found
+        Called by: client code
+        """
+        in_week = False
+        for line in self.infile:
+            in_week = self._read_fields(self._split_line(line), in_week, None)
+        if in_week:
+            self._manage_output_buffer(None)
+        return self.summary()
+
+    def summary(self) -> dict:
+        """
+        Called by: check()
+        """
+        return {'weeks': self.weeks,
+                'complete_nights': self.complete_nights,
+                'non_sunday_dates': self.non_sunday_dates,
+                'bad_segments': self.bad_segments,
+                'incomplete_nights': self.incomplete_nights}
+
+    def _warn_non_sunday(self, a_date: Optional[date]) -> None:
+        self.non_sunday_dates.append(str(a_date))
+
+    def _warn_bad_segment(self, segment: List[str], a_date: date) -> None:
+        self.bad_segments.append({'date': str(a_date), 'segment': segment})
+
+    def _get_events(self) -> bool:
+        """
+        As Extract._get_events(), but each valid segment is added to
+        self.new_week as it is, not as an Event; the fields of a line
+        from _split_line() are already stripped.
+
+        Called by: _handle_week()
+        """
+        fields = self.line_as_list
+        have_events = False
+        for ix in range(7):
+            segment = fields[3 * ix + 1: 3 * ix + 4]
+            if segment == EMPTY_SEGMENT:
+                continue
+            if validate_segment(segment):
+                self.new_week[ix].events.append(segment)
+                have_events = True
+            else:
+                self._warn_bad_segment(segment, self.new_week[ix].dt_date)
+        return have_events
+
+    def _manage_output_buffer(self, out_buffer) -> None:
+        """
+        Count the complete nights in self.new_week, and note the
+        incomplete ones, as Extract._write_or_discard_night() would.
+
+        Called by: check(), _handle_week()
+        """
+        if self.new_week:
+            self.weeks += 1
+            for day in self.new_week:
+                for action, _, hours in day.events:
+                    if action != 'b':
+                        continue
+                    if hours:
+                        self.complete_nights += 1
+                    else:
+                        self.incomplete_nights.append(str(day.dt_date))
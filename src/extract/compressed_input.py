@@ -0,0 +1,73 @@
+# file: src/extract/compressed_input.py
+# 2026-10-19
+
+"""
+Open gzip, xz, bzip2, or zstd compressed input as text, decompressing
+it as it is read, so that no decompressed copy is written to disk.
+
+The compression is recognised by the magic bytes at the start of the
+file, not by its name.
+
+zstd support needs either Python 3.14's compression.zstd module or the
+zstandard package, which is not otherwise required.
+"""
+import io
+
+
+MAGIC_BYTES = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+
+def detect_compression(path):
+    """
+    :return: 'gzip', 'xz', 'bz2', or 'zstd', or None if the file at path
+             does not start with the magic bytes of any of these
+    """
+    with open(path, 'rb') as infile:
+        start = infile.read(6)
+    for magic, compression in MAGIC_BYTES:
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def open_compressed(path, compression):
+    """
+    :return: the file at path, open to read decompressed text
+    Called by: read_fns.open_infile()
+    """
+    # imported here, so that plain input doesn't pay for them at startup
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, 'rt')
+    if compression == 'xz':
+        import lzma
+        return lzma.open(path, 'rt')
+    if compression == 'bz2':
+        import bz2
+        return bz2.open(path, 'rt')
+    if compression == 'zstd':
+        return open_zstd(path)
+    raise ValueError('Unknown compression {}'.format(compression))
+
+
+def open_zstd(path):
+    try:
+        from compression import zstd  # Python 3.14 and later
+    except ImportError:
+        pass
+    else:
+        return zstd.open(path, 'rt')
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('{} is zstd-compressed: reading it needs Python '
+                          '3.14 or later, or the zstandard package '
+                          '(pip install zstandard)'.format(path)) from None
+    return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'),
+                                                       closefd=True))
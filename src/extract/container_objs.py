@@ -8,6 +8,10 @@ import datetime
 import re
 
 
+TIME_RE = re.compile(r'[01]?\d:[0-5]\d|2[0-3]:[0-5]\d')
+HOURS_RE = re.compile(r'[12]?\d\.\d{2}')
+
+
 def validate_segment(segment):
     """
     valid segments: 'b', time, ''
@@ -17,9 +21,9 @@ def validate_segment(segment):
     """
     if not any(segment) or not all(segment[0:2]):
         return False
-    if not re.match(r'[01]?\d:[0-5]\d|2[0-3]:[0-5]\d', segment[1]):
+    if not TIME_RE.match(segment[1]):
         return False
-    if segment[2] and not re.match(r'[12]?\d\.\d{2}', segment[2]):
+    if segment[2] and not HOURS_RE.match(segment[2]):
         return False
     if segment[0]:
         return check_segment_0(segment)  # this test must go last
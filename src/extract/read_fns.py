@@ -87,23 +87,42 @@ import datetime
 from datetime import date
 import logging
 import re
-from typing import Optional, Union, List
+import sys
+from typing import Iterator, Optional, Union, List
 
+from compressed_input import detect_compression, open_compressed
 from container_objs import validate_segment, Week, Day, Event
 from io import TextIOWrapper
+from sheet_readers import open_sheet, SHEET_SUFFIXES
+from spill_buffer import SpillingBuffer
+from src.block_writer import BlockWriter
+from src.subject import CHART_INPUT_FILENAME, subject_from_env, subject_path
 
 
+OutBuffer = Union[List[str], SpillingBuffer]
+
 read_logger = logging.getLogger('extract.read_fns')
 read_logger.setLevel('DEBUG')
 
 
-def open_infile(filename) -> TextIOWrapper:
+def open_infile(filename) -> Union[TextIOWrapper, Iterator[List[str]]]:
     """
     Open input file.
     Left outside the class so Extract.__init__() can accept an open
         input file handle.
+
+    An .xlsx or .ods workbook is not opened as text: instead, an
+    iterator over the rows of its first sheet is returned, each row a
+    list of fields. A gzip, xz, bzip2, or zstd compressed file is
+    decompressed as it is read.
     Called by: client code
     """
+    infilename = str(getattr(filename, 'infilename', None) or '')
+    if infilename.lower().endswith(SHEET_SUFFIXES):
+        return open_sheet(infilename)
+    compression = detect_compression(infilename) if infilename else None
+    if compression:
+        return open_compressed(infilename, compression)
     return filename.open()
 
 
@@ -111,52 +130,167 @@ class Extract:
     SUNDAY = 6
     DAYS_IN_A_WEEK = 7
 
-    def __init__(self, infile, cl_args) -> None:
-        """infile: open for read"""
+    def __init__(self, infile, cl_args, week_cache=None) -> None:
+        """
+        infile: open for read
+        week_cache: a WeekCache of parsed weeks, or None
+        """
         self.infile = infile
+        self.week_cache = week_cache
+        self.warnings_logged = 0
         self.new_week = None
         self.line_as_list = []
         self.in_missing_data = False
         self.cl_args = cl_args
-        self.outfile_name = '/tmp/chart_input_bDX03c.txt'
+        self.outfile_name = subject_path(CHART_INPUT_FILENAME,
+                                         subject_from_env())
         self.outfile = None
+        self.writers = []  # one BlockWriter per output stream
 
     def __enter__(self):
         if self.cl_args.print_chart == 'True' or\
            self.cl_args.print_debug_chart == 'True' or\
            self.cl_args.store_in_db == 'True':
             self.outfile = open(self.outfile_name, 'w')
+            self.writers.append(BlockWriter(self.outfile))
+        if self.cl_args.store_in_db == 'True':
+            self.writers.append(BlockWriter(sys.stdout))
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        for writer in self.writers:
+            writer.flush()
         if self.outfile:
             self.outfile.close()
 
     def lines_in_weeks_out(self) -> None:
         """
-        Read lines from .csv file; output weeks, days, and events
+        Read lines from .csv file (or rows from a workbook); output weeks,
+        days, and events
 
         Called by: client code
         """
-        in_week = False
-        out_buffer = []
-        for line in self.infile:
-            self.line_as_list = line.strip().split(',')[:22]
-            self.line_as_list = (
-                    self.line_as_list[:1] +
-                    [item.strip() for item in self.line_as_list[1:]]
-            )
-            date_match_obj = self._re_match_date(self.line_as_list[0])
-            if not in_week:
-                self.new_week = None
-                if date_match_obj:
-                    in_week = self._look_for_week(date_match_obj)
-            if in_week:  # 'if' is correct here
-                # output good data and discard bad data
-                in_week = self._handle_week(out_buffer)
-        # handle any data left in buffer
-        if out_buffer:
+        out_buffer = SpillingBuffer()
+        in_week = self.weeks_out(self.infile, out_buffer)
+        # handle the last week, if no blank line followed it
+        if in_week:
             self._handle_leftovers(out_buffer)
+        out_buffer.close()
+
+    def weeks_out(self, lines, out_buffer: OutBuffer) -> bool:
+        """
+        Read .csv lines; output weeks, days, and events
+
+        out_buffer carries incomplete nights from one call to the next,
+        so a sheet may be read in pieces, each piece starting at the
+        start of a week.
+
+        :return: True iff lines ended inside a week that has not yet
+                 been output
+        Called by: lines_in_weeks_out(), client code
+        """
+        if self.week_cache is not None:
+            return self._weeks_out_cached(lines, out_buffer)
+        in_week = False
+        for line in lines:
+            in_week = self._read_fields(self._split_line(line), in_week,
+                                        out_buffer)
+        return in_week
+
+    def _weeks_out_cached(self, lines, out_buffer: OutBuffer) -> bool:
+        """
+        As weeks_out(), but each block of lines from the start of a week
+        to the blank line that ends it is looked up in self.week_cache,
+        and read only if it is not found there.
+
+        A week not followed by a blank line is read as usual, and is not
+        cached.
+
+        Called by: weeks_out()
+        """
+        in_week = False
+        block, block_fields = [], []  # a week that may be in the cache
+        for line in lines:
+            fields = self._split_line(line)
+            is_date_line = bool(self._re_match_date(fields[0]))
+            if block and is_date_line:  # no blank line ended the week
+                in_week = self._read_all_fields(block_fields, False,
+                                                out_buffer)
+                block, block_fields = [], []
+            if block or (is_date_line and not in_week):
+                block.append(line)
+                block_fields.append(fields)
+                if not any(fields):  # a blank line: the week has ended
+                    self._read_block(block, block_fields, out_buffer)
+                    block, block_fields = [], []
+            else:
+                in_week = self._read_fields(fields, in_week, out_buffer)
+        return self._read_all_fields(block_fields, in_week, out_buffer)
+
+    def _read_block(self, block: List[str], block_fields: List[List[str]],
+                    out_buffer: OutBuffer) -> None:
+        """
+        Output the week in block, a week's lines ending with a blank line,
+        from self.week_cache if it is there; otherwise read it, and add
+        it to the cache if it was read without warnings.
+
+        Called by: _weeks_out_cached()
+        """
+        key = self.week_cache.block_key(block)
+        found, week = self.week_cache.get(key)
+        if found:
+            if week:
+                self.new_week = week
+                self._manage_output_buffer(out_buffer)
+            return
+        warnings_logged = self.warnings_logged
+        in_week = self._read_all_fields(block_fields[:-1], False, out_buffer)
+        # the week is output iff it is still open at the blank line
+        week = self.new_week if in_week else None
+        self._read_fields(block_fields[-1], in_week, out_buffer)
+        if self.warnings_logged == warnings_logged:
+            self.week_cache.put(key, week)
+
+    def _read_all_fields(self, fields_list: List[List[str]], in_week: bool,
+                         out_buffer: OutBuffer) -> bool:
+        """
+        Called by: _weeks_out_cached(), _read_block()
+        """
+        for fields in fields_list:
+            in_week = self._read_fields(fields, in_week, out_buffer)
+        return in_week
+
+    def _read_fields(self, fields: List[str], in_week: bool,
+                     out_buffer: OutBuffer) -> bool:
+        """
+        Read the fields of one .csv line
+
+        :return: True iff the line leaves us inside a week
+        Called by: weeks_out(), _read_all_fields(), _read_block()
+        """
+        self.line_as_list = fields
+        date_match_obj = self._re_match_date(self.line_as_list[0])
+        if not in_week:
+            self.new_week = None
+            if date_match_obj:
+                in_week = self._look_for_week(date_match_obj)
+        if in_week:  # 'if' is correct here
+            # output good data and discard bad data
+            in_week = self._handle_week(out_buffer)
+        return in_week
+
+    @staticmethod
+    def _split_line(line: Union[str, List[str]]) -> List[str]:
+        """
+        Split a .csv line into (at most) 22 fields, stripping all but the
+        first. A row from a workbook is already split.
+
+        Called by: weeks_out(), _weeks_out_cached()
+        """
+        if not isinstance(line, str):
+            return [field.strip() for field in line[:22]]
+        line_as_list = line.strip().split(',')[:22]
+        return line_as_list[:1] + [item.strip() for item in line_as_list[1:]]
 
     @staticmethod
     def _re_match_date(field: str) -> re.match:
@@ -180,10 +314,17 @@ class Extract:
             day_list = self._make_day_list(sunday_date)
             self.new_week = Week(*day_list)
         else:
-            read_logger.warning('Non-Sunday date {} found in input'.
-                                format(sunday_date))
+            self._warn_non_sunday(sunday_date)
         return bool(self.new_week)
 
+    def _warn_non_sunday(self, a_date: Optional[date]) -> None:
+        """
+        Called by: _look_for_week()
+        """
+        read_logger.warning('Non-Sunday date {} found in input'.
+                            format(a_date))
+        self.warnings_logged += 1
+
     @staticmethod
     def _is_a_sunday(dt_date: Optional[date]) -> Union[int, bool]:
         """
@@ -205,7 +346,7 @@ class Extract:
                     [])  # [] will hold Event list for Day
                 for x in range(Extract.DAYS_IN_A_WEEK)]
 
-    def _handle_week(self, out_buffer: list) -> bool:
+    def _handle_week(self, out_buffer: OutBuffer) -> bool:
         """
         if there are valid events in self.line_as_list:
             call self._get_events() to store them as Event objects in Week
@@ -224,12 +365,12 @@ class Extract:
             self._manage_output_buffer(out_buffer)
         return have_events
 
-    def _handle_leftovers(self, out_buffer: list) -> None:
+    def _handle_leftovers(self, out_buffer: OutBuffer) -> None:
         """
-        If there is data left in output_buffer, calls
-                self._manage_output_buffer().
+        If the input ended inside a week, calls
+                self._manage_output_buffer() to output that week.
 
-        Called by: lines_in_weeks_out()
+        Called by: lines_in_weeks_out(), client code
         """
         self._manage_output_buffer(out_buffer)
 
@@ -266,17 +407,22 @@ class Extract:
             elif segment == ['', '', '']:
                 an_event = None
             else:
-                read_logger.warning('segment {} not valid in _get_events()\n'
-                                    '\tsegment date is {}'.
-                                    format(segment,
-                                           self.new_week[ix].dt_date))
+                self._warn_bad_segment(segment, self.new_week[ix].dt_date)
                 continue
             if self.new_week and an_event and an_event.action:
                 self.new_week[ix].events.append(an_event)
                 have_events = True
         return have_events
 
-    def _manage_output_buffer(self, out_buffer: list) -> None:
+    def _warn_bad_segment(self, segment: List[str], a_date: date) -> None:
+        """
+        Called by: _get_events()
+        """
+        read_logger.warning('segment {} not valid in _get_events()\n'
+                            '\tsegment date is {}'.format(segment, a_date))
+        self.warnings_logged += 1
+
+    def _manage_output_buffer(self, out_buffer: OutBuffer) -> None:
         """
         Convert the Events in self.new_week into strings, place the strings
         into output buffer, and pass output buffer to _write_or_discard_night()
@@ -316,7 +462,7 @@ class Extract:
 
     def _write_or_discard_night(self, action_b_event: Event,
                                 datetime_date: date,
-                                out_buffer: list) -> None:
+                                out_buffer: OutBuffer) -> None:
         """
         Write (only) complete nights from out_buffer to outfile.
 
@@ -331,7 +477,7 @@ class Extract:
                              format(datetime_date))
             self._discard_incomplete_night(out_buffer)
 
-    def _write_complete_night(self, out_buffer: list) -> None:
+    def _write_complete_night(self, out_buffer: OutBuffer) -> None:
         """
         Write a complete night from output buffer to outfile
         Called by: _write_or_discard_night()
@@ -341,37 +487,46 @@ class Extract:
                 if line.startswith('action: b'):
                     line = line.replace('b', 'Y', 1)
                     self.in_missing_data = False
-            if self.cl_args.store_in_db == 'True' or\
-               self.cl_args.print_chart == 'True' or\
-               self.cl_args.print_debug_chart == 'True':
-                print(line, file=self.outfile)
-            if self.cl_args.store_in_db == 'True':
-                print(line)
+            self._write_line(line)
         out_buffer.clear()
+        for writer in self.writers:
+            writer.end_night()
 
-    def _discard_incomplete_night(self, out_buffer: list) -> None:
+    def _discard_incomplete_night(self, out_buffer: OutBuffer) -> None:
         """
+        Remove the Event lines of incomplete night(s) from output buffer,
+        leaving the header lines in place.
+
+        Each 3-element 'b' event line in the buffer ends a night with
+        good data; it is written out as a 'no data' line, latest first.
         Called by: _write_or_discard_night()
         """
-        # pop incomplete data from output buffer
-        for buf_ix in range(len(out_buffer) - 1, -1, -1):
-            this_line = out_buffer[buf_ix]
+        spilling = not isinstance(out_buffer, list)
+        kept = SpillingBuffer(out_buffer.max_lines) if spilling else []
+        no_data_lines = []
+        for this_line in out_buffer:
             # if we see a 3-element 'b' event, there's good data *before* it
             if self._match_complete_b_event_line(this_line):
-                no_data_line = self._get_no_data_line(out_buffer, buf_ix)
-
-                if self.cl_args.store_in_db == 'True' or \
-                   self.cl_args.print_chart == 'True' or \
-                   self.cl_args.print_debug_chart == 'True':
-                    print(no_data_line, file=self.outfile)
-                if self.cl_args.store_in_db == 'True':
-                    print(no_data_line)
-
-                # print(no_data_line, file=self.outfile)
-            elif self._match_event_line(this_line):  # pop only Event lines
-                out_buffer.pop(buf_ix)  # leave headers in buffer
+                no_data_lines.append(self._to_no_data_line(this_line))
+            elif not self._match_event_line(this_line):  # keep headers
+                kept.append(this_line)
+        for no_data_line in reversed(no_data_lines):
+            self._write_line(no_data_line)
+        out_buffer.clear()
+        out_buffer.extend(kept)
+        if spilling:
+            kept.close()
         self.in_missing_data = True
 
+    def _write_line(self, line: str) -> None:
+        """
+        Write line to the chart input file and, if storing in db, to stdout
+
+        Called by: _write_complete_night(), _discard_incomplete_night()
+        """
+        for writer in self.writers:
+            writer.write_line(line)
+
     @staticmethod
     def _match_complete_b_event_line(line: str) -> re.match:
         """
@@ -381,13 +536,13 @@ class Extract:
                         r' hours: \d{1,2}\.\d{2}$', line)
 
     @staticmethod
-    def _get_no_data_line(out_buffer: list, buf_ix: int) -> str:
+    def _to_no_data_line(line: str) -> str:
         """
-        Extract and update the next 'no data' line from buffer
-        :return: the updated line
+        Make a 3-element 'b' event line into a 2-element 'N' event line
+
         Called by: _discard_incomplete_night()
         """
-        line = out_buffer.pop(buf_ix).replace('b', 'N', 1)
+        line = line.replace('b', 'N', 1)
         if line.count(',') == 2:
             pos = line.rfind(',')
             line = line[:pos]
@@ -10,32 +10,41 @@
 Run the extract phase of the pipeline.
 
 read_fns() reads raw data from the spreadsheet, and groups it by day and week.
+
+With --check, the sheet is only validated: a summary of the problems found
+is printed as JSON, and nothing is written for the later stages.
 """
 import argparse
+import json
 import logging
-import logging.handlers
+import sys
 
+from check_sheet import SheetChecker
 import read_fns
+from src.subject import subject_from_env, subject_path
 from tests.file_access_wrappers import FileReadAccessWrapper
+from week_cache import WeekCache
 
 
 def set_up_loggers():
+    from src.logging.wire_format import make_socket_handler
+
     # from: https://docs.python.org/3/howto/
     # logging-cookbook.html#network-logging
     root_logger = logging.getLogger('')
     root_logger.setLevel(logging.INFO)
-    socket_handler = logging.handlers.SocketHandler('localhost',
-                                                    logging.handlers.
-                                                    DEFAULT_TCP_LOGGING_PORT)
+    socket_handler = make_socket_handler()
     # don't bother with a formatter, since a socket handler sends the event as
-    # an unformatted pickle
+    # an unformatted pickle or compact record
     root_logger.addHandler(socket_handler)
     # end cookbook code
 
     # read_logger will need a formatter since it is writing to file
     read_logger = logging.getLogger('extract.read_fns')
     read_logger.setLevel(logging.DEBUG)
-    file_handler = logging.FileHandler('src/extract/read_fns.log', mode='w')
+    file_handler = logging.FileHandler(
+            subject_path('src/extract/read_fns.log', subject_from_env()),
+            mode='w')
     formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
@@ -45,24 +54,55 @@ def set_up_loggers():
 
 def set_up_arg_parser():
     parser = argparse.ArgumentParser()
-    parser.add_argument('infile_name', help='The name of a .csv file to read')
-    parser.add_argument('store_in_db',
+    parser.add_argument('infile_name', help='The name of a .csv, .xlsx, or '
+                        '.ods file to read')
+    parser.add_argument('store_in_db', nargs='?', default='False',
                         help='str(True) to have load.py write to database')
-    parser.add_argument('print_chart',
+    parser.add_argument('print_chart', nargs='?', default='False',
                         help='str(True) to have chart_new.py print a chart')
-    parser.add_argument('print_debug_chart',
+    parser.add_argument('print_debug_chart', nargs='?', default='False',
                         help='str(True) to have chart_new.py print a '
                              'debug chart')
+    parser.add_argument('-n', '--no-week-cache', action='store_true',
+                        help='parse every week, rather than loading '
+                             'unchanged weeks from <infile_name>.weeks')
+    parser.add_argument('-k', '--check', action='store_true',
+                        help='only validate the sheet, and print a JSON '
+                             'summary of the problems found')
     my_args = parser.parse_args()
     return my_args
 
 
+def check(infile_name):
+    """
+    Print a summary of the problems in the sheet.
+
+    :return: 1 if there are any, else 0
+    Called by: __main__()
+    """
+    infile = read_fns.open_infile(FileReadAccessWrapper(infile_name))
+    try:
+        summary = SheetChecker(infile).check()
+    finally:
+        if hasattr(infile, 'close'):
+            infile.close()
+    print(json.dumps(summary, indent=2))
+    return int(bool(summary['non_sunday_dates'] or summary['bad_segments'] or
+                    summary['incomplete_nights']))
+
+
 if __name__ == '__main__':
+    args = set_up_arg_parser()
+    if args.check:
+        sys.exit(check(args.infile_name))
     set_up_loggers()
     logging.info('extract start')
-    args = set_up_arg_parser()
     infile = read_fns.open_infile(FileReadAccessWrapper(args.infile_name))
-    with read_fns.Extract(infile, args) as extract:
+    week_cache = (None if args.no_week_cache else
+                  WeekCache.load(args.infile_name + '.weeks'))
+    with read_fns.Extract(infile, args, week_cache) as extract:
         # extract = read_fns.Extract(infile, args)
         extract.lines_in_weeks_out()
+    if week_cache:
+        week_cache.save()
     logging.info('extract finish')
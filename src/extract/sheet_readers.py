@@ -0,0 +1,250 @@
+# file: src/extract/sheet_readers.py
+# 2026-10-19
+
+"""
+Read rows straight from an .xlsx or .ods workbook, so that the sheet
+need not be exported to .csv first.
+
+Both formats are zip files holding XML. The worksheet XML is read with
+an incremental parser, and each row is removed from the tree once it has
+been yielded, so memory use does not grow with the size of the workbook.
+Only the first worksheet is read.
+
+Each row is yielded as a list of ROW_WIDTH strings, formatted as in the
+.csv export that Extract reads:
+    column 0, the Sunday date      '12/4/2016'
+    each action column             'b', 's', or 'w'
+    each time column               '23:45'
+    each hours column              '4.00'
+Blank rows, which end each week, are yielded as rows of empty strings,
+including rows the workbook leaves out.
+"""
+import datetime
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+
+ROW_WIDTH = 22  # the date column, then 7 days of (action, time, hours)
+
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_REL_NS = ('{http://schemas.openxmlformats.org/officeDocument/2006/'
+               'relationships}')
+PKG_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+ODS_TABLE_NS = '{urn:oasis:names:tc:opendocument:xmlns:table:1.0}'
+ODS_OFFICE_NS = '{urn:oasis:names:tc:opendocument:xmlns:office:1.0}'
+ODS_TEXT_NS = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+
+SHEET_SUFFIXES = ('.xlsx', '.ods')
+
+
+def open_sheet(path):
+    """
+    :return: an iterator over the rows of the first worksheet in the
+             .xlsx or .ods file at path
+    Called by: read_fns.open_infile()
+    """
+    if str(path).lower().endswith('.ods'):
+        return ods_rows(path)
+    return xlsx_rows(path)
+
+
+def xlsx_rows(path):
+    """
+    :yield: each row of the first worksheet of an .xlsx file
+    """
+    with zipfile.ZipFile(path) as book:
+        shared_strings = xlsx_shared_strings(book)
+        base_date = datetime.date(1899, 12, 30)
+        with book.open('xl/workbook.xml') as infile:
+            workbook = ET.parse(infile).getroot()
+        properties = workbook.find(XLSX_NS + 'workbookPr')
+        if properties is not None and \
+                properties.get('date1904') in ('1', 'true'):
+            base_date = datetime.date(1904, 1, 1)
+        row_num = 0
+        with book.open(xlsx_first_sheet(book, workbook)) as infile:
+            for elem in iter_elements(infile, (XLSX_NS + 'row',)):
+                this_row_num = int(elem.get('r', row_num + 1))
+                for _ in range(row_num + 1, this_row_num):  # left out
+                    yield [''] * ROW_WIDTH
+                row_num = this_row_num
+                row = [''] * ROW_WIDTH
+                for col, cell in enumerate(elem.iter(XLSX_NS + 'c')):
+                    col = column_index(cell.get('r'), col)
+                    if col < ROW_WIDTH:
+                        row[col] = xlsx_cell_text(cell, col, shared_strings,
+                                                  base_date)
+                yield row
+
+
+def iter_elements(infile, tags):
+    """
+    Parse the XML in infile incrementally.
+
+    :yield: each element whose tag is in tags, once it is complete; when
+            the next element is asked for, it is cleared, and removed
+            from its parent, so that the tree parsed so far does not
+            grow with the number of such elements
+    """
+    open_elems = []  # the element being parsed, and its ancestors
+    for event, elem in ET.iterparse(infile, events=('start', 'end')):
+        if event == 'start':
+            open_elems.append(elem)
+            continue
+        open_elems.pop()
+        if elem.tag in tags:
+            yield elem
+            elem.clear()
+            if open_elems:
+                open_elems[-1].remove(elem)
+
+
+def xlsx_shared_strings(book):
+    """
+    :return: the list of strings that cells of type 's' index into
+    """
+    try:
+        infile = book.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with infile:
+        for elem in iter_elements(infile, (XLSX_NS + 'si',)):
+            strings.append(''.join(t.text or ''
+                                   for t in elem.iter(XLSX_NS + 't')))
+    return strings
+
+
+def xlsx_first_sheet(book, workbook):
+    """
+    :return: the name, within the zip file, of the first worksheet
+    """
+    sheet = workbook.find(XLSX_NS + 'sheets/' + XLSX_NS + 'sheet')
+    rel_id = sheet.get(XLSX_REL_NS + 'id') if sheet is not None else None
+    with book.open('xl/_rels/workbook.xml.rels') as infile:
+        for rel in ET.parse(infile).getroot().iter(PKG_REL_NS +
+                                                   'Relationship'):
+            if rel.get('Id') == rel_id:
+                target = rel.get('Target')
+                return (target.lstrip('/') if target.startswith('/')
+                        else 'xl/' + target)
+    return 'xl/worksheets/sheet1.xml'
+
+
+def column_index(cell_ref, default):
+    """
+    'C12' => 2
+    """
+    if not cell_ref:
+        return default
+    letters = re.match(r'[A-Z]+', cell_ref).group()
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+def xlsx_cell_text(cell, col, shared_strings, base_date):
+    """
+    :return: the value of an .xlsx cell, formatted for column col
+    """
+    cell_type = cell.get('t', 'n')
+    if cell_type == 'inlineStr':
+        return ''.join(t.text or '' for t in cell.iter(XLSX_NS + 't'))
+    value = cell.findtext(XLSX_NS + 'v')
+    if value is None:
+        return ''
+    if cell_type == 's':
+        return shared_strings[int(value)]
+    if cell_type in ('str', 'b', 'e'):
+        return value
+    return number_text(float(value), col, base_date)
+
+
+def ods_rows(path):
+    """
+    :yield: each row of the first table of an .ods file
+
+    Repeated rows and cells are expanded, except for the empty rows an
+    .ods file may repeat to the bottom of the sheet.
+    """
+    with zipfile.ZipFile(path) as book:
+        with book.open('content.xml') as infile:
+            blank_rows = 0  # held back until a later row holds data
+            for elem in iter_elements(infile, (ODS_TABLE_NS + 'table',
+                                               ODS_TABLE_NS + 'table-row')):
+                if elem.tag == ODS_TABLE_NS + 'table':
+                    break  # the first table is done
+                row = ods_row(elem)
+                repeat = int(elem.get(ODS_TABLE_NS + 'number-rows-repeated',
+                                      1))
+                if not any(row):
+                    blank_rows += repeat
+                    continue
+                for _ in range(blank_rows):
+                    yield [''] * ROW_WIDTH
+                blank_rows = 0
+                for _ in range(repeat):
+                    yield list(row)
+            for _ in range(min(blank_rows, 2)):  # enough to end a week
+                yield [''] * ROW_WIDTH
+
+
+def ods_row(row_elem):
+    """
+    :return: the cells of an .ods table-row element, as strings
+    """
+    row = []
+    for cell in row_elem:
+        if cell.tag not in (ODS_TABLE_NS + 'table-cell',
+                            ODS_TABLE_NS + 'covered-table-cell'):
+            continue
+        repeat = int(cell.get(ODS_TABLE_NS + 'number-columns-repeated', 1))
+        for _ in range(min(repeat, ROW_WIDTH - len(row))):
+            row.append(ods_cell_text(cell, len(row)))
+        if len(row) == ROW_WIDTH:
+            break
+    return row + [''] * (ROW_WIDTH - len(row))
+
+
+def ods_cell_text(cell, col):
+    """
+    :return: the value of an .ods cell, formatted for column col
+    """
+    value_type = cell.get(ODS_OFFICE_NS + 'value-type')
+    if value_type == 'date':
+        return date_text(datetime.date.fromisoformat(
+                cell.get(ODS_OFFICE_NS + 'date-value')[:10]))
+    if value_type == 'time':  # e.g., 'PT23H45M00S'
+        match = re.match(r'PT(\d+)H(\d+)M',
+                         cell.get(ODS_OFFICE_NS + 'time-value'))
+        return '{}:{}'.format(int(match.group(1)) % 24, match.group(2))
+    if value_type in ('float', 'percentage', 'currency'):
+        return number_text(float(cell.get(ODS_OFFICE_NS + 'value')), col,
+                           None)
+    return '\n'.join(''.join(p.itertext())
+                     for p in cell.iter(ODS_TEXT_NS + 'p'))
+
+
+def number_text(number, col, base_date):
+    """
+    Format a number as the .csv export would show it in column col:
+    a date serial number in the date column, a fraction of a day in a
+    time column, and hours to two decimal places in an hours column.
+    """
+    if col == 0 and base_date:
+        return date_text(base_date + datetime.timedelta(days=int(number)))
+    if col % 3 == 2:  # a time column
+        minutes = round(number % 1 * 24 * 60)
+        return '{}:{:02d}'.format(minutes // 60 % 24, minutes % 60)
+    if col % 3 == 0:  # an hours column
+        return '{:.2f}'.format(number)
+    return '{:g}'.format(number)
+
+
+def date_text(a_date):
+    """
+    datetime.date => 'M/D/YYYY'
+    """
+    return '{}/{}/{}'.format(a_date.month, a_date.day, a_date.year)
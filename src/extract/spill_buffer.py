@@ -0,0 +1,81 @@
+# file: src/extract/spill_buffer.py
+# 2026-10-19
+
+"""
+A list-like buffer of strings whose memory use is bounded.
+
+Extract holds output lines in a buffer until it knows whether the night
+they belong to is complete. A long run of incomplete nights, or a sheet
+with no complete nights at all, would otherwise hold every line of the
+input in memory.
+
+SpillingBuffer keeps at most max_lines lines in memory. When it holds
+more, it moves the lines it holds in memory, oldest first, to the end
+of a temporary file. Iterating over the buffer reads the spilled lines
+back from the file before yielding those still in memory.
+
+Only the operations Extract uses are provided: append(), extend(),
+clear(), len(), iteration, and truth testing.
+"""
+import json
+import os
+
+
+MAX_LINES_IN_MEMORY = 10000
+
+
+class SpillingBuffer:
+    def __init__(self, max_lines=MAX_LINES_IN_MEMORY):
+        self.max_lines = max_lines
+        self.lines = []  # the newest lines
+        self.spill_file = None  # the oldest lines, one JSON string each
+        self.num_spilled = 0
+
+    def append(self, line: str) -> None:
+        self.lines.append(line)
+        if len(self.lines) > self.max_lines:
+            self._spill()
+
+    def extend(self, lines) -> None:
+        for line in lines:
+            self.append(line)
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.close()
+
+    def close(self) -> None:
+        """Discard the spill file, and any lines in it"""
+        if self.spill_file:
+            self.spill_file.close()
+            self.spill_file = None
+        self.num_spilled = 0
+
+    def __len__(self) -> int:
+        return self.num_spilled + len(self.lines)
+
+    def __iter__(self):
+        if self.spill_file:
+            self.spill_file.seek(0)
+            for encoded in self.spill_file:
+                yield json.loads(encoded)
+        yield from self.lines
+
+    def _spill(self) -> None:
+        """
+        Move the lines held in memory to the end of the spill file.
+
+        Lines are stored as JSON strings, as a line may itself hold
+        newlines (e.g., a week header).
+
+        Called by: append()
+        """
+        if self.spill_file is None:
+            import tempfile  # only a pathological input gets this far
+
+            self.spill_file = tempfile.TemporaryFile('w+', encoding='utf-8')
+        self.spill_file.seek(0, os.SEEK_END)
+        self.spill_file.writelines(json.dumps(line) + '\n'
+                                   for line in self.lines)
+        self.num_spilled += len(self.lines)
+        self.lines.clear()
@@ -0,0 +1,184 @@
+# file: src/extract/week_cache.py
+# 2026-10-19
+
+"""
+An on-disk cache of parsed weeks, so that a re-run of the extract stage
+need not re-validate the weeks of the sheet that have not changed.
+
+A week's block of .csv lines, from the line holding its Sunday date to
+the blank line that ends it, is keyed by a hash of its text. The cache
+maps each key to the Week that Extract built from the block, or to None
+if the block yielded no Week to output.
+
+The cache is kept in a single file next to the .csv file: a header,
+then the entries as zlib-compressed JSON, so that reading the file runs
+no code from it. It holds at most max_weeks entries; when it is full,
+the least recently used entry is dropped. A cache file written by
+another CACHE_VERSION is ignored, so CACHE_VERSION must change whenever
+the parsing of a week, or the format of the file, does.
+"""
+from collections import OrderedDict
+import datetime
+import hashlib
+import json
+import logging
+import os
+import zlib
+
+from container_objs import Week, Day, Event
+
+
+CACHE_MAGIC = b'SLWK'
+CACHE_VERSION = 2
+CACHE_HEADER = CACHE_MAGIC + CACHE_VERSION.to_bytes(2, 'little')
+MAX_WEEKS = 5000  # almost a century of weeks
+
+cache_logger = logging.getLogger('extract.week_cache')
+
+
+class WeekCache:
+    def __init__(self, path, max_weeks=MAX_WEEKS):
+        self.path = path
+        self.max_weeks = max_weeks
+        self.entries = OrderedDict()  # least recently used first
+        self.changed = False
+
+    @classmethod
+    def load(cls, path, max_weeks=MAX_WEEKS):
+        """
+        :return: the cache saved at path, or an empty cache if there is
+                 none, or if it is unreadable or from another version
+        """
+        cache = cls(path, max_weeks)
+        try:
+            with open(path, 'rb') as infile:
+                if infile.read(len(CACHE_HEADER)) == CACHE_HEADER:
+                    cache.entries = entries_from_bytes(infile.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, zlib.error, ValueError, TypeError):
+            cache_logger.warning('Ignoring unreadable week cache {}'.
+                                 format(path))
+        return cache
+
+    def save(self):
+        """
+        Write the cache to its file, if it has changed.
+
+        The file is replaced in a single step, so a reader never sees
+        a half-written cache.
+        """
+        if not self.changed:
+            return
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as outfile:
+                outfile.write(CACHE_HEADER)
+                outfile.write(entries_to_bytes(self.entries))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            cache_logger.warning('Could not save week cache {}: {}'.
+                                 format(self.path, e))
+        else:
+            self.changed = False
+
+    @staticmethod
+    def block_key(lines):
+        """
+        :return: the cache key for a block of .csv lines, or of rows
+                 from a workbook, each a list of fields
+        """
+        text = ''.join(line if isinstance(line, str) else
+                       ','.join(line) + '\n' for line in lines)
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+    def get(self, key):
+        """
+        :return: (True, the Week or None) if key is in the cache,
+                 else (False, None)
+        """
+        try:
+            encoded = self.entries[key]
+        except KeyError:
+            return False, None
+        self.entries.move_to_end(key)
+        return True, decode_week(encoded)
+
+    def put(self, key, week):
+        self.entries[key] = encode_week(week)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_weeks:
+            self.entries.popitem(last=False)
+        self.changed = True
+
+
+def entries_to_bytes(entries):
+    """
+    The cache's entries => the body of its file
+
+    Called by: WeekCache.save()
+    """
+    text = json.dumps([[key.hex(), encoded] for key, encoded in
+                       entries.items()], separators=(',', ':'))
+    return zlib.compress(text.encode('utf-8'))
+
+
+def entries_from_bytes(body):
+    """
+    The inverse of entries_to_bytes(), checking that each entry is one
+    that encode_week() could have made
+
+    :raise zlib.error, ValueError, or TypeError: if body is not such
+    Called by: WeekCache.load()
+    """
+    pairs = json.loads(zlib.decompress(body).decode('utf-8'))
+    if not isinstance(pairs, list):
+        raise ValueError('week cache is not a list of entries')
+    entries = OrderedDict()
+    for key, encoded in pairs:
+        entries[bytes.fromhex(key)] = check_encoded_week(encoded)
+    return entries
+
+
+def check_encoded_week(encoded):
+    """
+    :return: encoded, read back from JSON, as encode_week()'s tuples
+    :raise ValueError or TypeError: if it is not an encoded week
+    Called by: entries_from_bytes()
+    """
+    if encoded is None:
+        return None
+    sunday_ordinal, days = encoded
+    if not isinstance(sunday_ordinal, int) or \
+            not 1 <= sunday_ordinal <= datetime.date.max.toordinal() - 6:
+        raise ValueError('bad date in week cache: {!r}'.format(sunday_ordinal))
+    days = tuple(tuple(tuple(event) for event in events) for events in days)
+    if len(days) != 7 or not all(
+            len(event) == 3 and all(isinstance(field, str) for field in event)
+            for events in days for event in events):
+        raise ValueError('bad week in week cache')
+    return sunday_ordinal, days
+
+
+def encode_week(week):
+    """
+    Week => plain tuples, which store compactly as JSON and can be read
+    back without reference to the classes in container_objs
+    """
+    if week is None:
+        return None
+    return (week[0].dt_date.toordinal(),
+            tuple(tuple(tuple(event) for event in day.events)
+                  for day in week))
+
+
+def decode_week(encoded):
+    """
+    The inverse of encode_week()
+    """
+    if encoded is None:
+        return None
+    sunday_ordinal, days = encoded
+    return Week(*[Day(datetime.date.fromordinal(sunday_ordinal + ix),
+                      [Event(*event) for event in events])
+                  for ix, events in enumerate(days)])
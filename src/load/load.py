@@ -5,16 +5,48 @@
 # 2017-02-20
 
 
+import argparse
+from collections import Counter, namedtuple
 import fileinput
+import hashlib
+import itertools
 import logging
-import logging.handlers
 import os
+import queue
+import re
 import sys
+import threading
 
-from sqlalchemy import create_engine, func
+from src.analytics.sleep_index import periods_from_transform_output
+from src.subject import check_subject, subject_from_env, subject_path
 
 
-TEMP_STORE_NIGHT_CTR = 0
+ld_logger = logging.getLogger('load.load')
+
+BATCH_SIZE = 50  # nights handed to the writer thread at a time
+MAX_BATCHES_IN_FLIGHT = 4  # batches queued before the reader must wait
+PARTITIONS_IN_FLIGHT_PER_WORKER = 2  # bounds memory in a partitioned load
+ROW_LOG_SAMPLE = 1000  # log one row in this many of each outcome
+DEFAULT_SUBJECT_ID = 1  # owns the nights of loads that name no subject
+
+# the date range read for one partition, and the rows inserted into it
+PartitionCounts = namedtuple('PartitionCounts',
+                             'first_date, last_date, nights, naps')
+
+# SQLAlchemy takes longer to import than the rest of this stage, so the
+# names used from it are bound by import_sqlalchemy(), once connect() is
+# called, and the db is known to be needed
+create_engine = func = literal_column = select = text = None
+
+
+def import_sqlalchemy():
+    """
+    Bind the names used from SQLAlchemy in this module.
+
+    Called by: connect()
+    """
+    global create_engine, func, literal_column, select, text
+    from sqlalchemy import create_engine, func, literal_column, select, text
 
 
 def decimal_to_interval(dec_str):
@@ -35,115 +67,1031 @@ def decimal_to_interval(dec_str):
     return interval_str
 
 
-def read_nights_naps(eng, infile_name):
+def read_nights_naps(eng, infile_name, resume=False,
+                     subject_id=DEFAULT_SUBJECT_ID):
     """
     Read NIGHT and NAP data from infile_name;
     call function to load that data into database.
 
+    Lines are grouped into nights, and nights into batches. The batches
+    are stored by a BatchWriter thread, so reading and parsing the next
+    batch overlaps with the db round trips for the current one. The
+    round trips themselves are made one at a time, on one connection.
+
+    Each batch is committed in a transaction of its own, together with a
+    checkpoint in sl_load_checkpoint recording how far into the input
+    the load has got, so a failure loses only the batch being stored.
+    The checkpoint is removed once all of the input has been stored.
+    The partitions for each year are created before the first batch
+    in that year is queued.
+
     :param eng: the db engine
     :param infile_name: read data from file or stdin
+    :param resume: if True, skip the nights already committed by an
+                   earlier load of the same input that did not finish
+    :param subject_id: the subject the nights belong to
     :return: None
     Called by: connect()
     """
-    global TEMP_STORE_NIGHT_CTR
-
-    with fileinput.input(infile_name) as data_source:
-        connection = eng.connect()
-        trans = connection.begin()
+    with fileinput.input(infile_name) as data_source, \
+            eng.connect() as connection:
+        nights = read_nights(data_source)
+        store = CheckpointedStore(infile_name, subject_id)
+        if resume:
+            store.skip_to_checkpoint(connection, nights)
+        writer = BatchWriter(connection, store_fn=store)
+        writer.start()
         try:
-            keep_going = True
-            while keep_going:
-                my_line = data_source.readline()
-                keep_going = store_nights_naps(connection, my_line)
-            trans.commit()
+            for batch in with_year_partitions(eng, batch_nights(nights)):
+                writer.put(batch)
+            writer.finish()
         except Exception:
-            trans.rollback()
+            writer.abort()
             raise
+        clear_checkpoint(connection, store.source)
+
+
+def read_nights(data_source):
+    """
+    Group the lines from data_source into nights.
+
+    A night is a NIGHT line followed by the NAP lines that belong to it.
+    Reading stops at eof, or at the first line that is neither a NIGHT
+    nor a NAP.
+
+    :param data_source: an iterable of lines from the transform stage
+    :yield: a list of the lines for one night
+    Called by: read_nights_naps()
+    """
+    night = []
+    for line in data_source:
+        kind = line.split(', ', 1)[0].rstrip()
+        if kind not in ('NIGHT', 'NAP'):
+            break
+        if kind == 'NIGHT' and night:
+            yield night
+            night = []
+        night.append(line)
+    if night:
+        yield night
+
+
+def batch_nights(nights, batch_size=BATCH_SIZE):
+    """
+    Group nights into lists of (at most) batch_size nights.
+
+    :yield: a list of nights
+    Called by: read_nights_naps()
+    """
+    batch = []
+    for night in nights:
+        batch.append(night)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def store_batch(connection, batch, subject_id=DEFAULT_SUBJECT_ID,
+                stats=None):
+    """
+    Insert each night in batch into the db, as nights of subject
+    subject_id. sl_night and sl_nap must already have partitions for
+    the years the nights are in.
+
+    :param stats: the LoadStats to count the rows in, if not load_stats
+    Called by: BatchWriter.run(), load_partition()
+    """
+    for night in batch:
+        store_night(connection, night, subject_id, stats)
+
+
+def with_year_partitions(eng, batches):
+    """
+    Pass batches of nights through, first creating the sl_night and
+    sl_nap partitions for any year not seen in an earlier batch.
+
+    Creating a partition locks sl_night and sl_nap until the end of the
+    transaction it is created in. So the partitions are created here, in
+    short transactions of their own, before a batch is handed to the
+    thread that stores it, rather than by the transaction that stores
+    the batch, which would block every other loader until it committed.
+
+    :param batches: lists of nights
+    :yield: each of batches
+    Called by: read_nights_naps(), read_nights_naps_partitioned()
+    """
+    years_done = set()
+    with eng.connect() as connection:
+        for batch in batches:
+            years = {night_year(night) for night in batch} - {None}
+            if years - years_done:
+                create_year_partitions(connection, years - years_done)
+                years_done |= years
+            yield batch
+
+
+def create_year_partitions(connection, years):
+    """
+    Make sure sl_night and sl_nap have partitions for each of years, in
+    a transaction of its own.
+
+    :param connection: an open db connection, not in a transaction
+    Called by: with_year_partitions(), merge_nights()
+    """
+    with connection.begin():
+        for year in sorted(years):
+            connection.execute(func.sl_create_year_partitions(year))
+
+
+def night_year(night):
+    """
+    :return: the year of night's start date, as an int, or None if night
+             has no NIGHT line
+    Called by: with_year_partitions(), merge_nights()
+    """
+    month = night_month(night)
+    return int(month[:4]) if month else None
+
+
+def store_night(connection, night, subject_id=DEFAULT_SUBJECT_ID,
+                stats=None):
+    """
+    Insert a night, and the naps that belong to it, into the db.
+
+    The night_id returned for the NIGHT line is passed explicitly with
+    each of its NAP lines, so nap-to-night linkage does not depend on
+    the night_id sequence of the current session: nights may be stored
+    in any order, over any number of connections.
+
+    :param connection: an open db connection
+    :param night: a NIGHT line followed by its NAP lines
+    :param subject_id: the subject the night belongs to
+    :param stats: the LoadStats to count the rows in, if not load_stats
+    :return: None
+    Called by: store_batch()
+
+    The night's row in sl_night_summary is written at the same time.
+    """
+    night_id = None
+    fingerprint = night_fingerprint(night)
+    night_start_date = night[0].split(', ')[1]
+    for line, sleep_period in zip(night, night_sleep_periods(night)):
+        night_id = store_nights_naps(connection, line, night_id, fingerprint,
+                                     sleep_period, night_start_date,
+                                     subject_id, stats)
+    if night_id is not None:
+        store_night_summary(connection, night_id, night, subject_id)
+
+
+def night_sleep_periods(night):
+    """
+    Work out the absolute start and end of each of a night's naps.
+
+    :return: a list with an entry for each line of night: None for the
+             NIGHT line, and a tsrange literal (e.g.,
+             '[2016-12-07 23:45, 2016-12-08 03:45)') for each NAP line
+    Called by: store_night(), update_night()
+    """
+    if not night[0].startswith('NIGHT'):
+        return [None] * len(night)
+    return [None] + ['[{:%Y-%m-%d %H:%M}, {:%Y-%m-%d %H:%M})'.format(*period)
+                     for period in periods_from_transform_output(night)]
+
+
+def store_night_summary(connection, night_id, night,
+                        subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Insert or overwrite the sl_night_summary row for night night_id.
+
+    Called by: store_night(), update_night()
+    """
+    connection.execute(
+        text('INSERT INTO sl_night_summary (night_id, start_date, '
+             'start_time, total_sleep, first_sleep_start, '
+             'first_sleep_duration, nap_count, subject_id) '
+             'VALUES (:night_id, :start_date, :start_time, :total_sleep, '
+             ':first_sleep_start, :first_sleep_duration, :nap_count, '
+             ':subject_id) '
+             'ON CONFLICT (night_id) DO UPDATE SET '
+             'total_sleep = EXCLUDED.total_sleep, '
+             'first_sleep_start = EXCLUDED.first_sleep_start, '
+             'first_sleep_duration = EXCLUDED.first_sleep_duration, '
+             'nap_count = EXCLUDED.nap_count'),
+        night_id=night_id, subject_id=subject_id, **summarise_night(night))
+
+
+def summarise_night(night):
+    """
+    Work out a night's summary values from its lines.
+
+    The first nap of a night is its first sleep.
+
+    :return: a dict holding start_date, start_time, total_sleep,
+             first_sleep_start, first_sleep_duration, and nap_count
+    Called by: store_night_summary()
+    """
+    night_list = night[0].rstrip().split(', ')
+    nap_lists = [line.rstrip().split(', ') for line in night[1:]]
+    minutes = [interval_to_minutes(decimal_to_interval(nap_list[2]))
+               for nap_list in nap_lists]
+    return {'start_date': night_list[1],
+            'start_time': night_list[2],
+            'total_sleep': minutes_to_interval(sum(minutes)),
+            'first_sleep_start': nap_lists[0][1] if nap_lists else None,
+            'first_sleep_duration': (minutes_to_interval(minutes[0])
+                                     if minutes else None),
+            'nap_count': len(nap_lists)}
+
+
+def interval_to_minutes(interval_str):
+    """
+    '3:15' => 195
+    Called by: summarise_night()
+    """
+    hrs, mins = interval_str.split(':')
+    return int(hrs) * 60 + int(mins)
+
+
+def minutes_to_interval(minutes):
+    """
+    195 => '3:15'
+    Called by: summarise_night()
+    """
+    return '{}:{:02d}'.format(minutes // 60, minutes % 60)
+
+
+def night_fingerprint(night):
+    """
+    :return: a digest of the lines making up a night; it changes whenever
+             the night's start, its no-data flags, or any of its naps do
+    Called by: store_night(), reload_nights_naps()
+    """
+    canonical = '\n'.join(line.rstrip() for line in night)
+    return hashlib.md5(canonical.encode()).hexdigest()
+
+
+class BatchWriter(threading.Thread):
+    """
+    Store batches of nights on a db connection from a background thread.
+
+    There is a single writer, on a single connection, so the db round
+    trips for the nights of a batch, and the batches themselves, still
+    run one after another: what overlaps them is the reading and parsing
+    of the input. One writer keeps the batches, and the checkpoints
+    committed with them, in input order. For concurrent db writes, load
+    with --workers: read_nights_naps_partitioned() gives each worker a
+    connection of its own.
+
+    The queue between the reader and the writer is bounded: put() blocks
+    while max_in_flight batches are waiting, so memory use stays flat
+    however large the input is. An exception raised while storing is
+    kept, and re-raised in the reading thread by the next put() or by
+    finish().
+    """
+    _DONE = None
+
+    def __init__(self, connection, max_in_flight=MAX_BATCHES_IN_FLIGHT,
+                 store_fn=store_batch):
+        super().__init__(daemon=True)
+        self.connection = connection
+        self.store_fn = store_fn
+        self.batches = queue.Queue(maxsize=max_in_flight)
+        self.error = None
+        self.aborted = False
+
+    def run(self):
+        while True:
+            batch = self.batches.get()
+            if batch is BatchWriter._DONE:
+                return
+            # after an error or an abort, keep draining the queue so that
+            # a blocked put() is released, but don't touch the db
+            if self.error is None and not self.aborted:
+                try:
+                    self.store_fn(self.connection, batch)
+                except Exception as e:
+                    self.error = e
+
+    def put(self, batch):
+        """
+        Queue a batch for storing; block if too many are in flight.
+
+        Called by: read_nights_naps()
+        """
+        self._raise_if_failed()
+        self.batches.put(batch)
+
+    def finish(self):
+        """
+        Wait until every queued batch has been stored.
+
+        Called by: read_nights_naps()
+        """
+        self.batches.put(BatchWriter._DONE)
+        self.join()
+        self._raise_if_failed()
+
+    def abort(self):
+        """
+        Stop storing batches, and wait for the thread to exit.
+
+        Called by: read_nights_naps()
+        """
+        self.aborted = True
+        if self.is_alive():
+            self.batches.put(BatchWriter._DONE)
+            self.join()
+
+    def _raise_if_failed(self):
+        if self.error is not None:
+            raise self.error
+
+
+class CheckpointedStore:
+    """
+    A BatchWriter store_fn that commits each batch of nights, and a
+    checkpoint, in a transaction of its own.
+
+    The checkpoint for an input records the start date of the last night
+    committed, and the number of nights read from the input so far.
+    Inputs for a subject other than the default one are told apart by
+    prefixing '<subject_id>:' to their names.
+    """
+    def __init__(self, source, subject_id=DEFAULT_SUBJECT_ID):
+        """
+        :param source: the input file name, or '-' for stdin
+        :param subject_id: the subject the nights belong to
+        """
+        self.source = source if subject_id == DEFAULT_SUBJECT_ID else \
+            '{}:{}'.format(subject_id, source)
+        self.subject_id = subject_id
+        self.nights_done = 0
+        self.last_date = None
+
+    def __call__(self, connection, batch):
+        with connection.begin():
+            store_batch(connection, batch, self.subject_id)
+            self.nights_done += len(batch)
+            self.last_date = next(filter(None, map(night_date,
+                                                   reversed(batch))),
+                                  self.last_date)
+            save_checkpoint(connection, self.source, self.last_date,
+                            self.nights_done)
+
+    def skip_to_checkpoint(self, connection, nights):
+        """
+        Read past the nights committed by an earlier load of this input.
+
+        :param nights: an iterator over the input's nights
+        :raise RuntimeError: if the input ends before the checkpoint, or
+                             does not match it
+        Called by: read_nights_naps()
+        """
+        checkpoint = fetch_checkpoint(connection, self.source)
+        if checkpoint is None:
+            logging.info('no checkpoint for %s; loading from the start',
+                         self.source)
+            return
+        for night in itertools.islice(nights, checkpoint['nights_done']):
+            self.nights_done += 1
+            self.last_date = night_date(night) or self.last_date
+        if self.nights_done < checkpoint['nights_done'] or \
+                str(self.last_date) != str(checkpoint['last_date']):
+            raise RuntimeError('input {} does not match its checkpoint'.
+                               format(self.source))
+        logging.info('resuming load after %d nights, at %s',
+                     self.nights_done, self.last_date)
+
+
+def fetch_checkpoint(connection, source):
+    """
+    :return: the sl_load_checkpoint row for source, or None
+    Called by: CheckpointedStore.skip_to_checkpoint()
+    """
+    return connection.execute(
+        text('SELECT last_date, nights_done FROM sl_load_checkpoint '
+             'WHERE source = :source'),
+        source=source).fetchone()
+
+
+def save_checkpoint(connection, source, last_date, nights_done):
+    """
+    Called by: CheckpointedStore.__call__()
+    """
+    connection.execute(
+        text('INSERT INTO sl_load_checkpoint '
+             '(source, last_date, nights_done, updated_at) '
+             'VALUES (:source, :last_date, :nights_done, now()) '
+             'ON CONFLICT (source) DO UPDATE SET '
+             'last_date = EXCLUDED.last_date, '
+             'nights_done = EXCLUDED.nights_done, '
+             'updated_at = EXCLUDED.updated_at'),
+        source=source, last_date=last_date, nights_done=nights_done)
+
+
+def clear_checkpoint(connection, source):
+    """
+    Called by: read_nights_naps()
+    """
+    connection.execute(
+        text('DELETE FROM sl_load_checkpoint WHERE source = :source'),
+        source=source)
+
+
+def read_nights_naps_partitioned(eng, infile_name, workers,
+                                 subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Read NIGHT and NAP data from infile_name, and load it into the db as
+    a number of partitions, each covering one calendar month.
+
+    Partitions are loaded concurrently by up to 'workers' threads, each
+    using its own pooled connection and its own transaction. A failed
+    partition is rolled back without affecting the others. When all
+    partitions are done, the row counts in the db are checked against
+    the rows each partition inserted. The sl_night and sl_nap partitions
+    for each year are created before the first month in that year is
+    handed to a worker.
+
+    :param eng: the db engine
+    :param infile_name: read data from file or stdin
+    :param workers: the number of partitions to load at once
+    :param subject_id: the subject the nights belong to
+    :return: None
+    Called by: update_db()
+    """
+    from concurrent.futures import (ThreadPoolExecutor, wait,
+                                    FIRST_COMPLETED, ALL_COMPLETED)
+
+    max_in_flight = workers * PARTITIONS_IN_FLIGHT_PER_WORKER
+    done = []
+    with fileinput.input(infile_name) as data_source, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for nights in with_year_partitions(
+                eng, partition_nights(read_nights(data_source))):
+            if len(in_flight) >= max_in_flight:
+                finished, in_flight = wait(in_flight,
+                                           return_when=FIRST_COMPLETED)
+                done.extend(finished)
+            in_flight.add(executor.submit(load_partition, eng, nights,
+                                          subject_id))
+        finished, _ = wait(in_flight, return_when=ALL_COMPLETED)
+        done.extend(finished)
+    # raise the first failure, if there was one, only after every
+    # partition has either committed or rolled back
+    partition_counts = [future.result() for future in done]
+    check_partition_counts(eng, partition_counts, subject_id)
+
+
+def partition_nights(nights):
+    """
+    Group consecutive nights by the month of their start date.
+
+    Any NAP lines seen before the first NIGHT line make up a partition
+    of their own.
+
+    :param nights: lists of lines, as yielded by read_nights()
+    :yield: a list of the nights in one partition
+    Called by: read_nights_naps_partitioned()
+    """
+    for _, group in itertools.groupby(nights, key=night_month):
+        yield list(group)
+
+
+def night_month(night):
+    """
+    :return: the 'YYYY-MM' start month of night, or None if night has
+             no NIGHT line
+    Called by: partition_nights()
+    """
+    start_date = night_date(night)
+    return start_date[:7] if start_date else None
+
+
+def night_date(night):
+    """
+    :return: the 'YYYY-MM-DD' start date of night, or None if night has
+             no NIGHT line
+    Called by: night_month(), count_partition(), CheckpointedStore
+    """
+    line_list = night[0].split(', ')
+    return line_list[1] if line_list[0] == 'NIGHT' else None
+
+
+def load_partition(eng, nights, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Store one partition's nights in a transaction of its own.
+
+    The partition's rows are counted in a LoadStats of its own, whose
+    counts are added to load_stats once the partition has committed.
+
+    :return: a PartitionCounts for the partition
+    Called by: read_nights_naps_partitioned()
+    """
+    stats = LoadStats()
+    with eng.connect() as connection:
+        with connection.begin():
+            store_batch(connection, nights, subject_id, stats)
+    load_stats.add(stats)
+    return count_partition(nights, stats)
+
+
+def count_partition(nights, stats):
+    """
+    Find a partition's date range, and the nights and naps inserted
+    into it.
+
+    Only rows that sl_insert_night() or sl_insert_nap() inserted are
+    counted. A row already in the table (perhaps repeated in the input)
+    is not inserted again; a row that failed, and the naps of a night
+    that failed, are not stored at all.
+
+    :param stats: the LoadStats the partition's rows were counted in
+    :return: a PartitionCounts
+    Called by: load_partition()
+    """
+    dates = [date for date in map(night_date, nights) if date]
+    if not dates:
+        return PartitionCounts(None, None, 0, 0)
+    return PartitionCounts(dates[0], dates[-1],
+                           stats.counts['nights', 'succeeded'],
+                           stats.counts['naps', 'succeeded'])
+
+
+def check_partition_counts(eng, partition_counts,
+                           subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Make sure the db holds at least as many nights and naps of subject
+    subject_id, in the date range of each partition, as the partition
+    inserted.
+
+    The db may hold more: rows already in the table are not inserted
+    again, and are not counted.
+
+    :raise RuntimeError: if rows are missing from the db
+    Called by: read_nights_naps_partitioned()
+    """
+    stmnt = text('SELECT count(DISTINCT sl_night.night_id), '
+                 'count(sl_nap.nap_id) '
+                 'FROM sl_night LEFT JOIN sl_nap '
+                 'ON sl_nap.night_id = sl_night.night_id '
+                 'AND sl_nap.night_start_date = sl_night.start_date '
+                 'WHERE sl_night.subject_id = :subject_id '
+                 'AND sl_night.start_date BETWEEN :first_date AND '
+                 ':last_date')
+    missing = []
+    with eng.connect() as connection:
+        for counts in partition_counts:
+            if not counts.nights:
+                continue
+            db_nights, db_naps = connection.execute(
+                stmnt, subject_id=subject_id, first_date=counts.first_date,
+                last_date=counts.last_date).fetchone()
+            if db_nights < counts.nights or db_naps < counts.naps:
+                missing.append(counts.first_date[:7])
+    if missing:
+        logging.error('load incomplete for partition(s) %s',
+                      ', '.join(sorted(missing)))
+        raise RuntimeError('db is missing rows after partitioned load')
+
+
+def reload_nights_naps(eng, infile_name, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Bring the db into line with the input, touching only the nights that
+    have changed.
+
+    :param eng: the db engine
+    :param infile_name: read data from file or stdin
+    :param subject_id: the subject the nights belong to
+    :return: None
+    Called by: update_db()
+    """
+    with fileinput.input(infile_name) as data_source:
+        merge_nights(eng, read_nights(data_source), subject_id=subject_id)
+
+
+def merge_nights(eng, nights, delete=True, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Bring the db into line with nights, touching only the nights that
+    have changed.
+
+    The nights are fingerprinted, and compared with the fingerprints
+    stored in sl_night for the same subject, over the same date range,
+    which are fetched in a single query. Then, in one transaction:
+        new nights are inserted,
+        changed nights are updated in place, and their naps replaced,
+        if delete is set, nights in the db, but not in nights, are
+            deleted.
+    A re-run on unchanged input makes no changes to the db.
+
+    A night is identified by its start date and start time.
+
+    :param eng: the db engine
+    :param nights: an iterable of nights, as yielded by read_nights()
+    :param delete: if False, never delete nights from the db
+    :param subject_id: the subject the nights belong to; nights of other
+                       subjects are never touched
+    :return: the numbers of nights inserted, updated, and deleted
+    Called by: reload_nights_naps(), client code
+    """
+    in_input = {}
+    for night in nights:
+        line_list = night[0].rstrip().split(', ')
+        if line_list[0] != 'NIGHT':
+            ld_logger.warning('nap has no night; not stored',
+                              extra={'mesg': night[0].rstrip()})
+            continue
+        in_input[(line_list[1], line_list[2])] = night
+    if not in_input:
+        return 0, 0, 0
+    dates = [start_date for start_date, _ in in_input]
+    with eng.connect() as connection:
+        in_db = fetch_fingerprints(connection, min(dates), max(dates),
+                                   subject_id)
+        to_insert, to_update, to_delete = diff_nights(in_input, in_db)
+        if not delete:
+            to_delete = []
+        if not (to_insert or to_update or to_delete):
+            logging.info('reload: no changes')
+            return 0, 0, 0
+        years = {night_year(night) for night in to_insert} - {None}
+        if years:
+            create_year_partitions(connection, years)
+        with connection.begin():
+            delete_nights(connection, to_delete)
+            for night_id, night in to_update:
+                update_night(connection, night_id, night, subject_id)
+            store_batch(connection, to_insert, subject_id)
+    logging.info('reload: %d inserted, %d updated, %d deleted',
+                 len(to_insert), len(to_update), len(to_delete))
+    return len(to_insert), len(to_update), len(to_delete)
+
+
+def fetch_fingerprints(connection, first_date, last_date,
+                       subject_id=DEFAULT_SUBJECT_ID):
+    """
+    :return: a dict mapping (start date, start time) to
+             (night_id, fingerprint) for each night of subject subject_id
+             in the date range
+    Called by: merge_nights()
+    """
+    result = connection.execute(
+        text('SELECT night_id, start_date, start_time, fingerprint '
+             'FROM sl_night '
+             'WHERE subject_id = :subject_id '
+             'AND start_date BETWEEN :first_date AND :last_date'),
+        subject_id=subject_id, first_date=first_date, last_date=last_date)
+    return {(str(row['start_date']), row['start_time'].strftime('%H:%M')):
+            (row['night_id'], row['fingerprint'])
+            for row in result}
 
 
-def store_nights_naps(connection, line):
+def diff_nights(in_input, in_db):
+    """
+    Compare the nights read from input with those already in the db.
+
+    :param in_input: maps (start date, start time) to a night's lines
+    :param in_db: maps (start date, start time) to (night_id, fingerprint)
+    :return: a list of nights to insert,
+             a list of (night_id, night) to update,
+             a list of (night_id, start date) of the nights to delete
+    Called by: merge_nights()
+    """
+    to_insert = []
+    to_update = []
+    for key, night in in_input.items():
+        if key not in in_db:
+            to_insert.append(night)
+        elif in_db[key][1] != night_fingerprint(night):
+            to_update.append((in_db[key][0], night))
+    to_delete = [(night_id, key[0]) for key, (night_id, _) in in_db.items()
+                 if key not in in_input]
+    return to_insert, to_update, to_delete
+
+
+def delete_nights(connection, nights):
+    """
+    Delete nights, and their naps and summaries, from the db.
+
+    Each row is looked for by its start date as well as its night_id,
+    so that only the partitions of the nights' years are searched.
+
+    :param nights: a list of (night_id, start date)
+    Called by: merge_nights()
+    """
+    if not nights:
+        return
+    params = [{'night_id': night_id, 'start_date': start_date}
+              for night_id, start_date in nights]
+    for table, date_column in (('sl_nap', 'night_start_date'),
+                               ('sl_night_summary', 'start_date'),
+                               ('sl_night', 'start_date')):
+        connection.execute(
+            text(f'DELETE FROM {table} WHERE night_id = :night_id '
+                 f'AND {date_column} = :start_date'),
+            params)
+
+
+def update_night(connection, night_id, night, subject_id=DEFAULT_SUBJECT_ID):
+    """
+    Overwrite the no-data flags and fingerprint of night night_id, and
+    replace its naps, and its summary, with those of night.
+
+    Night night_id has night's start date, which is given with the
+    night_id so that only the partitions of its year are searched.
+
+    Called by: merge_nights()
+    """
+    line_list = night[0].rstrip().split(', ')
+    connection.execute(
+        text('UPDATE sl_night SET start_no_data = :start_no_data, '
+             'end_no_data = :end_no_data, fingerprint = :fingerprint '
+             'WHERE night_id = :night_id AND start_date = :start_date'),
+        start_no_data=line_list[3], end_no_data=line_list[4],
+        fingerprint=night_fingerprint(night), night_id=night_id,
+        start_date=line_list[1])
+    connection.execute(text('DELETE FROM sl_nap WHERE night_id = :night_id '
+                            'AND night_start_date = :start_date'),
+                       night_id=night_id, start_date=line_list[1])
+    for line, sleep_period in zip(night[1:], night_sleep_periods(night)[1:]):
+        store_nights_naps(connection, line, night_id,
+                          sleep_period=sleep_period,
+                          night_start_date=line_list[1])
+    store_night_summary(connection, night_id, night, subject_id)
+
+
+def store_nights_naps(connection, line, night_id=None, fingerprint=None,
+                      sleep_period=None, night_start_date=None,
+                      subject_id=DEFAULT_SUBJECT_ID, stats=None):
     """
     Insert a line of data into the db
 
     If the line starts with 'NIGHT':
-        insert a night into sl_night
+        insert a night, with its fingerprint, into sl_night
     If the line starts with 'NAP':
-        insert a nap into sl_nap
+        insert a nap into sl_nap, as part of night night_id
 
     :param connection: an open db connection
     :param line: a line of data from the transform stage
-    :return: True if the line was inserted, else False
-    Called by read_nights_naps()
+    :param night_id: the id of the night the line belongs to, if known
+    :param fingerprint: the night_fingerprint() of the night the line
+                        belongs to, if known
+    :param sleep_period: for a NAP line, the tsrange it covers, if known
+    :param night_start_date: for a NAP line, the start date of its night,
+                             which routes it to the right sl_nap partition
+    :param subject_id: for a NIGHT line, the subject it belongs to
+    :param stats: the LoadStats to count the row in, if not load_stats
+    :return: the night_id for any NAP lines that follow
+    Called by store_night()
     """
-    global TEMP_STORE_NIGHT_CTR
-
-    success = False
+    if stats is None:
+        stats = load_stats
     line_list = line.rstrip().split(', ')
+    mesg = ', '.join(line_list)
     if line_list[0] == 'NIGHT':
-        TEMP_STORE_NIGHT_CTR += 1
+        night_id = None
         result = connection.execute(
-            func.sl_insert_night(*line_list[1:])
+            select([literal_column('*')]).select_from(
+                func.sl_insert_night(*line_list[1:], fingerprint,
+                                     subject_id))
         )
         for row in result:
-            mesg = ', '.join(line_list)
-            # night_log = lambda r: ld_logger.debug(r, extra={"mesg": mesg})
-            night_nap_log(row, mesg)
-        success = True
+            night_id = row['night_id_out']
+            stats.record('nights', row['mesg'], mesg)
     elif line_list[0] == 'NAP':
+        if night_id is None:
+            ld_logger.warning('nap has no night; not stored',
+                              extra={'mesg': mesg})
+            return night_id
         result = connection.execute(
             func.sl_insert_nap(line_list[1],
                                decimal_to_interval(line_list[2]),
-                               TEMP_STORE_NIGHT_CTR
+                               night_id,
+                               sleep_period,
+                               night_start_date
                                )
         )
         for row in result:
-            mesg = ', '.join(line_list)
-            # nap_log = lambda r: ld_logger.debug(r, extra={"mesg": mesg})
-            night_nap_log(row, mesg)
-            # nap_log(row)
-        success = True
-    return success
+            stats.record('naps', row[0], mesg)
+    return night_id
+
+
+class LoadStats:
+    """
+    Counts of the results returned by sl_insert_night() and
+    sl_insert_nap(), by table and outcome: 'succeeded', 'already
+    present', or 'error SQLSTATE <code>'.
+
+    Rather than every row, only errors, and the first row of each
+    outcome and every sample_every'th after it, are logged to load.log.
+    Rows may be stored from several threads at once, so the counts are
+    kept under a lock.
+    """
+    def __init__(self, sample_every=ROW_LOG_SAMPLE):
+        self.sample_every = sample_every
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, table, result, mesg):
+        """
+        :param table: 'nights' or 'naps'
+        :param result: the message the stored procedure returned
+        :param mesg: the line of input stored
+        Called by: store_nights_naps()
+        """
+        outcome = row_outcome(result)
+        with self.lock:
+            self.counts[table, outcome] += 1
+            count = self.counts[table, outcome]
+        if outcome.startswith('error'):
+            ld_logger.error(result, extra={'mesg': mesg})
+        elif (count - 1) % self.sample_every == 0:
+            ld_logger.debug('{} (row {} of this outcome)'.format(result,
+                                                                 count),
+                            extra={'mesg': mesg})
+
+    def add(self, other):
+        """
+        Add the counts of LoadStats other to these.
+
+        Called by: load_partition()
+        """
+        with other.lock:
+            counts = Counter(other.counts)
+        with self.lock:
+            self.counts.update(counts)
+
+    def summary(self):
+        """
+        :return: e.g., 'nights: 120 succeeded, 3 already present;
+                        naps: 240 succeeded, 1 error SQLSTATE 23505'
+        """
+        with self.lock:
+            counts = sorted(self.counts.items())
+        tables = []
+        for table in ('nights', 'naps'):
+            outcomes = ['{} {}'.format(count, outcome)
+                        for (a_table, outcome), count in counts
+                        if a_table == table]
+            if outcomes:
+                tables.append('{}: {}'.format(table, ', '.join(outcomes)))
+        return '; '.join(tables) or 'no rows stored'
+
+    def log_summary(self):
+        """
+        Called by: update_db()
+        """
+        summary = self.summary()
+        ld_logger.info('load summary', extra={'mesg': summary})
+        logging.info('load summary: %s', summary)
+
+
+def row_outcome(result):
+    """
+    sl_insert_night() or sl_insert_nap() result => its outcome
+    Called by: LoadStats.record()
+    """
+    if result is None:
+        return 'error SQLSTATE unknown'
+    if result.endswith('succeeded'):
+        return 'succeeded'
+    if result.endswith('already in table'):
+        return 'already present'
+    match = re.search(r'SQLSTATE (\w{5})', result)
+    return 'error SQLSTATE {}'.format(match.group(1) if match else 'unknown')
 
 
-def night_nap_log(row, mesg):
-    ld_logger.debug(row, extra={"mesg": mesg})
+load_stats = LoadStats()
 
 
-def connect():
+def connect(workers=1):
     """
     Connect to the PostgreSQL server
 
+    :param workers: the number of connections to be used at once
     :return: a db engine
     Called by: client code
     """
+    import_sqlalchemy()
     try:
         url = os.environ['DB_URL']
     except KeyError:
         print('Please set environment variable DB_URL')
         sys.exit(1)
     else:
-        eng = create_engine(url)
+        eng = create_engine(url, pool_size=max(5, workers))
         return eng
 
 
-def update_db(eng):
+def is_sqlite_url(url):
+    """
+    :return: True if url names a SQLite db, to be loaded by sqlite_store
+    Called by: set_up_arg_parser(), client code
+    """
+    return url.startswith('sqlite:')
+
+
+def update_db(eng, args):
     """
-    Invoke read_nights_naps() to load data from input into db.
+    Invoke read_nights_naps(), read_nights_naps_partitioned(), or
+    reload_nights_naps(), to load data from input into db; then log a
+    summary of the rows stored.
+
     :param eng: the db engine
+    :param args: the parsed c.l.a.'s
     :return: None
     """
+    if args.store_in_db != 'True':
+        return  # don't touch the db
+    subject_id = (fetch_subject_id(eng, args.subject) if args.subject else
+                  DEFAULT_SUBJECT_ID)
+    try:
+        if args.reload:
+            reload_nights_naps(eng, args.infile_name, subject_id)
+        elif args.workers > 1:
+            read_nights_naps_partitioned(eng, args.infile_name, args.workers,
+                                         subject_id)
+        else:
+            read_nights_naps(eng, args.infile_name, args.resume, subject_id)
+    finally:
+        load_stats.log_summary()
+
+
+def update_sqlite_db(args):
+    """
+    As update_db(), for a SQLite DB_URL
+
+    :param args: the parsed c.l.a.'s
+    :return: None
+    """
+    from src.load.sqlite_store import load_sqlite
+
+    if args.store_in_db != 'True':
+        return  # don't touch the db
     try:
-        # if 'True' is a c.l. arg:
-        #     if a file name is also a c.l. arg:
-        #         read from file name
-        #     else:
-        #         read from stdin
+        load_sqlite(os.environ['DB_URL'], args.infile_name, args.subject,
+                    load_stats)
+    finally:
+        load_stats.log_summary()
 
-        sys.argv.remove('True')
-        infile_name = sys.argv[1] if len(sys.argv) > 1 else '-'
-        read_nights_naps(eng, infile_name)
-    except ValueError:
-        pass  # don't touch the db
+
+def fetch_subject_id(eng, subject):
+    """
+    :return: the subject_id of the subject named subject, who is added
+             to sl_subject if not there already
+    Called by: update_db()
+    """
+    with eng.begin() as connection:
+        return connection.execute(select([func.sl_subject_id(subject)])
+                                  ).scalar()
+
+
+def set_up_arg_parser():
+    """
+    Parse and return the c.l.a.'s
+
+    Called by: client code
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('store_in_db',
+                        help='str(True) to write to database')
+    parser.add_argument('infile_name', nargs='?', default='-',
+                        help='read from this file instead of stdin')
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help='load month-long partitions over this many '
+                             'db connections at once')
+    parser.add_argument('-r', '--reload', action='store_true',
+                        help='change only those nights that differ from '
+                             'the ones already in the database')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip the nights committed by an earlier load '
+                             'of the same input that did not finish')
+    parser.add_argument('--subject', type=check_subject_arg,
+                        default=subject_from_env(),
+                        help='store the nights as those of this subject '
+                             '(default: $ETL_SUBJECT, or the default '
+                             'subject)')
+    args = parser.parse_args()
+    if args.resume and (args.reload or args.workers > 1):
+        parser.error('--resume works only with a single worker, '
+                     'without --reload')
+    if is_sqlite_url(os.environ.get('DB_URL', '')) and \
+            (args.reload or args.resume or args.workers > 1):
+        parser.error('--reload, --resume, and --workers need a PostgreSQL '
+                     'DB_URL')
+    return args
+
+
+def check_subject_arg(subject):
+    """
+    Called by: set_up_arg_parser()
+    """
+    try:
+        return check_subject(subject)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
 def main():
@@ -161,14 +1109,14 @@ def setup_network_logger():
     :return: None
     Called by: main()
     """
+    from src.logging.wire_format import make_socket_handler
+
     # https://docs.python.org/3/howto/logging-cookbook.html#network-logging
     root_logger = logging.getLogger('')
     root_logger.setLevel(logging.INFO)
-    socket_handler = logging.handlers.SocketHandler('localhost',
-                                                    logging.handlers.
-                                                    DEFAULT_TCP_LOGGING_PORT)
+    socket_handler = make_socket_handler()
     # don't bother with a formatter here, since a socket handler sends the
-    # event as an unformatted pickle
+    # event as an unformatted pickle or compact record
     root_logger.addHandler(socket_handler)
     # end of logging-cookbook code
 
@@ -182,7 +1130,8 @@ def setup_load_logger():
     # ld_logger will need a formatter since it is writing to file
     load_logger = logging.getLogger('load.load')
     load_logger.setLevel(logging.DEBUG)
-    file_handler = logging.FileHandler('src/load/load.log', mode='w')
+    file_handler = logging.FileHandler(
+            subject_path('src/load/load.log', subject_from_env()), mode='w')
     formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s - %(mesg)s')
     file_handler.setFormatter(formatter)
@@ -193,9 +1142,15 @@ def setup_load_logger():
 
 
 if __name__ == '__main__':
+    # parse args first, so that bad args fail before loggers are set up
+    cl_args = set_up_arg_parser()
     ld_logger = main()
     logging.info('load start')
-    engine = connect()  # only c.l.a. will be 'True' or 'False'
-    update_db(engine)
-    engine.dispose()
+    if cl_args.store_in_db == 'True':  # else don't import sqlalchemy at all
+        if is_sqlite_url(os.environ.get('DB_URL', '')):
+            update_sqlite_db(cl_args)
+        else:
+            engine = connect(cl_args.workers)
+            update_db(engine, cl_args)
+            engine.dispose()
     logging.info('load finish')
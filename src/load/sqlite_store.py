@@ -0,0 +1,308 @@
+# file: src/load/sqlite_store.py
+# 2026-10-19
+
+
+"""
+Load nights and naps into a SQLite db, in place of PostgreSQL, so that
+the pipeline can run where there is no db server.
+
+load.py uses this module when DB_URL is a SQLite URL, as SQLAlchemy
+spells them:
+
+    sqlite:///sleep.db          a file, relative to the current directory
+    sqlite:////tmp/sleep.db     a file, by its absolute path
+    sqlite://                   an in-memory db
+
+The tables are those of db_sqlite/create_tables.sql, which are created
+in the db if they are missing. Each night and nap is stored as
+sl_insert_night() and sl_insert_nap() store them in PostgreSQL, with
+the same outcomes counted by load.LoadStats. But rather than calling a
+procedure for each line, SqliteStore reads the nights and naps already
+in the db for a batch with one query each, and inserts the new rows
+with one executemany() per table. The whole load is one transaction,
+and the db is kept in WAL mode, so readers are not blocked while it
+runs.
+
+--reload, --resume, and --workers are not available with SQLite.
+"""
+import fileinput
+import logging
+import os
+import sqlite3
+
+from definitions import ROOT_DIR
+from src.analytics.sleep_index import parse_time, periods_from_transform_output
+from src.load.load import (DEFAULT_SUBJECT_ID, batch_nights,
+                           decimal_to_interval, interval_to_minutes,
+                           night_fingerprint, read_nights, summarise_night)
+
+
+SQLITE_URL_PREFIX = 'sqlite:///'
+SCHEMA_PATH = os.path.join(ROOT_DIR, 'db_sqlite', 'create_tables.sql')
+SQLITE_BATCH_SIZE = 1000  # nights stored by each round of executemany()
+
+# the messages of sl_insert_night() and sl_insert_nap(), for load_stats
+NIGHT_SUCCEEDED = 'sl_insert_night() succeeded'
+NIGHT_PRESENT = 'sl_insert_night() failed: row already in table'
+NIGHT_NO_DATA_AT_BOTH_ENDS = 'error inserting night into db: SQLSTATE 23514'
+NAP_SUCCEEDED = 'sl_insert_nap() succeeded'
+NAP_PRESENT = 'sl_insert_nap() failed: row already in table'
+
+ld_logger = logging.getLogger('load.load')
+
+
+def sqlite_path(url):
+    """
+    'sqlite:///sleep.db' => 'sleep.db'
+
+    :raise ValueError: if url is not a SQLite URL
+    Called by: connect_sqlite()
+    """
+    if url == 'sqlite://':
+        return ':memory:'
+    if not url.startswith(SQLITE_URL_PREFIX):
+        raise ValueError('{!r} is not a sqlite:/// URL'.format(url))
+    return url[len(SQLITE_URL_PREFIX):] or ':memory:'
+
+
+def connect_sqlite(url):
+    """
+    Open the SQLite db at url, creating its tables if they are missing.
+
+    The connection is in autocommit mode: the caller begins and ends
+    transactions itself.
+
+    :return: a sqlite3 connection
+    Called by: load_sqlite()
+    """
+    connection = sqlite3.connect(sqlite_path(url), isolation_level=None)
+    connection.execute('PRAGMA journal_mode = WAL')
+    # in WAL mode, a crash may lose the last commit, but cannot corrupt
+    # the db, so there is no need to sync on every commit
+    connection.execute('PRAGMA synchronous = NORMAL')
+    connection.execute('PRAGMA foreign_keys = ON')
+    with open(SCHEMA_PATH) as schema:
+        connection.executescript(schema.read())
+    return connection
+
+
+def fetch_subject_id(connection, subject):
+    """
+    :return: the subject_id of the subject named subject, who is added
+             to sl_subject if not there already
+    Called by: load_sqlite()
+    """
+    connection.execute('INSERT OR IGNORE INTO sl_subject (name) VALUES (?)',
+                       (subject,))
+    return connection.execute('SELECT subject_id FROM sl_subject '
+                              'WHERE name = ?', (subject,)).fetchone()[0]
+
+
+def load_sqlite(url, infile_name, subject=None, stats=None):
+    """
+    Read NIGHT and NAP data from infile_name, and store it in the SQLite
+    db at url, in a single transaction.
+
+    :param subject: the name of the subject the nights belong to, or
+                    None for the default subject
+    :param stats: a load.LoadStats to count the rows stored in
+    :return: None
+    Called by: load.update_sqlite_db()
+    """
+    connection = connect_sqlite(url)
+    try:
+        with fileinput.input(infile_name) as data_source:
+            # take the write lock now, so that the night_ids SqliteStore
+            # hands out can't be taken by another writer
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                subject_id = (fetch_subject_id(connection, subject)
+                              if subject else DEFAULT_SUBJECT_ID)
+                store = SqliteStore(connection, subject_id, stats)
+                for batch in batch_nights(read_nights(data_source),
+                                          SQLITE_BATCH_SIZE):
+                    store(batch)
+            except BaseException:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+    finally:
+        connection.close()
+
+
+class SqliteStore:
+    """
+    Store batches of nights in a SQLite db, as nights of subject
+    subject_id.
+
+    A night already in the db, with the same start and no-data flags,
+    is not stored again, nor is a nap already stored for the same night
+    with the same start time and duration; the night's summary is
+    written either way. A night with no data at both ends breaks the
+    CHECK on sl_night, so is counted as an error, and its naps are not
+    stored.
+
+    night_ids are handed out here, rather than by the db, so that the
+    naps of a new night can be inserted in the same executemany() as
+    the naps of every other night in the batch. The caller must hold the
+    db's write lock from the first batch to the last.
+    """
+    def __init__(self, connection, subject_id=DEFAULT_SUBJECT_ID,
+                 stats=None):
+        self.connection = connection
+        self.subject_id = subject_id
+        self.stats = stats
+        self.next_night_id = None
+
+    def __call__(self, batch):
+        """
+        Called by: load_sqlite()
+        """
+        nights = []
+        for night in batch:
+            if night[0].startswith('NIGHT'):
+                nights.append(night)
+            else:
+                self._skip_naps(night)
+        if not nights:
+            return
+        if self.next_night_id is None:
+            self.next_night_id = self.connection.execute(
+                    'SELECT coalesce(max(night_id), 0) + 1 FROM sl_night'
+                    ).fetchone()[0]
+        dates = [night[0].split(', ')[1] for night in nights]
+        stored_nights = self._fetch_nights(min(dates), max(dates))
+        stored_naps = self._fetch_naps(min(dates), max(dates),
+                                       set(stored_nights.values()))
+        night_rows, nap_rows, summary_rows = [], [], []
+        for night in nights:
+            night_id = self._add_night(night, stored_nights, night_rows)
+            if night_id is None:
+                self._skip_naps(night[1:])
+                continue
+            self._add_naps(night, night_id, stored_naps, nap_rows)
+            summary = summarise_night(night)
+            summary_rows.append((
+                night_id, summary['start_date'],
+                format_time(summary['start_time']),
+                interval_to_minutes(summary['total_sleep']),
+                summary['first_sleep_start'] and
+                format_time(summary['first_sleep_start']),
+                summary['first_sleep_duration'] and
+                interval_to_minutes(summary['first_sleep_duration']),
+                summary['nap_count'], self.subject_id))
+        self._insert(night_rows, nap_rows, summary_rows)
+
+    def _fetch_nights(self, first_date, last_date):
+        """
+        :return: a dict mapping (start date, start time, start_no_data,
+                 end_no_data) to night_id, for each of the subject's
+                 nights in the date range
+        Called by: __call__()
+        """
+        rows = self.connection.execute(
+                'SELECT start_date, start_time, start_no_data, end_no_data, '
+                'night_id FROM sl_night WHERE subject_id = ? '
+                'AND start_date BETWEEN ? AND ?',
+                (self.subject_id, first_date, last_date))
+        return {tuple(row[:4]): row[4] for row in rows}
+
+    def _fetch_naps(self, first_date, last_date, night_ids):
+        """
+        :return: a set of (night_id, start time, duration) for each of the
+                 naps of nights night_ids
+        Called by: __call__()
+        """
+        if not night_ids:  # as in a load into an empty db
+            return set()
+        rows = self.connection.execute(
+                'SELECT night_id, start_time, duration FROM sl_nap '
+                'WHERE night_start_date BETWEEN ? AND ?',
+                (first_date, last_date))
+        return {tuple(row) for row in rows if row[0] in night_ids}
+
+    def _add_night(self, night, stored_nights, night_rows):
+        """
+        :return: the night_id of night, or None if it can't be stored
+        Called by: __call__()
+        """
+        line_list = night[0].rstrip().split(', ')
+        mesg = ', '.join(line_list)
+        start_no_data = int(line_list[3] == 'true')
+        end_no_data = int(line_list[4] == 'true')
+        if start_no_data and end_no_data:
+            self._record('nights', NIGHT_NO_DATA_AT_BOTH_ENDS, mesg)
+            return None
+        key = (line_list[1], format_time(line_list[2]), start_no_data,
+               end_no_data)
+        night_id = stored_nights.get(key)
+        if night_id is not None:
+            self._record('nights', NIGHT_PRESENT, mesg)
+            return night_id
+        night_id = stored_nights[key] = self.next_night_id
+        self.next_night_id += 1
+        night_rows.append((night_id,) + key +
+                          (night_fingerprint(night), self.subject_id))
+        self._record('nights', NIGHT_SUCCEEDED, mesg)
+        return night_id
+
+    def _add_naps(self, night, night_id, stored_naps, nap_rows):
+        """
+        Called by: __call__()
+        """
+        night_start_date = night[0].split(', ')[1]
+        for line, (sleep_start, sleep_end) in zip(
+                night[1:], periods_from_transform_output(night)):
+            line_list = line.rstrip().split(', ')
+            key = (night_id, format_time(line_list[1]),
+                   interval_to_minutes(decimal_to_interval(line_list[2])))
+            if key in stored_naps:
+                self._record('naps', NAP_PRESENT, ', '.join(line_list))
+                continue
+            stored_naps.add(key)
+            nap_rows.append(key + (night_start_date,
+                                   '{:%Y-%m-%d %H:%M}'.format(sleep_start),
+                                   '{:%Y-%m-%d %H:%M}'.format(sleep_end)))
+            self._record('naps', NAP_SUCCEEDED, ', '.join(line_list))
+
+    def _insert(self, night_rows, nap_rows, summary_rows):
+        """
+        Called by: __call__()
+        """
+        self.connection.executemany(
+                'INSERT INTO sl_night (night_id, start_date, start_time, '
+                'start_no_data, end_no_data, fingerprint, subject_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', night_rows)
+        self.connection.executemany(
+                'INSERT INTO sl_nap (night_id, start_time, duration, '
+                'night_start_date, sleep_start, sleep_end) '
+                'VALUES (?, ?, ?, ?, ?, ?)', nap_rows)
+        self.connection.executemany(
+                'INSERT INTO sl_night_summary (night_id, start_date, '
+                'start_time, total_sleep, first_sleep_start, '
+                'first_sleep_duration, nap_count, subject_id) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (night_id) DO UPDATE SET '
+                'total_sleep = excluded.total_sleep, '
+                'first_sleep_start = excluded.first_sleep_start, '
+                'first_sleep_duration = excluded.first_sleep_duration, '
+                'nap_count = excluded.nap_count', summary_rows)
+
+    def _skip_naps(self, lines):
+        """
+        Called by: __call__()
+        """
+        for line in lines:
+            ld_logger.warning('nap has no night; not stored',
+                              extra={'mesg': line.rstrip()})
+
+    def _record(self, table, result, mesg):
+        if self.stats is not None:
+            self.stats.record(table, result, mesg)
+
+
+def format_time(time_str):
+    """
+    '4:45' => '04:45', so that times compare as text
+    """
+    return '{:%H:%M}'.format(parse_time(time_str))
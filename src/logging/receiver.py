@@ -2,12 +2,15 @@
 
 # from: https://docs.python.org/3/howto/logging-cookbook.html#network-logging
 
+import argparse
 import pickle
 import logging
 import logging.handlers
 import socketserver
 import struct
 
+from wire_format import decode_record, wire_format_from_env, WIRE_FORMATS
+
 
 class LogRecordStreamHandler(socketserver.StreamRequestHandler):
     """Handler for a streaming logging request.
@@ -18,7 +21,8 @@ class LogRecordStreamHandler(socketserver.StreamRequestHandler):
 
     def handle(self):
         """Handle multiple requests - each expected to be a 4-byte field,
-        followed by the LogRecord in pickle format.
+        followed by the LogRecord in pickle format (or, for
+        CompactLogRecordStreamHandler, in the compact wire format).
         """
         while True:
             chunk = self.connection.recv(4)
@@ -28,10 +32,17 @@ class LogRecordStreamHandler(socketserver.StreamRequestHandler):
             chunk = self.connection.recv(slen)
             while len(chunk) < slen:
                 chunk = chunk + self.connection.recv(slen - len(chunk))
-            obj = self.unPickle(chunk)
-            record = logging.makeLogRecord(obj)
+            try:
+                record = self.make_record(chunk)
+            # the sender is using another format
+            except (ValueError, pickle.UnpicklingError) as e:
+                logging.getLogger(__name__).error('closing connection: %s', e)
+                break
             self.handleLogRecord(record)
 
+    def make_record(self, data):
+        return logging.makeLogRecord(self.unPickle(data))
+
     def unPickle(self, data):
         return pickle.loads(data)
 
@@ -50,6 +61,21 @@ class LogRecordStreamHandler(socketserver.StreamRequestHandler):
         logger.handle(record)
 
 
+class CompactLogRecordStreamHandler(LogRecordStreamHandler):
+    """Handler for records sent by wire_format.CompactSocketHandler.
+
+    Nothing is unpickled: a record in any other format closes the
+    connection.
+    """
+
+    def make_record(self, data):
+        return decode_record(data)
+
+
+STREAM_HANDLERS = {'pickle': LogRecordStreamHandler,
+                   'compact': CompactLogRecordStreamHandler}
+
+
 class LogRecordSocketReceiver(socketserver.ThreadingTCPServer):
     """
     Simple TCP socket-based logging receiver SUITABLE FOR TESTING!!!
@@ -77,11 +103,23 @@ class LogRecordSocketReceiver(socketserver.ThreadingTCPServer):
             abort = self.abort
 
 
+def set_up_arg_parser():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-f', '--wire-format', choices=WIRE_FORMATS,
+                        default=None,
+                        help='the format the stages send records in '
+                             '(default: $ETL_LOG_WIRE_FORMAT, or pickle)')
+    return parser.parse_args()
+
+
 def main():
+    args = set_up_arg_parser()
+    wire_format = args.wire_format or wire_format_from_env()
     logging.basicConfig(
             format='%(asctime)s  %(levelname)-8s %(message)s'
     )
-    tcpserver = LogRecordSocketReceiver()
+    tcpserver = LogRecordSocketReceiver(
+            handler=STREAM_HANDLERS[wire_format])
     print('Starting TCP server...')
     tcpserver.serve_until_stopped()
 
@@ -0,0 +1,129 @@
+# file: src/logging/wire_format.py
+# 2026-10-19
+
+"""
+A compact, fixed-schema encoding of log records, for the socket between
+the stages and the logging receiver.
+
+logging.handlers.SocketHandler sends each record as a pickled dict of
+all of its attributes, and the receiver unpickles it; unpickling lets
+any process that can reach the receiver's port run code in it.
+CompactSocketHandler instead sends only the fields the receiver needs,
+packed with struct: a fixed header of the numeric fields, then the
+string fields, UTF-8 encoded and separated by NULs (a NUL within a
+field is sent as U+FFFD). The message is sent already merged with its
+args. Attributes added with 'extra=' are not sent.
+
+Each record is framed as SocketHandler frames it: a 4-byte big-endian
+length, then the payload. The first byte of a compact payload is
+WIRE_VERSION, which no pickle that SocketHandler sends starts with.
+
+The encoding is chosen by the ETL_LOG_WIRE_FORMAT environment variable,
+'pickle' (the default) or 'compact'; the stages and the receiver must
+agree on it.
+"""
+import logging
+import logging.handlers
+import os
+import struct
+
+
+WIRE_FORMAT_ENV = 'ETL_LOG_WIRE_FORMAT'
+WIRE_FORMATS = ('pickle', 'compact')
+WIRE_VERSION = 0xc1
+WIRE_HEADER_START = bytes([WIRE_VERSION])
+
+# version, created, msecs, relativeCreated, levelno, lineno, process, thread
+HEADER = struct.Struct('>BdddHIIQ')
+# the string fields follow the header, separated by NULs
+STRING_FIELDS = ('name', 'msg', 'pathname', 'filename', 'module', 'funcName',
+                 'threadName', 'processName', 'exc_text', 'stack_info')
+FRAME_LENGTH = struct.Struct('>L')
+
+
+def wire_format_from_env():
+    """
+    :return: 'pickle' or 'compact'
+    :raise ValueError: if ETL_LOG_WIRE_FORMAT is set to anything else
+    """
+    wire_format = os.environ.get(WIRE_FORMAT_ENV, 'pickle')
+    if wire_format not in WIRE_FORMATS:
+        raise ValueError('{} must be one of {}, not {!r}'.
+                         format(WIRE_FORMAT_ENV, WIRE_FORMATS, wire_format))
+    return wire_format
+
+
+def make_socket_handler(host='localhost',
+                        port=logging.handlers.DEFAULT_TCP_LOGGING_PORT):
+    """
+    :return: a handler that sends records to the receiver, in the format
+             ETL_LOG_WIRE_FORMAT selects
+    Called by: the logger set-up function of each stage
+    """
+    if wire_format_from_env() == 'compact':
+        return CompactSocketHandler(host, port)
+    return logging.handlers.SocketHandler(host, port)
+
+
+def encode_record(record):
+    """
+    LogRecord => compact payload bytes
+    """
+    fields = (record.name, record.getMessage(), record.pathname,
+              record.filename, record.module, record.funcName,
+              record.threadName, record.processName, record.exc_text,
+              record.stack_info)
+    header = HEADER.pack(WIRE_VERSION, record.created, record.msecs,
+                         record.relativeCreated, record.levelno,
+                         record.lineno or 0, record.process or 0,
+                         record.thread or 0)
+    return header + '\0'.join((field or '').replace('\0', '\ufffd')
+                               for field in fields).encode('utf-8',
+                                                           'replace')
+
+
+def decode_record(data):
+    """
+    compact payload bytes => LogRecord
+
+    The record is built directly, rather than by logging.makeLogRecord(),
+    which would first make a record for the current time and process,
+    then overwrite it.
+
+    :raise ValueError: if data is not a compact payload
+    """
+    if data[:1] != WIRE_HEADER_START or len(data) < HEADER.size:
+        raise ValueError('not a compact log record')
+    _, created, msecs, relative_created, levelno, lineno, process, thread = \
+        HEADER.unpack_from(data)
+    values = data[HEADER.size:].decode('utf-8').split('\0')
+    if len(values) != len(STRING_FIELDS):
+        raise ValueError('compact log record has {} fields, not {}'.
+                         format(len(values), len(STRING_FIELDS)))
+    record = logging.LogRecord.__new__(logging.LogRecord)
+    record.__dict__ = dict(zip(STRING_FIELDS, values))
+    record.created = created
+    record.msecs = msecs
+    record.relativeCreated = relative_created
+    record.levelno = levelno
+    record.levelname = logging.getLevelName(levelno)
+    record.lineno = lineno
+    record.process = process
+    record.thread = thread
+    record.args = None
+    record.exc_info = None
+    record.taskName = None
+    return record
+
+
+class CompactSocketHandler(logging.handlers.SocketHandler):
+    """
+    A SocketHandler that sends records in the compact encoding
+    """
+    def makePickle(self, record):
+        if record.exc_info and not record.exc_text:
+            # as SocketHandler does: the traceback can't be sent itself
+            record.exc_text = logging.Formatter().formatException(
+                    record.exc_info)
+        payload = encode_record(record)
+        return FRAME_LENGTH.pack(len(payload)) + payload
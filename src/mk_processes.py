@@ -9,11 +9,18 @@ and load stages.
 
 logging_process runs the network logging receiver that allows all 3 stages
 to log to the same file.
+
+Each -S subject=sheet option adds a pipeline for that subject's sheet.
+The pipelines run concurrently, sharing the one logging receiver; each
+stage is told its subject through ETL_SUBJECT (see src/subject.py).
 """
 import argparse
+import os
 import subprocess
 import time
 
+from src.subject import CHART_INPUT_FILENAME, check_subject, subject_path
+
 
 def pop_cla_as_str(args_as_dict, arg_str):
     """Remove the arg_str argument from args_as_dict, if present"""
@@ -21,11 +28,95 @@ def pop_cla_as_str(args_as_dict, arg_str):
     return ret
 
 
+def subject_sheet(arg):
+    """'ann=ann.csv' => ('ann', 'ann.csv')"""
+    subject, sep, infile_name = arg.partition('=')
+    if not (sep and infile_name):
+        raise argparse.ArgumentTypeError('expected SUBJECT=SHEET, not '
+                                         '{!r}'.format(arg))
+    try:
+        return check_subject(subject), infile_name
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def start_pipeline(infile_name, subject):
+    """
+    Start the extract, transform, and load stages for one sheet, each
+    reading the output of the one before.
+
+    :param subject: the subject whose sheet it is, or None
+    :return: the three processes
+    """
+    env = dict(stage_env)
+    if subject:
+        env['ETL_SUBJECT'] = subject
+    extract_process = subprocess.Popen(
+        ['./src/extract/run_it.py', infile_name, store_in_db,
+         print_chart, print_debug_chart],
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    transform_process = subprocess.Popen(
+        ['./src/transform/do_transform.py'],
+        stdin=extract_process.stdout,
+        stdout=subprocess.PIPE,
+        env=env,
+    )
+    extract_process.stdout.close()  # transform holds the only reader now
+    load_process = subprocess.Popen(
+        ['./src/load/load.py', store_in_db] + load_args,
+        stdin=transform_process.stdout,
+        env=env,
+    )
+    transform_process.stdout.close()
+    return extract_process, transform_process, load_process
+
+
+def finish_pipeline(processes, subject):
+    """
+    Wait for a pipeline's stages to finish, printing its chart, if one
+    was asked for, once extract has written the chart input.
+    """
+    extract_process, transform_process, load_process = processes
+    extract_process.wait()
+    if print_chart == 'True' or print_debug_chart == 'True':
+        env = dict(os.environ)
+        if subject:
+            env['ETL_SUBJECT'] = subject
+        chart_args = ['-i', subject_path(CHART_INPUT_FILENAME, subject)]
+        if print_debug_chart == 'True':
+            chart_args.append('-d')
+        subprocess.run(['./src/chart/chart_new.py'] + chart_args, env=env)
+    transform_process.wait()
+    load_process.wait()
+
+
 note = 'Does not store to db unless -s switch is given.'
 parser = argparse.ArgumentParser(description=note)
-parser.add_argument('infile_name', help='The name of a .csv file to read')
+parser.add_argument('infile_name', nargs='?', help='The name of a .csv, '
+                    '.xlsx, or .ods file to read')
+parser.add_argument('-S', '--subject', type=subject_sheet, action='append',
+                    default=[], metavar='SUBJECT=SHEET',
+                    help='Also read this subject\'s sheet, in a pipeline of '
+                    'its own; may be given more than once')
 parser.add_argument('-s', '--store', help='Store output in database',
                     action='store_true')
+parser.add_argument('-w', '--workers', type=int, default=1,
+                    help='Load into database over this many connections')
+parser.add_argument('-r', '--reload', help='Change only those nights in '
+                    'database that differ from the input', action='store_true')
+parser.add_argument('--resume', help='Skip the nights committed by an '
+                    'earlier load that did not finish', action='store_true')
+parser.add_argument('-b', '--block-size', type=int,
+                    help='Have extract and transform write output in blocks '
+                    'of this many characters (0 for a line at a time)')
+parser.add_argument('-f', '--flush-nights', help='Have extract and transform '
+                    'flush output at the end of every night',
+                    action='store_true')
+parser.add_argument('-l', '--compact-logs', help='Send log records to the '
+                    'receiver in the compact wire format, not as pickles',
+                    action='store_true')
 chart = parser.add_mutually_exclusive_group()
 
 chart.add_argument('-c', '--chart', help='Output a sleep chart',
@@ -33,6 +124,13 @@ chart.add_argument('-c', '--chart', help='Output a sleep chart',
 chart.add_argument('-d', '--debug-chart', help='Output a sleep chart'
                    ' in debug mode', action='store_true')
 args = parser.parse_args()
+sheets = ([(None, args.infile_name)] if args.infile_name else []) + \
+    args.subject
+if not sheets:
+    parser.error('give a sheet to read, or -S SUBJECT=SHEET')
+subjects = [subject for subject, _ in sheets]
+if len(set(subjects)) < len(subjects):
+    parser.error('each subject may be given only once')
 
 args_dict = args.__dict__
 # these cla's will be converted to str(True) or str(False)
@@ -41,55 +139,35 @@ print_chart = pop_cla_as_str(args_dict, 'chart')
 # debug-chart is converted to debug_chart by ArgumentParser()
 print_debug_chart = pop_cla_as_str(args_dict, 'debug_chart')
 
-logging_process = subprocess.Popen(
-    ['./src/logging/receiver.py'],
-)
+# every process reads the log wire format from the environment: see
+# src/logging/wire_format.py
+if args.compact_logs:
+    os.environ['ETL_LOG_WIRE_FORMAT'] = 'compact'
 
-time.sleep(1)
+# extract and transform read their output buffering settings from the
+# environment: see src/block_writer.py
+stage_env = dict(os.environ)
+if args.block_size is not None:
+    stage_env['ETL_BLOCK_SIZE'] = str(args.block_size)
+if args.flush_nights:
+    stage_env['ETL_FLUSH_NIGHTS'] = 'True'
 
-extract_process = subprocess.Popen(
-    ['./src/extract/run_it.py', args.infile_name, store_in_db,
-     print_chart, print_debug_chart],
-    stdout=subprocess.PIPE,
-)
-
-time.sleep(2)
-
-transform_process = subprocess.Popen(
-    ['./src/transform/do_transform.py'],
-    stdin=extract_process.stdout,
-    stdout=subprocess.PIPE,
-)
-
-time.sleep(3)
+load_args = ['-w', str(args.workers)] + (['-r'] if args.reload else []) + \
+    (['--resume'] if args.resume else [])
 
-load_process = subprocess.Popen(
-    ['./src/load/load.py', store_in_db],
-    stdin=transform_process.stdout,
+logging_process = subprocess.Popen(
+    ['./src/logging/receiver.py'],
 )
 
-time.sleep(7)
-
-chart_input_filename = '/tmp/chart_input_bDX03c.txt'
-if print_chart == 'True':
-    chart_process = subprocess.Popen(
-        ['./src/chart/chart_new.py',
-         '-i', chart_input_filename],
-    )
-elif print_debug_chart == 'True':
-    chart_process = subprocess.Popen(
-        ['./src/chart/chart_new.py',
-         '-i', chart_input_filename,
-         '-d'],
-    )
-else:
-    chart_process = None
-
-time.sleep(2)
+time.sleep(1)
 
-extract_process.terminate()
-transform_process.terminate()
-load_process.terminate()
-if chart_process:
-    chart_process.terminate()
-logging_process.terminate()
+pipelines = [(subject, start_pipeline(infile_name, subject))
+             for subject, infile_name in sheets]
+try:
+    for subject, processes in pipelines:
+        finish_pipeline(processes, subject)
+finally:
+    for _, processes in pipelines:
+        for process in processes:
+            process.terminate()
+    logging_process.terminate()
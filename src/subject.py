@@ -0,0 +1,55 @@
+# file: src/subject.py
+# 2026-10-19
+
+
+"""
+The subject: the person whose sheet a pipeline is reading.
+
+mk_processes.py can run a pipeline for each of several subjects at once.
+It tells each stage which subject it is working for through the
+ETL_SUBJECT environment variable, and each stage adds the subject's
+name to the files it writes (its log, the chart input and output), so
+that concurrent pipelines keep out of each other's way. With no subject
+set, every file keeps its usual name.
+"""
+import os
+import re
+
+
+SUBJECT_ENV = 'ETL_SUBJECT'
+CHART_INPUT_FILENAME = '/tmp/chart_input_bDX03c.txt'
+
+
+def subject_from_env():
+    """
+    :return: the subject named by ETL_SUBJECT, or None
+    """
+    subject = os.environ.get(SUBJECT_ENV) or None
+    return check_subject(subject) if subject else None
+
+
+def check_subject(subject):
+    """
+    A subject's name becomes part of file names, so is kept to letters,
+    digits, '_', and '-'.
+
+    :return: subject
+    :raise ValueError: if subject is not a usable name
+    """
+    if not re.fullmatch(r'[A-Za-z0-9_-]{1,64}', subject):
+        raise ValueError('subject {!r} must be 1 to 64 letters, digits, '
+                         "'_', or '-'".format(subject))
+    return subject
+
+
+def subject_path(path, subject=None):
+    """
+    'src/load/load.log', 'ann' => 'src/load/load_ann.log'
+
+    :return: path, with '_<subject>' added before its suffix, or path
+             unchanged if subject is None
+    """
+    if not subject:
+        return path
+    root, ext = os.path.splitext(path)
+    return '{}_{}{}'.format(root, subject, ext)
@@ -13,23 +13,43 @@ The output will be usable by the database with a minimum of further
 processing, and will hold all relevant data from the input.
 """
 import fileinput
+import itertools
 import logging
-import logging.handlers
 import re
+import sys
+
+from src.block_writer import BlockWriter
+from src.subject import subject_from_env, subject_path
+
+
+BATCH_SIZE = 1000  # lines read from data_source per call to transform_batch()
 
 
 class Transform:
     transform_logger = logging.getLogger('transform.do_transform')
     transform_logger.setLevel('DEBUG')
 
-    def __init__(self, data_source=fileinput):
+    # action character => the start_no_data and end_no_data flags of the
+    # NIGHT row the action begins, or None if it begins no night
+    NIGHT_FLAGS = {'b': ('false', 'false'),
+                   'N': ('true', 'false'),
+                   'Y': ('false', 'true'),
+                   's': None}
+
+    def __init__(self, data_source=fileinput, outfile=None, block_size=None,
+                 flush_nights=None):
         """
         The data source will be a file or FakeFileReadWrapper object
         if either is passed as a ctor argument. Otherwise the
         data source will be stdin, which is tied to stdout from the
         'extract' phase subprocess.
+
+        Output goes to outfile, or to stdout, through a BlockWriter;
+        block_size and flush_nights are passed to the BlockWriter.
         """
         self.data_source = data_source
+        self.writer = BlockWriter(outfile or sys.stdout, block_size,
+                                  flush_nights)
         self.out_val = None
         self.last_date = ''
         self.last_sleep_time = ''
@@ -37,7 +57,7 @@ class Transform:
 
     def read_each_line(self):
         """
-        Read a line at a time from data_source; write to stdout.
+        Read lines in batches from data_source; write to stdout.
 
         Not necessary to filter input as it's coming directly from
         extract process stdout:
@@ -46,14 +66,69 @@ class Transform:
         Called by: __main__()
         """
         self.date_checker = re.compile(r' {4}\d{4}-\d{2}-\d{2}')
+        # a downstream stage that wants each night at once can't wait
+        # for a full batch of input
+        batch_size = 1 if self.writer.flush_nights else BATCH_SIZE
         with self.data_source.input() as infile:
-            for curr_line in infile:
-                self.process_curr(curr_line.rstrip('\n'))
+            while True:
+                lines = list(itertools.islice(infile, batch_size))
+                if not lines:
+                    break
+                for row in self.transform_batch(lines):
+                    if row[0] == 'NIGHT':  # the previous night is done
+                        self.writer.end_night()
+                    self.writer.write_line(', '.join(row))
+        self.writer.flush()
+
+    def transform_batch(self, lines):
+        """
+        Process a list of input lines in one call.
+
+        Does the work of process_curr() for each line, but keeps the
+        running state in locals, and chooses what to do with an action
+        line by looking up its action character in NIGHT_FLAGS.
+
+        :param lines: input lines, with or without trailing newlines
+        :return: a list of rows, one for each line of output, as tuples:
+                     ('NIGHT', date, time, start_no_data, end_no_data) or
+                     ('NAP', time, duration)
+        Called by: read_each_line(), client code
+        """
+        date_checker = self.date_checker or re.compile(
+                r' {4}\d{4}-\d{2}-\d{2}')
+        night_flags = Transform.NIGHT_FLAGS
+        get_time_part_from = Transform.get_time_part_from
+        get_duration = Transform.get_duration
+        last_date = self.last_date
+        last_sleep_time = self.last_sleep_time
+        rows = []
+        for line in lines:
+            line = line.rstrip('\n')
+            if line.startswith('action: '):
+                action = line[8:9]
+                if action in night_flags:
+                    last_sleep_time = get_time_part_from(line)
+                    flags = night_flags[action]
+                    if flags:
+                        rows.append(('NIGHT', last_date, last_sleep_time) +
+                                    flags)
+                elif action == 'w':
+                    rows.append(('NAP', last_sleep_time,
+                                 get_duration(get_time_part_from(line),
+                                              last_sleep_time)))
+            elif date_checker.match(line):
+                last_date = line[4:]
+            elif line and not line.startswith(('Week of ', '=======')):
+                Transform.transform_logger.warning('Bad value {} in input'.
+                                                   format(line))
+        self.last_date = last_date
+        self.last_sleep_time = last_sleep_time
+        return rows
 
     def process_curr(self, cur_l):
         """
         Process a single line of input.
-        Called by: read_each_line()
+        Called by: client code
 
         Takes a string argument, and may output a single line
         to stdout. The output may depend on values from previous input strings,
@@ -105,7 +180,9 @@ class Transform:
                                                           'false', 'true')
 
     def output_val(self):
-        print(self.out_val)
+        if self.out_val.startswith('NIGHT'):  # the previous night is done
+            self.writer.end_night()
+        self.writer.write_line(self.out_val)
         self.out_val = None
 
     @staticmethod
@@ -196,22 +273,23 @@ class Transform:
 
 
 def main():
+    from src.logging.wire_format import make_socket_handler
+
     # from: https://docs.python.org/3/howto/
     # logging-cookbook.html#network-logging
     root_logger = logging.getLogger('')
     root_logger.setLevel(logging.INFO)
-    socket_handler = logging.handlers.SocketHandler('localhost',
-                                                    logging.handlers.
-                                                    DEFAULT_TCP_LOGGING_PORT)
+    socket_handler = make_socket_handler()
     # don't bother with a formatter, since a socket handler sends the event as
-    # an unformatted pickle
+    # an unformatted pickle or compact record
     root_logger.addHandler(socket_handler)
 
     # transform_logger will need a formatter since it is writing to file
     transform_logger = logging.getLogger('transform.do_transform')
     transform_logger.setLevel(logging.DEBUG)
-    file_handler = logging.FileHandler('src/transform/do_transform.log',
-                                       mode='w')
+    file_handler = logging.FileHandler(
+            subject_path('src/transform/do_transform.log', subject_from_env()),
+            mode='w')
     formatter = logging.Formatter(
             '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     file_handler.setFormatter(formatter)
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+
+# file: src/watch_sheet.py
+# 2026-10-19
+
+
+"""
+Run the pipeline as a long-lived service that watches the .csv file,
+and stores each night in the db within seconds of its entry.
+
+mk_processes.py starts every stage afresh and re-reads the whole sheet.
+Here, the logging receiver, a db engine with its pool of connections,
+and the state of the extract and transform stages are kept alive, and
+the .csv file is polled for changes.
+
+Only the last week of the sheet is still being written to, so each time
+the file changes:
+    the new complete weeks (all but the last week) are read once, and
+        the extract and transform state at the start of the last week
+        is saved;
+    the last week is read starting from that saved state, so it may be
+        read again the next time the file changes.
+Nights are merged into the db by load.merge_nights(), which inserts new
+nights, updates changed ones, and leaves unchanged ones alone. The
+nights of the new complete weeks are merged without deleting anything.
+The nights of the last week are merged with delete set, so that a night
+whose start has been edited since the last poll (its start time changed
+from 23:00 to 23:30, say) replaces the night read before, rather than
+being stored beside it. merge_nights() compares only the nights in the
+date range of its input, so this never deletes a night outside the last
+week.
+
+Usage (from the project root):
+    $ PYTHONPATH=.:src/extract python src/watch_sheet.py <infile.csv> -s
+"""
+import argparse
+import io
+import logging
+import os
+import re
+import subprocess
+import time
+from types import SimpleNamespace
+
+from read_fns import Extract
+from spill_buffer import SpillingBuffer
+from src.block_writer import BlockWriter
+from src.load import load
+from src.transform.do_transform import Transform
+
+
+POLL_INTERVAL = 2.0  # seconds between checks of the .csv file
+
+watch_logger = logging.getLogger('watch_sheet')
+
+# extract's store_in_db output is all the watcher needs
+EXTRACT_ARGS = SimpleNamespace(store_in_db='True', print_chart='False',
+                               print_debug_chart='False')
+
+
+class SheetWatcher:
+    def __init__(self, infile_name, eng, store_in_db=True):
+        """
+        :param infile_name: the .csv file to watch
+        :param eng: a db engine, or None if not store_in_db
+        :param store_in_db: if False, read the sheet but don't touch the db
+        """
+        self.infile_name = infile_name
+        self.eng = eng
+        self.store_in_db = store_in_db
+        self.reset()
+
+    def reset(self):
+        """
+        Forget everything read so far; the next poll reads the whole file.
+
+        Called by: __init__(), poll()
+        """
+        self.stamp = None  # (mtime, size) of the file when last read
+        self.offset = 0  # where in the file the last week starts
+        # extract and transform state at self.offset
+        self.buffered_lines = []
+        self.in_missing_data = False
+        self.last_date = ''
+        self.last_sleep_time = ''
+
+    def poll(self):
+        """
+        If the file has changed since the last poll, read its new weeks,
+        and its last week, and merge the nights found into the db.
+
+        :return: the rows produced by the transform stage, or None if
+                 the file has not changed
+        Called by: watch()
+        """
+        stat = os.stat(self.infile_name)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return None
+        if stat.st_size < self.offset:  # not an append: start again
+            watch_logger.info('%s shrank; reading it again', self.infile_name)
+            self.reset()
+        self.stamp = stamp
+        with open(self.infile_name, 'rb') as infile:
+            infile.seek(self.offset)
+            data = infile.read()
+        last_week_start = find_last_week_start(data)
+        done_lines = lines_of(data[:last_week_start])
+        open_lines = lines_of(data[last_week_start:])
+
+        done_rows = self.read_weeks(done_lines, keep_state=True)
+        self.offset += last_week_start
+        open_rows = self.read_weeks(open_lines, keep_state=False)
+        if self.store_in_db:
+            self.merge_rows(done_rows, delete=False)
+            self.merge_rows(open_rows, delete=True)
+        return done_rows + open_rows
+
+    def merge_rows(self, rows, delete):
+        """
+        Merge rows produced by the transform stage into the db.
+
+        Called by: poll()
+        """
+        if rows:
+            lines = [', '.join(row) for row in rows]
+            load.merge_nights(self.eng, load.read_nights(lines),
+                              delete=delete)
+
+    def read_weeks(self, lines, keep_state):
+        """
+        Pass .csv lines, starting at the start of a week, through the
+        extract and transform stages.
+
+        :param keep_state: if True, save the state of both stages at the
+                           end of lines, for the next call to start from;
+                           if False, also output the last week, even if
+                           it is not followed by a blank line
+        :return: the rows produced by the transform stage
+        Called by: poll()
+        """
+        out_stream = io.StringIO()
+        extract = Extract(None, EXTRACT_ARGS)
+        extract.writers = [BlockWriter(out_stream, flush_nights=False)]
+        extract.in_missing_data = self.in_missing_data
+        out_buffer = SpillingBuffer()
+        out_buffer.extend(self.buffered_lines)
+        in_week = extract.weeks_out(lines, out_buffer)
+        if in_week and not keep_state:
+            extract._handle_leftovers(out_buffer)
+        extract.writers[0].flush()
+
+        transform = Transform(None)
+        transform.last_date = self.last_date
+        transform.last_sleep_time = self.last_sleep_time
+        rows = transform.transform_batch(out_stream.getvalue().splitlines())
+
+        if keep_state:
+            self.buffered_lines = list(out_buffer)
+            self.in_missing_data = extract.in_missing_data
+            self.last_date = transform.last_date
+            self.last_sleep_time = transform.last_sleep_time
+        out_buffer.close()
+        return rows
+
+    def watch(self, poll_interval=POLL_INTERVAL):
+        """
+        Poll the file every poll_interval seconds, until interrupted.
+
+        Called by: __main__()
+        """
+        while True:
+            try:
+                rows = self.poll()
+            except Exception:  # keep the service up; try again next poll
+                watch_logger.exception('poll of %s failed', self.infile_name)
+                self.stamp = None
+            else:
+                if rows is not None:
+                    watch_logger.info('read %d rows from %s', len(rows),
+                                      self.infile_name)
+            time.sleep(poll_interval)
+
+
+def find_last_week_start(data):
+    """
+    :param data: bytes from the .csv file, starting at a line start
+    :return: the offset in data of the start of the line that begins
+             the last week, or 0 if there is none
+    Called by: SheetWatcher.poll()
+    """
+    last_week_start = 0
+    for match in re.finditer(rb'^\d{1,2}/\d{1,2}/\d{4},', data, re.MULTILINE):
+        last_week_start = match.start()
+    return last_week_start
+
+
+def lines_of(data):
+    """
+    bytes => list of str lines
+    Called by: SheetWatcher.poll()
+    """
+    return data.decode('utf-8').splitlines(keepends=True)
+
+
+def set_up_arg_parser():
+    parser = argparse.ArgumentParser(
+        description='Watch a .csv file, and store new nights in the db.')
+    parser.add_argument('infile_name', help='The name of a .csv file to watch')
+    parser.add_argument('-s', '--store', help='Store output in database',
+                        action='store_true')
+    parser.add_argument('-i', '--interval', type=float, default=POLL_INTERVAL,
+                        help='Seconds between checks of the .csv file')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = set_up_arg_parser()
+    logging_process = subprocess.Popen(['./src/logging/receiver.py'])
+    time.sleep(1)
+    load.setup_network_logger()
+    watch_logger.setLevel(logging.INFO)
+    engine = load.connect() if args.store else None
+    watcher = SheetWatcher(args.infile_name, engine, args.store)
+    logging.info('watch start')
+    try:
+        watcher.watch(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info('watch finish')
+        if engine:
+            engine.dispose()
+        logging_process.terminate()
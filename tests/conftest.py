@@ -1,6 +1,8 @@
 import pytest
 import os
+import sqlite3
 import sys
+from datetime import date, time, timedelta
 from sqlalchemy import create_engine
 from sqlalchemy.orm.session import sessionmaker
 
@@ -27,3 +29,42 @@ def session(url):
     yield sess
     sess.rollback()
     cnxn.close()
+
+
+@pytest.fixture
+def two_subject_db(monkeypatch):
+    """
+    An in-memory SQLite stand-in for the sl_night, sl_nap, and
+    sl_night_summary tables, holding a night on 2016-12-07 for each of
+    subjects 1 and 2. Dates, times, and intervals (stored as minutes)
+    are read back as the Postgres driver returns them.
+    """
+    monkeypatch.setitem(sqlite3.converters, 'DATE',
+                        lambda value: date.fromisoformat(value.decode()))
+    monkeypatch.setitem(sqlite3.converters, 'TIME',
+                        lambda value: time.fromisoformat(value.decode()))
+    monkeypatch.setitem(sqlite3.converters, 'INTERVAL',
+                        lambda value: timedelta(minutes=int(value)))
+    engine = create_engine(
+            'sqlite://',
+            connect_args={'detect_types': sqlite3.PARSE_DECLTYPES})
+    cnxn = engine.connect()
+    for stmnt in (
+            'CREATE TABLE sl_night (night_id integer, start_date date, '
+            'start_time time, subject_id integer)',
+            'CREATE TABLE sl_nap (nap_id integer, start_time time, '
+            'duration interval, night_id integer, night_start_date date)',
+            'CREATE TABLE sl_night_summary (night_id integer, '
+            'start_date date, start_time time, total_sleep interval, '
+            'nap_count integer, subject_id integer)',
+            "INSERT INTO sl_night VALUES (1, '2016-12-07', '23:45:00', 1), "
+            "(2, '2016-12-07', '22:00:00', 2)",
+            "INSERT INTO sl_nap VALUES (1, '23:45:00', 240, 1, '2016-12-07'), "
+            "(2, '04:45:00', 90, 1, '2016-12-07'), "
+            "(3, '22:00:00', 60, 2, '2016-12-07')",
+            "INSERT INTO sl_night_summary VALUES "
+            "(1, '2016-12-07', '23:45:00', 330, 2, 1), "
+            "(2, '2016-12-07', '22:00:00', 60, 1, 2)"):
+        cnxn.execute(stmnt)
+    yield cnxn
+    cnxn.close()
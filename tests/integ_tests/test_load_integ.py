@@ -16,9 +16,12 @@ def test_inserting_a_night_adds_one_to_night_count(session):
     result = session.execute(stmnt)
     orig_ct = result.fetchone()[0]
 
+    stmnt = text('SELECT slt_create_year_partitions(:year)')
+    session.execute(stmnt, {'year': date_time_now.year})
+
     stmnt = text(textwrap.dedent('''
-    INSERT INTO slt_night (start_date, start_time) 
-    VALUES (:date_today, :time_now)
+    INSERT INTO slt_night (start_date, start_time, start_no_data, end_no_data) 
+    VALUES (:date_today, :time_now, false, false)
     '''))
     data = {'date_today': date_today, 'time_now': time_now}
     session.execute(stmnt, data)
@@ -35,10 +38,11 @@ def test_inserting_a_nap_adds_one_to_nap_count(session):
     start_time_now = datetime.now().time()
     duration = '02:45'
     stmnt = textwrap.dedent('''
-    SELECT max(night_id) FROM slt_night
+    SELECT night_id, start_date FROM slt_night
+    ORDER BY night_id DESC LIMIT 1
     ''')
     night_id_result = session.execute(stmnt)
-    night_id = night_id_result.fetchone()[0]
+    night_id, night_start_date = night_id_result.fetchone()
 
     stmnt = textwrap.dedent('''
     SELECT count(nap_id) FROM slt_nap
@@ -47,11 +51,11 @@ def test_inserting_a_nap_adds_one_to_nap_count(session):
     orig_ct = result.fetchone()[0]
 
     stmnt = text(textwrap.dedent('''
-    INSERT INTO slt_nap(start_time, duration, night_id) 
-    VALUES (:start_time_now, :duration, :night_id_result)
+    INSERT INTO slt_nap(start_time, duration, night_id, night_start_date) 
+    VALUES (:start_time_now, :duration, :night_id_result, :night_start_date)
     '''))
     data = {'start_time_now': start_time_now, 'duration': duration,
-            'night_id_result': night_id}
+            'night_id_result': night_id, 'night_start_date': night_start_date}
     session.execute(stmnt, data)
 
     stmnt = textwrap.dedent('''
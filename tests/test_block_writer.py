@@ -0,0 +1,61 @@
+# file: tests/test_block_writer.py
+# 2026-10-19
+
+import io
+
+from src.block_writer import BlockWriter, block_size_from_env
+
+
+class CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, s):
+        self.writes += 1
+        return super().write(s)
+
+
+def test_write_line_holds_lines_until_block_is_full():
+    stream = CountingStream()
+    writer = BlockWriter(stream, block_size=12, flush_nights=False)
+    writer.write_line('NAP, 1')
+    assert stream.getvalue() == ''
+    writer.write_line('NAP, 2')
+    assert stream.getvalue() == 'NAP, 1\nNAP, 2\n'
+    assert stream.writes == 1
+
+
+def test_block_size_0_writes_each_line():
+    stream = CountingStream()
+    writer = BlockWriter(stream, block_size=0, flush_nights=False)
+    writer.write_line('a')
+    writer.write_line('b')
+    assert stream.getvalue() == 'a\nb\n'
+    assert stream.writes == 2
+
+
+def test_flush_writes_pending_lines():
+    stream = io.StringIO()
+    writer = BlockWriter(stream, block_size=1000, flush_nights=False)
+    writer.write_line('a')
+    writer.flush()
+    assert stream.getvalue() == 'a\n'
+
+
+def test_end_night_flushes_only_if_flush_nights():
+    stream = io.StringIO()
+    writer = BlockWriter(stream, block_size=1000, flush_nights=False)
+    writer.write_line('a')
+    writer.end_night()
+    assert stream.getvalue() == ''
+    writer.flush_nights = True
+    writer.end_night()
+    assert stream.getvalue() == 'a\n'
+
+
+def test_block_size_from_env(monkeypatch):
+    monkeypatch.setenv('ETL_BLOCK_SIZE', '512')
+    assert block_size_from_env() == 512
+    monkeypatch.setenv('ETL_BLOCK_SIZE', 'big')
+    assert block_size_from_env() == 64 * 1024
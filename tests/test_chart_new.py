@@ -3,7 +3,6 @@
 # 10/2018
 import os.path
 import pytest
-import re
 from unittest.mock import Mock
 from src.chart.chart_new import Chart  # , get_parse_args, ASLEEP, AWAKE, NO_DATA, QS_IN_DAY, Triple
 from argparse import Namespace
@@ -45,7 +44,6 @@ def test_constants_have_good_values(chart):
 def test_get_a_line(chart):
     """Get first input line that starts with a date"""
     chart.infile = open(chart.infilename)
-    chart.compile_iso_date()
     ret = chart._get_a_line()
     assert chart.curr_line == '2016-12-04'
     assert ret
@@ -54,7 +52,6 @@ def test_get_a_line(chart):
 def test_get_an_action_line(chart):
     """Get second input line that starts with a date"""
     chart.infile = open(chart.infilename)
-    chart.compile_iso_date()
     chart._get_a_line()
     while len(chart.curr_line) == 10:  # len of an ISO date
         chart._get_a_line()
@@ -62,7 +59,6 @@ def test_get_an_action_line(chart):
 
 
 def test_read_file_returns_iterator(chart):
-    chart.compile_iso_date()
     read_file_iterator = chart.read_file()
     assert isinstance(next(read_file_iterator), chart.Triple)
 
@@ -92,11 +88,6 @@ def test_get_closest_quarter_with_q_60(chart):
         chart._get_closest_quarter(q)
 
 
-def test_compile_iso_date(chart):
-    chart.compile_iso_date()
-    assert isinstance(chart.re_iso_date, type(re.compile('Hello')))
-
-
 def test_parse_input_line_raises_on_empty_input_line(chart):
     chart.curr_line = ''
     with pytest.raises(ValueError):
@@ -150,3 +141,22 @@ def test_action_line_with_N_action(chart):
     assert chart.sleep_state == chart.NO_DATA
     assert ret_triple == chart.Triple(-1, -1, -1)
 
+
+def test_is_iso_date(chart):
+    assert chart._is_iso_date('2016-12-04')
+    assert not chart._is_iso_date('2016-12-04 |')
+    assert not chart._is_iso_date('action: N, time: 23:00')
+    assert not chart._is_iso_date('2016/12/04')
+
+
+def test_get_duration_rolls_over_midnight(chart):
+    assert chart._get_duration('3:45', '23:45') == '04.00'
+    assert chart._get_duration('0:10', '0:20') == '23.75'
+    assert chart._get_duration('11:30', '11:30') == '00.00'
+
+
+def test_get_start_posn_and_num_chunks(chart):
+    assert chart._get_start_posn('4:45') == 19
+    assert chart._get_start_posn('23:59') == 95
+    assert chart._get_num_chunks('07.50') == 30
+    assert chart._get_num_chunks('') == 0
@@ -0,0 +1,62 @@
+# file: tests/test_check_sheet.py
+# 2026-10-19
+
+import io
+import json
+from types import SimpleNamespace
+
+from check_sheet import SheetChecker
+from read_fns import Extract
+import run_it
+from tests.test_watch_sheet import HEADER, BLANK, DAY, week_rows
+
+
+def check(text):
+    return SheetChecker(io.StringIO(text)).check()
+
+
+def test_check_of_good_sheet_finds_no_problems():
+    summary = check(HEADER + week_rows('12/4/2016', [DAY] * 7))
+    assert summary == {'weeks': 1, 'complete_nights': 7,
+                       'non_sunday_dates': [], 'bad_segments': [],
+                       'incomplete_nights': []}
+
+
+def test_check_reports_non_sunday_date():
+    summary = check(HEADER + week_rows('12/5/2016', [DAY] * 7))
+    assert summary['non_sunday_dates'] == ['2016-12-05']
+    assert summary['weeks'] == 0
+
+
+def test_check_reports_bad_segment_and_incomplete_night():
+    days = [DAY, [('b', '23:00', '')], [('x', '6:00', '')]] + [DAY] * 4
+    summary = check(HEADER + week_rows('12/4/2016', days))
+    assert summary['bad_segments'] == [{'date': '2016-12-06',
+                                        'segment': ['x', '6:00', '']}]
+    assert summary['incomplete_nights'] == ['2016-12-05']
+
+
+def test_check_reads_last_week_with_no_blank_line():
+    summary = check(HEADER + week_rows('12/4/2016', [DAY] * 7)[:-len(BLANK)])
+    assert summary['complete_nights'] == 7
+
+
+def test_check_finds_the_nights_extract_discards(caplog):
+    text = HEADER + week_rows('12/4/2016', [DAY, [('b', '23:00', '')]] +
+                              [DAY] * 5)
+    args = SimpleNamespace(store_in_db='False', print_chart='False',
+                           print_debug_chart='False')
+    extract = Extract(io.StringIO(text), args)
+    extract.lines_in_weeks_out()
+    discarded = [record.getMessage() for record in caplog.records
+                 if record.getMessage().startswith('Incomplete night')]
+    assert discarded == ['Incomplete night(s) before {}'.format(date)
+                         for date in check(text)['incomplete_nights']]
+
+
+def test_run_it_check_prints_summary(tmp_path, capsys):
+    infile = tmp_path / 'sheet.csv'
+    infile.write_text(HEADER + week_rows('12/5/2016', [DAY] * 7))
+    assert run_it.check(str(infile)) == 1
+    assert json.loads(capsys.readouterr().out)['non_sunday_dates'] == [
+        '2016-12-05']
@@ -0,0 +1,45 @@
+# file: tests/test_compressed_input.py
+# 2026-10-19
+
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from tests.file_access_wrappers import FileReadAccessWrapper
+from read_fns import open_infile
+from compressed_input import detect_compression, open_compressed
+
+
+TEXT = 'w,Sun,,,Mon\n12/4/2016,b,23:45,,w,3:45,4.00\n'
+
+
+@pytest.mark.parametrize('compress, compression', [
+    (gzip.compress, 'gzip'), (lzma.compress, 'xz'), (bz2.compress, 'bz2')])
+def test_open_infile_decompresses_by_magic_bytes(tmp_path, compress,
+                                                 compression):
+    path = tmp_path / 'sheet.csv.archived'  # the name gives nothing away
+    path.write_bytes(compress(TEXT.encode()))
+    assert detect_compression(str(path)) == compression
+    with open_infile(FileReadAccessWrapper(str(path))) as infile:
+        assert list(infile) == TEXT.splitlines(keepends=True)
+
+
+def test_plain_text_is_not_compressed(tmp_path):
+    path = tmp_path / 'sheet.csv'
+    path.write_text(TEXT)
+    assert detect_compression(str(path)) is None
+    with open_infile(FileReadAccessWrapper(str(path))) as infile:
+        assert infile.read() == TEXT
+
+
+def test_zstd_input_needs_zstd_support(tmp_path):
+    path = tmp_path / 'sheet.csv.zst'
+    path.write_bytes(b'\x28\xb5\x2f\xfd' + b'\x00' * 8)
+    assert detect_compression(str(path)) == 'zstd'
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        with pytest.raises(ImportError, match='zstandard'):
+            open_compressed(str(path), 'zstd')
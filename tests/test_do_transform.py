@@ -2,6 +2,8 @@
 # andrew jarcho
 # 2017-03-15
 
+import io
+
 from tests.file_access_wrappers import FakeFileReadWrapper
 from src.transform.do_transform import Transform
 
@@ -64,3 +66,42 @@ def test_read_date_b_date_w_sets_last_date_to_2nd_date():
     my_transform = Transform(file_wrapper)
     my_transform.read_each_line()
     assert my_transform.last_date == '2016-12-08'
+
+
+def test_read_each_line_writes_all_rows_to_outfile():
+    file_wrapper = FakeFileReadWrapper('    2017-01-02\n'
+                                       'action: b, time: 23:00\n'
+                                       'action: w, time: 4:15, hours: 5.25\n')
+    outfile = io.StringIO()
+    my_transform = Transform(file_wrapper, outfile, block_size=1 << 16)
+    my_transform.read_each_line()
+    assert outfile.getvalue() == ('NIGHT, 2017-01-02, 23:00, false, false\n'
+                                  'NAP, 23:00, 05.25\n')
+
+
+def test_transform_batch_returns_rows():
+    lines = ['Week of Sunday, 2017-01-01:\n', '=' * 26 + '\n',
+             '    2017-01-01\n', 'action: N, time: 22:30\n',
+             'action: w, time: 4:15, hours: 5.75\n',
+             '    2017-01-02\n', 'action: b, time: 23:00, hours: 7.00\n',
+             'action: w, time: 3:00, hours: 4.00\n',
+             'action: s, time: 3:30\n',
+             'action: w, time: 7:45, hours: 4.25\n']
+    my_transform = Transform(FakeFileReadWrapper(''))
+    assert my_transform.transform_batch(lines) == [
+        ('NIGHT', '2017-01-01', '22:30', 'true', 'false'),
+        ('NAP', '22:30', '05.75'),
+        ('NIGHT', '2017-01-02', '23:00', 'false', 'false'),
+        ('NAP', '23:00', '04.00'),
+        ('NAP', '03:30', '04.25')]
+
+
+def test_transform_batch_keeps_state_between_calls():
+    my_transform = Transform(FakeFileReadWrapper(''))
+    assert my_transform.transform_batch(['    2017-01-03',
+                                         'action: Y, time: 1:00']) == [
+        ('NIGHT', '2017-01-03', '01:00', 'false', 'true')]
+    assert my_transform.transform_batch(['action: w, time: 2:15']) == [
+        ('NAP', '01:00', '01.25')]
+    assert my_transform.last_date == '2017-01-03'
+    assert my_transform.last_sleep_time == '01:00'
@@ -0,0 +1,98 @@
+# file: tests/test_export.py
+# 2026-10-19
+
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from src.analytics.export import (ColumnBuffer, decimal_to_timedelta, export,
+                                  import_pyarrow,
+                                  nights_from_transform_output)
+
+
+TRANSFORM_OUTPUT = ['NIGHT, 2016-12-07, 23:45, false, true\n',
+                    'NAP, 23:45, 04.00\n',
+                    'NAP, 04:45, 01.50\n',
+                    'NAP, 11:30, 00.75\n',
+                    'NIGHT, 2016-12-08, 23:15, true, false\n',
+                    'NAP, 23:15, 02.75\n',
+                    'NIGHT, 2016-12-09, 22:00, false, false\n']
+
+
+def test_decimal_to_timedelta():
+    assert decimal_to_timedelta('04.75') == timedelta(hours=4, minutes=45)
+    assert decimal_to_timedelta('00.25') == timedelta(minutes=15)
+
+
+def test_nights_from_transform_output_types_each_field():
+    nights = list(nights_from_transform_output(TRANSFORM_OUTPUT))
+    assert len(nights) == 3
+    assert nights[0][:5] == (1, date(2016, 12, 7), time(23, 45), False, True)
+    assert nights[0][5][1] == (time(4, 45), timedelta(hours=1, minutes=30))
+    assert nights[1][:5] == (2, date(2016, 12, 8), time(23, 15), True, False)
+    assert nights[2][5] == []
+
+
+def test_nights_from_transform_output_stops_at_other_lines():
+    lines = TRANSFORM_OUTPUT[:2] + ['Goodbye\n'] + TRANSFORM_OUTPUT[4:]
+    assert [night[0] for night in nights_from_transform_output(lines)] == [1]
+
+
+def test_column_buffer_places_naps_on_the_calendar():
+    buffer = ColumnBuffer()
+    for night in nights_from_transform_output(TRANSFORM_OUTPUT):
+        buffer.add_night(night)
+    assert buffer.num_nights == 3
+    assert buffer.nights['total_sleep'] == [timedelta(hours=6, minutes=15),
+                                            timedelta(hours=2, minutes=45),
+                                            timedelta()]
+    assert buffer.nights['nap_count'] == [3, 1, 0]
+    assert buffer.naps['night_id'] == [1, 1, 1, 2]
+    assert buffer.naps['sleep_start'][1] == datetime(2016, 12, 8, 4, 45)
+    assert buffer.naps['sleep_end'][2] == datetime(2016, 12, 8, 12, 15)
+
+
+def test_import_pyarrow_says_how_to_install_it(monkeypatch):
+    import builtins
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, *args, **kwargs):
+        if name.startswith('pyarrow'):
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, '__import__', no_pyarrow)
+    with pytest.raises(ImportError, match='pip install pyarrow'):
+        import_pyarrow()
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_export_writes_typed_row_groups(tmpdir, file_format):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    nights = nights_from_transform_output(TRANSFORM_OUTPUT)
+    assert export(nights, str(tmpdir), file_format, row_group_size=2) == \
+        (3, 4)
+    night_path = str(tmpdir.join('nights.' + file_format))
+    if file_format == 'parquet':
+        assert pa.parquet.ParquetFile(night_path).num_row_groups == 2
+        nights = pa.parquet.read_table(night_path)
+        naps = pa.parquet.read_table(str(tmpdir.join('naps.parquet')))
+    else:
+        with pa.memory_map(night_path) as source:
+            reader = pa.ipc.open_file(source)
+            assert reader.num_record_batches == 2
+            nights = reader.read_all()
+        with pa.memory_map(str(tmpdir.join('naps.arrow'))) as source:
+            naps = pa.ipc.open_file(source).read_all()
+    assert nights.schema.field('start_date').type == pa.date32()
+    assert nights.schema.field('total_sleep').type == pa.duration('s')
+    assert nights.column('start_date').to_pylist()[0] == date(2016, 12, 7)
+    assert naps.num_rows == 4
+    assert naps.column('duration').to_pylist()[0] == timedelta(hours=4)
+
+
+def test_export_rejects_unknown_format(tmpdir):
+    with pytest.raises(ValueError, match='file_format'):
+        export([], str(tmpdir), 'csv')
@@ -0,0 +1,89 @@
+# file: tests/test_parallel_chart.py
+# 2026-10-19
+
+from argparse import Namespace
+from datetime import date, timedelta
+import io
+
+from src.chart.chart_new import Chart
+from src.chart.parallel_chart import (days_from, draw_chunk, join_chunks,
+                                      make_output_parallel, split_input)
+
+
+DAY_ACTIONS = ['action: w, time: 3:45, hours: 4.00',
+               'action: s, time: 4:45',
+               'action: w, time: 6:15, hours: 1.50',
+               'action: N, time: 11:30',
+               'action: w, time: 12:15, hours: 0.75',
+               'action: b, time: 23:45, hours: 4.00']
+
+
+def chart_input(days):
+    lines = []
+    for day_num in range(days):
+        a_date = date(2016, 12, 4) + timedelta(days=day_num)
+        if a_date.weekday() == 6:
+            lines.extend(['', 'Week of Sunday, {}:'.format(a_date),
+                          '=' * 26])
+        lines.append('    {}'.format(a_date))
+        if not day_num:
+            lines.append('action: Y, time: 0:00')
+        if day_num % 17 != 5:  # leave some days empty
+            lines.extend(DAY_ACTIONS)
+    return '\n'.join(lines) + '\n'
+
+
+def draw(path, jobs=1, months_per_chunk=1, debug=False):
+    chart = Chart(Namespace(debug=debug))
+    chart.infilename = path
+    chart.outfile = io.StringIO()
+    if jobs > 1:
+        make_output_parallel(chart, jobs, months_per_chunk)
+    else:
+        chart.make_output(chart.read_file())
+    return chart.outfile.getvalue()
+
+
+def test_parallel_chart_is_identical_to_serial(tmpdir):
+    path = tmpdir.join('chart_input.txt')
+    path.write(chart_input(200))
+    serial = draw(str(path))
+    assert serial.count('\n') > 200
+    assert draw(str(path), jobs=3) == serial
+    assert draw(str(path), jobs=2, debug=True) == draw(str(path), debug=True)
+
+
+def test_parallel_chart_of_a_single_chunk_is_drawn_serially(tmpdir):
+    path = tmpdir.join('chart_input.txt')
+    path.write(chart_input(20))
+    assert draw(str(path), jobs=4, months_per_chunk=12) == draw(str(path))
+
+
+def test_split_input_starts_chunks_at_month_boundaries():
+    lines = chart_input(70).splitlines(keepends=True)
+    bounds = split_input(lines, 1)
+    assert [lines[first].strip() for first, _ in bounds[1:]] == \
+        ['2017-01-01', '2017-02-01']
+    assert bounds[-1][1] == len(lines)
+
+
+def test_days_from_stops_at_either_end_of_input():
+    lines = chart_input(10).splitlines(keepends=True)
+    assert days_from(lines, 5, -30) == 0
+    assert days_from(lines, 5, 30) == len(lines)
+    first = lines.index('    2016-12-04\n')
+    assert lines[days_from(lines, first, 2)].strip() == '2016-12-06'
+    assert lines[days_from(lines, first + 20, -1)].strip() == '2016-12-06'
+
+
+def test_join_chunks_redraws_a_chunk_whose_carry_never_agrees():
+    lines = chart_input(70).splitlines(keepends=True)
+    (first_0, last_0), (first_1, last_1) = split_input(lines, 2)
+    stop_0 = days_from(lines, last_0, 7)
+    start_1 = days_from(lines, first_1, -7)
+    chunks = [(0, stop_0, first_0, last_0),
+              (start_1, len(lines), first_1, last_1)]
+    drawn = [draw_chunk(False, lines[:stop_0], 0, [(last_0, stop_0)]),
+             ([], {}, None)]  # as if the second chunk never caught up
+    serial = draw_chunk(False, lines, 0, ())[0]
+    assert join_chunks(False, lines, chunks, drawn) == serial
@@ -7,11 +7,14 @@ import re
 import datetime
 import pytest
 from datetime import date
+from types import SimpleNamespace
 
 from tests.file_access_wrappers import FakeFileReadWrapper
 from src.extract.read_fns import open_infile
 from src.extract.read_fns import Extract
 from container_objs import Event, Day, Week
+from spill_buffer import SpillingBuffer
+from src.block_writer import BlockWriter
 # from conftest import args_d
 
 from run_it import set_up_arg_parser
@@ -46,6 +49,17 @@ def extract():
     return Extract(FakeFileReadWrapper(''), args)
 
 
+def write_to_string(extract):
+    """
+    Send extract's output through a BlockWriter to a StringIO
+
+    :return: the StringIO
+    """
+    output = io.StringIO()
+    extract.writers = [BlockWriter(output)]
+    return output
+
+
 def test_open_infile(infile_wrapper):
     infile = open_infile(infile_wrapper)
     assert isinstance(infile, io.StringIO)
@@ -68,46 +82,61 @@ def test_init_with_good_argument_succeeds():
     assert isinstance(extr, Extract)
 
 
-@pytest.mark.xfail(reason='pytest thinks Extract.cl_args is a function')
-def test_lines_in_weeks_out(infile_wrapper, capfd):  # TODO: think about
+def test_lines_in_weeks_out(infile_wrapper):
     infile = open_infile(infile_wrapper)
     extract = Extract(infile, args)
+    output = write_to_string(extract)
     extract.lines_in_weeks_out()
-    fd1, fd2 = capfd.readouterr()
-    assert fd1 == ''  # '''
-# Week of Sunday, 2016-12-04:
-# ==========================
-#     2016-12-04
-#     2016-12-05
-#     2016-12-06
-#     2016-12-07
-# action: Y, time: 23:45
-#     2016-12-08
-# action: w, time: 3:45, hours: 4.00
-# action: s, time: 4:45
-# action: w, time: 6:15, hours: 1.50
-# action: s, time: 11:30
-# action: w, time: 12:15, hours: 0.75
-# action: s, time: 16:45
-# action: w, time: 17:30, hours: 0.75
-# action: s, time: 21:00
-# action: w, time: 21:30, hours: 0.50
-# action: b, time: 23:15, hours: 7.50
-#     2016-12-09
-# action: w, time: 2:00, hours: 2.75
-# action: s, time: 3:30
-# action: w, time: 8:45, hours: 5.25
-# action: s, time: 19:30
-# action: w, time: 20:30, hours: 1.00
-#     2016-12-10
-# action: b, time: 0:00, hours: 9.00
-# action: w, time: 5:15, hours: 5.25
-# action: s, time: 10:30
-# action: w, time: 11:30, hours: 1.00
-# action: s, time: 16:00
-# action: w, time: 17:00, hours: 1.00
-# '''
-    assert fd2 == ''
+    extract.writers[0].flush()
+    assert output.getvalue() == '''
+Week of Sunday, 2016-12-04:
+==========================
+    2016-12-04
+    2016-12-05
+    2016-12-06
+    2016-12-07
+action: Y, time: 23:45
+    2016-12-08
+action: w, time: 3:45, hours: 4.00
+action: s, time: 4:45
+action: w, time: 6:15, hours: 1.50
+action: s, time: 11:30
+action: w, time: 12:15, hours: 0.75
+action: s, time: 16:45
+action: w, time: 17:30, hours: 0.75
+action: s, time: 21:00
+action: w, time: 21:30, hours: 0.50
+action: b, time: 23:15, hours: 7.50
+    2016-12-09
+action: w, time: 2:00, hours: 2.75
+action: s, time: 3:30
+action: w, time: 8:45, hours: 5.25
+action: s, time: 19:30
+action: w, time: 20:30, hours: 1.00
+    2016-12-10
+action: b, time: 0:00, hours: 9.00
+action: w, time: 5:15, hours: 5.25
+action: s, time: 10:30
+action: w, time: 11:30, hours: 1.00
+action: s, time: 16:00
+action: w, time: 17:00, hours: 1.00
+'''
+
+
+def test_lines_in_weeks_out_outputs_week_ending_in_blank_line_once():
+    text = ('w,Sun,,,Mon,,,Tue,,,Wed,,,Thu,,,Fri,,,Sat,,,,\n' +
+            ','.join(['12/4/2016', 'b', '23:00', ''] +
+                     ['w', '6:00', '7.00'] * 6) + '\n' +
+            ','.join([''] * 4 + ['b', '23:00', '17.00'] * 6) + '\n' +
+            ',' * 22 + '\n')  # the blank line that ends the week
+    out_args = SimpleNamespace(store_in_db='False', print_chart='False',
+                               print_debug_chart='False')
+    extract = Extract(io.StringIO(text), out_args)
+    lines = []
+    extract._write_line = lines.append
+    extract.lines_in_weeks_out()
+    assert sum('Week of Sunday, 2016-12-04:' in line for line in lines) == 1
+    assert lines.count('    2016-12-10') == 1
 
 
 def test_re_match_date_matches_date_in_correct_format(extract):
@@ -263,13 +292,14 @@ def test_get_day_header(day=Day(datetime.date(2018, 10, 14), [])):
     assert Extract._get_day_header(day) == '    2018-10-14'
 
 
-@pytest.mark.xfail(reason='pytest thinks Extract.cl_args is a function')
 def test_write_or_discard_night_3_element_b_event_flushes_buffer(extract):
-    # output = io.StringIO()
+    output = write_to_string(extract)
     out_buffer = ['bongo', 'Hello World']
     extract._write_or_discard_night(Event(action='b', mil_time='8:15',
                                           hours='4.25'),
                                     datetime.date(2017, 10, 12), out_buffer)
+    extract.writers[0].flush()
+    assert output.getvalue() == 'bongo\nHello World\n'
     assert out_buffer == []
 
 
@@ -293,33 +323,43 @@ def test_write_or_discard_night_2_elem_b_event_long_b_str_in_buffer(extract):
     assert out_buffer == ['bbbbbbbbbbbbbbbbbbbbbbbbbbbbbb']
 
 
-@pytest.mark.xfail(reason='pytest thinks Extract.cl_args is a function')
-def test_write_complete_night(extract, capfd):  # TODO: think about
+def test_write_complete_night(extract):
+    output = write_to_string(extract)
     extract.out_buffer = ['hello', 'there']
     extract._write_complete_night(extract.out_buffer)
-    fd1, fd2 = capfd.readouterr()
-    assert fd1 == ''
-    assert fd2 == ''
+    extract.writers[0].flush()
+    assert output.getvalue() == 'hello\nthere\n'
     assert extract.out_buffer == []
 
 
-@pytest.mark.xfail(reason='pytest thinks Extract.cl_args is a function')
-def test_discard_incomplete_night(extract, capfd):  # TODO: think about
+def test_discard_incomplete_night(extract):
+    output = write_to_string(extract)
     extract.out_buffer = ['action: b, time: 23:00, hours: 7.00',
                           '\nWeek of Sunday, 2017-01-01:'
                           '\n==========================',
                           '    2017-01-01', '    2017-01-02',
                           '    2017-01-03']
     extract._discard_incomplete_night(extract.out_buffer)
-    fd1, fd2 = capfd.readouterr()
-    assert fd1 == ''  # 'action: N, time: 23:00\n'
-    assert fd2 == ''
+    extract.writers[0].flush()
+    assert output.getvalue() == 'action: N, time: 23:00\n'
     assert extract.out_buffer == ['\nWeek of Sunday, 2017-01-01:'
                                   '\n==========================',
                                   '    2017-01-01', '    2017-01-02',
                                   '    2017-01-03']
 
 
+def test_discard_incomplete_night_keeps_headers_in_spilling_buffer(extract):
+    lines = ['\nWeek of Sunday, 2017-01-01:\n==========================',
+             '    2017-01-01', 'action: b, time: 23:00, hours: 7.00',
+             'action: w, time: 4:00, hours: 5.00', '    2017-01-02',
+             'action: s, time: 13:00']
+    out_buffer = SpillingBuffer(max_lines=2)
+    out_buffer.extend(lines)
+    extract._discard_incomplete_night(out_buffer)
+    assert list(out_buffer) == [lines[0], lines[1], lines[4]]
+    assert extract.in_missing_data
+
+
 def test_match_complete_b_event_line_returns_true_on_complete_b_event_line():
     line = 'action: b, time: 21:45, hours: 3.75'
     assert bool(Extract._match_complete_b_event_line(line))
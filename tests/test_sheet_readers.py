@@ -0,0 +1,108 @@
+# file: tests/test_sheet_readers.py
+# 2026-10-19
+
+import io
+import zipfile
+import xml.etree.ElementTree as ET
+
+from tests.file_access_wrappers import FileReadAccessWrapper
+from read_fns import open_infile
+from sheet_readers import column_index, iter_elements, number_text
+from sheet_readers import ROW_WIDTH, XLSX_NS
+
+
+WORKBOOK = ('<workbook xmlns="http://schemas.openxmlformats.org/'
+            'spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.'
+            'org/officeDocument/2006/relationships"><sheets>'
+            '<sheet name="Sleep" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>')
+WORKBOOK_RELS = ('<Relationships xmlns="http://schemas.openxmlformats.org/'
+                 'package/2006/relationships"><Relationship Id="rId1" '
+                 'Target="worksheets/sheet1.xml"/></Relationships>')
+SHARED_STRINGS = ('<sst xmlns="http://schemas.openxmlformats.org/'
+                  'spreadsheetml/2006/main"><si><t>b</t></si>'
+                  '<si><t>w</t></si></sst>')
+# 12/4/2016 is serial number 42708; 23:45 is 0.98958.. of a day
+SHEET = ('<worksheet xmlns="http://schemas.openxmlformats.org/'
+         'spreadsheetml/2006/main"><sheetData>'
+         '<row r="2"><c r="A2"><v>42708</v></c>'
+         '<c r="B2" t="s"><v>0</v></c><c r="C2"><v>0.98958333333</v></c>'
+         '<c r="E2" t="s"><v>1</v></c><c r="F2"><v>0.15625</v></c>'
+         '<c r="G2"><v>4</v></c></row>'
+         '<row r="4"><c r="E4" t="inlineStr"><is><t>s</t></is></c>'
+         '<c r="F4" t="str"><v>4:45</v></c></row>'
+         '</sheetData></worksheet>')
+
+CONTENT = ('<office:document-content '
+           'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+           'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+           'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+           '<office:body><office:spreadsheet><table:table>'
+           '<table:table-row><table:table-cell office:value-type="date" '
+           'office:date-value="2016-12-04"/>'
+           '<table:table-cell office:value-type="string"><text:p>b</text:p>'
+           '</table:table-cell><table:table-cell office:value-type="time" '
+           'office:time-value="PT23H45M00S"/><table:table-cell/>'
+           '<table:table-cell office:value-type="string"><text:p>w</text:p>'
+           '</table:table-cell><table:table-cell office:value-type="time" '
+           'office:time-value="PT03H45M00S"/>'
+           '<table:table-cell office:value-type="float" office:value="4"/>'
+           '<table:table-cell table:number-columns-repeated="1000"/>'
+           '</table:table-row>'
+           '<table:table-row table:number-rows-repeated="1048575">'
+           '<table:table-cell table:number-columns-repeated="1024"/>'
+           '</table:table-row></table:table></office:spreadsheet>'
+           '</office:body></office:document-content>')
+
+ROW_1 = ['12/4/2016', 'b', '23:45', '', 'w', '3:45', '4.00'] + \
+        [''] * (ROW_WIDTH - 7)
+
+
+def test_open_infile_reads_xlsx_rows(tmp_path):
+    path = tmp_path / 'sheet.xlsx'
+    with zipfile.ZipFile(path, 'w') as book:
+        book.writestr('xl/workbook.xml', WORKBOOK)
+        book.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        book.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+        book.writestr('xl/worksheets/sheet1.xml', SHEET)
+    rows = list(open_infile(FileReadAccessWrapper(str(path))))
+    assert rows == [[''] * ROW_WIDTH, ROW_1, [''] * ROW_WIDTH,
+                    [''] * 4 + ['s', '4:45'] + [''] * (ROW_WIDTH - 6)]
+
+
+def test_open_infile_reads_ods_rows(tmp_path):
+    path = tmp_path / 'sheet.ods'
+    with zipfile.ZipFile(path, 'w') as book:
+        book.writestr('content.xml', CONTENT)
+    rows = list(open_infile(FileReadAccessWrapper(str(path))))
+    assert rows == [ROW_1, [''] * ROW_WIDTH, [''] * ROW_WIDTH]
+
+
+def test_column_index():
+    assert column_index('A1', 5) == 0
+    assert column_index('V12', 5) == 21
+    assert column_index('AA3', 5) == 26
+    assert column_index(None, 5) == 5
+
+
+def test_number_text_formats_by_column():
+    assert number_text(0.5, 2, None) == '12:00'
+    assert number_text(7.5, 3, None) == '7.50'
+
+
+def test_iter_elements_removes_each_row_from_the_tree(monkeypatch):
+    started = []  # each element, in the order parsing started on it
+    real_iterparse = ET.iterparse
+
+    def iterparse(source, events):
+        for event, elem in real_iterparse(source, events):
+            if event == 'start':
+                started.append(elem)
+            yield event, elem
+
+    monkeypatch.setattr(ET, 'iterparse', iterparse)
+    rows = [elem.get('r') for elem in
+            iter_elements(io.BytesIO(SHEET.encode()), (XLSX_NS + 'row',))]
+    assert rows == ['2', '4']
+    assert started[1].tag == XLSX_NS + 'sheetData'
+    assert len(started[1]) == 0
@@ -0,0 +1,87 @@
+# file: tests/test_sleep_index.py
+# 2026-10-19
+
+import os.path
+from datetime import datetime, timedelta
+
+from src.analytics.sleep_index import (SleepIndex, load_or_build,
+                                       night_periods, parse_time,
+                                       periods_from_db)
+from definitions import ROOT_DIR
+
+
+CHART_DATA = os.path.join(ROOT_DIR, 'tests', 'testdata', 'chart_data_01.txt')
+
+TRANSFORM_OUTPUT = ['NIGHT, 2016-12-07, 23:45, false, true\n',
+                    'NAP, 23:45, 04.00\n',
+                    'NAP, 04:45, 01.50\n',
+                    'NAP, 11:30, 00.75\n',
+                    'NIGHT, 2016-12-08, 23:15, false, false\n',
+                    'NAP, 23:15, 02.75\n']
+
+
+def test_night_periods_rolls_naps_over_midnight():
+    periods = list(night_periods(datetime(2016, 12, 7, 23, 45),
+                                 [(parse_time('23:45'), timedelta(hours=4)),
+                                  (parse_time('4:45'), timedelta(hours=1.5))]))
+    assert periods == [(datetime(2016, 12, 7, 23, 45),
+                        datetime(2016, 12, 8, 3, 45)),
+                       (datetime(2016, 12, 8, 4, 45),
+                        datetime(2016, 12, 8, 6, 15))]
+
+
+def test_periods_from_db_reads_one_subject(two_subject_db):
+    assert list(periods_from_db(two_subject_db)) == [
+        (datetime(2016, 12, 7, 23, 45), datetime(2016, 12, 8, 3, 45)),
+        (datetime(2016, 12, 8, 4, 45), datetime(2016, 12, 8, 6, 15))]
+    assert list(periods_from_db(two_subject_db, subject_id=2)) == [
+        (datetime(2016, 12, 7, 22, 0), datetime(2016, 12, 7, 23, 0))]
+
+
+def test_hours_asleep_from_transform_output():
+    index = SleepIndex.from_transform_output(TRANSFORM_OUTPUT)
+    assert index.hours_asleep(datetime(2016, 12, 7, 22),
+                              datetime(2016, 12, 8, 6)) == 5.25
+    assert index.hours_asleep(datetime(2016, 12, 7),
+                              datetime(2016, 12, 10)) == 9.0
+
+
+def test_hours_asleep_ignores_partial_quarters():
+    index = SleepIndex.from_transform_output(TRANSFORM_OUTPUT)
+    assert index.hours_asleep(datetime(2016, 12, 7, 23, 50),
+                              datetime(2016, 12, 8, 0, 10)) == 0
+
+
+def test_hours_asleep_outside_index_is_zero():
+    index = SleepIndex.from_transform_output(TRANSFORM_OUTPUT)
+    assert index.hours_asleep(datetime(2015, 1, 1),
+                              datetime(2015, 12, 31)) == 0
+
+
+def test_extract_and_transform_output_give_the_same_index():
+    with open(CHART_DATA) as infile:
+        from_extract = SleepIndex.from_extract_output(infile)
+    # 2016-12-08, from the first wake up to the start of the last nap
+    assert from_extract.hours_asleep(datetime(2016, 12, 8, 3, 45),
+                                     datetime(2016, 12, 8, 23, 15)) == 3.5
+    from_transform = SleepIndex.from_transform_output(TRANSFORM_OUTPUT)
+    start, end = datetime(2016, 12, 7, 12), datetime(2016, 12, 8, 12)
+    assert from_extract.quarters_asleep(start, end) == \
+        from_transform.quarters_asleep(start, end)
+
+
+def test_load_or_build_reuses_up_to_date_cache(tmpdir):
+    source = tmpdir.join('transformed.txt')
+    source.write(''.join(TRANSFORM_OUTPUT))
+    cache = str(tmpdir.join('transformed.slix'))
+    built = load_or_build(str(source), cache)
+    loaded = SleepIndex.load(cache, (os.stat(str(source)).st_mtime_ns,
+                                     os.stat(str(source)).st_size))
+    assert loaded.first_date == built.first_date
+    assert loaded.cumulative == built.cumulative
+
+
+def test_load_rejects_cache_with_stale_stamp(tmpdir):
+    cache = str(tmpdir.join('transformed.slix'))
+    SleepIndex.from_transform_output(TRANSFORM_OUTPUT).save(cache, (1, 2))
+    assert SleepIndex.load(cache, (1, 3)) is None
@@ -0,0 +1,37 @@
+# file: tests/test_spill_buffer.py
+# 2026-10-19
+
+from spill_buffer import SpillingBuffer
+
+
+def test_buffer_holds_max_lines_in_memory():
+    buffer = SpillingBuffer(max_lines=3)
+    buffer.extend(str(x) for x in range(10))
+    assert len(buffer.lines) <= 3
+    assert len(buffer) == 10
+    assert list(buffer) == [str(x) for x in range(10)]
+
+
+def test_spilled_lines_keep_their_newlines():
+    lines = ['\nWeek of Sunday, 2017-01-01:\n==========================',
+             '    2017-01-01', 'action: b, time: 23:00']
+    buffer = SpillingBuffer(max_lines=1)
+    buffer.extend(lines)
+    assert list(buffer) == lines
+
+
+def test_append_after_iterating_adds_to_end():
+    buffer = SpillingBuffer(max_lines=1)
+    buffer.extend(['a', 'b'])
+    assert list(buffer) == ['a', 'b']
+    buffer.extend(['c', 'd'])
+    assert list(buffer) == ['a', 'b', 'c', 'd']
+
+
+def test_clear_empties_buffer():
+    buffer = SpillingBuffer(max_lines=1)
+    buffer.extend(['a', 'b', 'c'])
+    buffer.clear()
+    assert not buffer
+    assert list(buffer) == []
+    assert buffer.spill_file is None
@@ -0,0 +1,48 @@
+# file: tests/test_startup.py
+# 2026-10-19
+
+"""
+Check, with python -X importtime, that each stage starts without
+importing modules it may not need.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from definitions import ROOT_DIR
+
+
+STAGE_MODULES = ['run_it', 'src.transform.do_transform', 'src.load.load',
+                 'src.chart.chart_new']
+
+
+def imported_modules(module_name):
+    """
+    Import module_name in a fresh interpreter.
+
+    :return: a dict mapping the name of each module imported to its
+             cumulative import time in microseconds
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT_DIR, os.path.join(ROOT_DIR, 'src'),
+         os.path.join(ROOT_DIR, 'src', 'extract')])
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        cwd=ROOT_DIR, env=env, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if line.startswith('import time:') and '[us]' not in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+@pytest.mark.parametrize('module_name', STAGE_MODULES)
+def test_stage_does_not_import_sqlalchemy_or_logging_handlers(module_name):
+    modules = imported_modules(module_name)
+    assert not [name for name in modules if name.startswith('sqlalchemy')]
+    assert 'logging.handlers' not in modules
@@ -0,0 +1,25 @@
+# file: tests/test_subject.py
+# 2026-10-19
+
+import pytest
+
+from src.subject import check_subject, subject_from_env, subject_path
+
+
+def test_subject_path_adds_subject_before_suffix():
+    assert subject_path('src/load/load.log', 'ann') == 'src/load/load_ann.log'
+    assert subject_path('src/load/load.log', None) == 'src/load/load.log'
+
+
+def test_check_subject_rejects_names_unfit_for_file_names():
+    assert check_subject('ann-2') == 'ann-2'
+    for bad in ('', 'ann/../bob', 'ann bob'):
+        with pytest.raises(ValueError):
+            check_subject(bad)
+
+
+def test_subject_from_env(monkeypatch):
+    monkeypatch.delenv('ETL_SUBJECT', raising=False)
+    assert subject_from_env() is None
+    monkeypatch.setenv('ETL_SUBJECT', 'ann')
+    assert subject_from_env() == 'ann'
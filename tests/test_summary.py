@@ -0,0 +1,23 @@
+# file: tests/test_summary.py
+# 2026-10-19
+
+from datetime import date, time, timedelta
+
+from src.analytics.summary import (average_naps_per_night,
+                                   total_sleep_per_night)
+
+
+def test_total_sleep_per_night_reads_one_subject(two_subject_db):
+    assert total_sleep_per_night(two_subject_db, '2016-12-01',
+                                 '2016-12-31') == [
+        (date(2016, 12, 7), time(23, 45), timedelta(hours=5.5))]
+    assert total_sleep_per_night(two_subject_db, '2016-12-01',
+                                 '2016-12-31', subject_id=2) == [
+        (date(2016, 12, 7), time(22, 0), timedelta(hours=1))]
+
+
+def test_average_naps_per_night_reads_one_subject(two_subject_db):
+    assert average_naps_per_night(two_subject_db, '2016-12-01',
+                                  '2016-12-31') == 2
+    assert average_naps_per_night(two_subject_db, '2016-12-01',
+                                  '2016-12-31', subject_id=2) == 1
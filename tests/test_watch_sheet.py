@@ -0,0 +1,115 @@
+# file: tests/test_watch_sheet.py
+# 2026-10-19
+
+import io
+import itertools
+from types import SimpleNamespace
+
+from read_fns import Extract
+from src.load import load
+from src.transform.do_transform import Transform
+from src.watch_sheet import SheetWatcher, find_last_week_start
+
+
+HEADER = 'w,Sun,,,Mon,,,Tue,,,Wed,,,Thu,,,Fri,,,Sat,,,,\n'
+BLANK = ',' * 22 + '\n'
+DAY = [('w', '6:00', '7.00'), ('b', '23:00', '17.00')]
+
+
+def week_rows(sunday, days):
+    """
+    :param days: for each of the 7 days of the week, a list of events,
+                 each an (action, time, hours) tuple
+    :return: the .csv lines for the week, and the blank line that ends it
+    """
+    rows = []
+    for row_ix in range(max(len(events) for events in days)):
+        fields = [sunday if row_ix == 0 else '']
+        for events in days:
+            fields += events[row_ix] if row_ix < len(events) else ('', '', '')
+        rows.append(','.join(fields) + '\n')
+    return ''.join(rows) + BLANK
+
+
+WEEK_1 = week_rows('12/4/2016', [[('b', '23:00', '')]] + [DAY] * 6)
+WEEK_2_MON = week_rows('12/11/2016', [DAY] * 2 + [[]] * 5)
+WEEK_2 = week_rows('12/11/2016', [DAY] * 7)
+
+
+def full_run_rows(text):
+    """The rows from running extract and transform over the whole file"""
+    out_stream = io.StringIO()
+    args = SimpleNamespace(store_in_db='False', print_chart='False',
+                           print_debug_chart='False')
+    extract = Extract(io.StringIO(text), args)
+    extract._write_line = lambda line: print(line, file=out_stream)
+    extract.lines_in_weeks_out()
+    return Transform(None).transform_batch(
+            out_stream.getvalue().splitlines())
+
+
+def test_find_last_week_start():
+    data = (HEADER + WEEK_1 + WEEK_2).encode()
+    assert find_last_week_start(data) == len((HEADER + WEEK_1).encode())
+    assert find_last_week_start(HEADER.encode()) == 0
+
+
+def test_poll_reads_only_changed_file(tmp_path):
+    infile = tmp_path / 'sheet.csv'
+    infile.write_text(HEADER + WEEK_1)
+    watcher = SheetWatcher(str(infile), None, store_in_db=False)
+    assert watcher.poll() == full_run_rows(HEADER + WEEK_1)
+    assert watcher.poll() is None
+
+
+def test_poll_after_appends_finds_every_night_of_full_run(tmp_path):
+    infile = tmp_path / 'sheet.csv'
+    infile.write_text(HEADER + WEEK_1 + WEEK_2_MON)
+    watcher = SheetWatcher(str(infile), None, store_in_db=False)
+    rows = watcher.poll()
+    assert watcher.offset == len(HEADER + WEEK_1)
+    infile.write_text(HEADER + WEEK_1 + WEEK_2)
+    watcher.stamp = None  # in case the mtime has not changed
+    rows += watcher.poll()
+    expected = full_run_rows(HEADER + WEEK_1 + WEEK_2)
+    assert sorted(set(rows)) == sorted(set(expected))
+
+
+def test_poll_replaces_night_edited_in_last_week(tmp_path, mocker):
+    db = {}  # (start date, start time) => (night_id, fingerprint)
+    night_ids = itertools.count(1)
+
+    def fetch_fingerprints(connection, first_date, last_date, subject_id):
+        return {key: value for key, value in db.items()
+                if first_date <= key[0] <= last_date}
+
+    def delete_nights(connection, nights):
+        for night_id, start_date in nights:
+            del db[next(key for key, (an_id, _) in db.items()
+                        if an_id == night_id and key[0] == start_date)]
+
+    def store_batch(connection, nights, subject_id):
+        for night in nights:
+            line_list = night[0].split(', ')
+            db[(line_list[1], line_list[2])] = (next(night_ids),
+                                                load.night_fingerprint(night))
+
+    mocker.patch('src.load.load.fetch_fingerprints', fetch_fingerprints)
+    mocker.patch('src.load.load.delete_nights', delete_nights)
+    mocker.patch('src.load.load.store_batch', store_batch)
+    load.import_sqlalchemy()
+    infile = tmp_path / 'sheet.csv'
+    infile.write_text(HEADER + WEEK_1 + WEEK_2_MON)
+    watcher = SheetWatcher(str(infile), mocker.MagicMock())
+    watcher.poll()
+    assert ('2016-12-11', '23:00') in db
+    edited = week_rows('12/11/2016', [[('w', '6:00', '7.00'),
+                                       ('b', '23:30', '17.50')],
+                                      [('w', '6:00', '6.50'),
+                                       ('b', '23:00', '17.00')]] + [[]] * 5)
+    infile.write_text(HEADER + WEEK_1 + edited)
+    watcher.stamp = None
+    watcher.poll()
+    assert [key for key in db if key[0] == '2016-12-11'] == \
+        [('2016-12-11', '23:30')]
+    assert len(db) == 8  # the nights of 12/4 to 12/11, once each
@@ -0,0 +1,88 @@
+# file: tests/test_week_cache.py
+# 2026-10-19
+
+import io
+import json
+from types import SimpleNamespace
+import zlib
+
+import pytest
+
+from read_fns import Extract
+from week_cache import WeekCache, CACHE_HEADER, CACHE_MAGIC
+from tests.test_watch_sheet import HEADER, BLANK, DAY, week_rows
+
+
+SHEET = (HEADER + week_rows('12/4/2016', [[('b', '23:00', '')]] + [DAY] * 6)
+         + BLANK + week_rows('12/11/2016', [DAY] * 7)
+         + week_rows('12/18/2016', [DAY] * 3 + [[]] * 4)[:-len(BLANK)])
+
+
+def extract_output(text, week_cache):
+    out_stream = io.StringIO()
+    args = SimpleNamespace(store_in_db='False', print_chart='False',
+                           print_debug_chart='False')
+    extract = Extract(io.StringIO(text), args, week_cache)
+    extract._write_line = lambda line: print(line, file=out_stream)
+    extract.lines_in_weeks_out()
+    return out_stream.getvalue()
+
+
+def test_cached_weeks_give_same_output(tmp_path, mocker):
+    path = str(tmp_path / 'sheet.csv.weeks')
+    expected = extract_output(SHEET, None)
+    week_cache = WeekCache.load(path)
+    assert extract_output(SHEET, week_cache) == expected
+    assert len(week_cache.entries) == 2  # the last week has no blank line
+    week_cache.save()
+
+    get_events = mocker.spy(Extract, '_get_events')
+    assert extract_output(SHEET, WeekCache.load(path)) == expected
+    assert get_events.call_count == 2  # the 2 rows of the last week only
+
+
+def test_blocks_with_warnings_are_not_cached(tmp_path):
+    week_cache = WeekCache(str(tmp_path / 'weeks'))
+    extract_output(HEADER + '12/4/2016,b,23:00,,x,y,z\n' + BLANK, week_cache)
+    assert not week_cache.entries
+
+
+def test_least_recently_used_week_is_evicted(tmp_path):
+    week_cache = WeekCache(str(tmp_path / 'weeks'), max_weeks=2)
+    for key in (b'a', b'b', b'c'):
+        week_cache.put(key, None)
+    week_cache.get(b'b')
+    week_cache.put(b'd', None)
+    assert list(week_cache.entries) == [b'b', b'd']
+
+
+def test_cache_from_other_version_is_ignored(tmp_path):
+    path = tmp_path / 'weeks'
+    path.write_bytes(CACHE_MAGIC + (999).to_bytes(2, 'little') + b'junk')
+    assert not WeekCache.load(str(path)).entries
+
+
+@pytest.mark.parametrize('body', [
+    b'',
+    b'not zlib at all',
+    zlib.compress(b'[["00ff", [1, [[], []]]]'),
+    zlib.compress(b'[["00ff", [736302, [[["b", "23:00"]]] * 7]]]'),
+    zlib.compress(b'[["zz", null]]'),
+    zlib.compress(b'{"00ff": null}'),
+    zlib.compress(b'[["00ff", [-5, []]]]'),
+    zlib.compress(b'\xff\xfe'),
+])
+def test_corrupt_cache_is_ignored(tmp_path, body):
+    path = tmp_path / 'weeks'
+    path.write_bytes(CACHE_HEADER + body)
+    assert not WeekCache.load(str(path)).entries
+
+
+def test_cache_file_holds_no_pickle(tmp_path):
+    path = str(tmp_path / 'sheet.csv.weeks')
+    week_cache = WeekCache.load(path)
+    extract_output(SHEET, week_cache)
+    week_cache.save()
+    with open(path, 'rb') as infile:
+        assert infile.read(len(CACHE_HEADER)) == CACHE_HEADER
+        json.loads(zlib.decompress(infile.read()).decode('utf-8'))
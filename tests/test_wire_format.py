@@ -0,0 +1,122 @@
+# file: tests/test_wire_format.py
+# 2026-10-19
+
+import logging
+import logging.handlers
+import pickle
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+from src.logging.wire_format import CompactSocketHandler, FRAME_LENGTH
+from src.logging.wire_format import decode_record, encode_record
+from src.logging.wire_format import make_socket_handler
+
+
+def make_record(msg='night %s stored', args=('2016-12-04',), exc_info=None):
+    return logging.LogRecord('load.load', logging.WARNING, '/src/load/load.py',
+                             42, msg, args, exc_info, func='store_night')
+
+
+@pytest.fixture
+def receiver_module(monkeypatch):
+    monkeypatch.syspath_prepend('src/logging')
+    monkeypatch.delitem(sys.modules, 'receiver', raising=False)
+    import receiver
+    return receiver
+
+
+def test_decoded_record_matches_the_one_sent():
+    sent = make_record()
+    received = decode_record(encode_record(sent))
+    assert received.getMessage() == 'night 2016-12-04 stored'
+    for attr in ('name', 'levelno', 'levelname', 'lineno', 'pathname',
+                 'filename', 'module', 'funcName', 'process', 'thread',
+                 'created', 'msecs', 'relativeCreated'):
+        assert getattr(received, attr) == getattr(sent, attr)
+    assert logging.Formatter('%(asctime)s %(levelname)s %(message)s').format(
+        received) == logging.Formatter(
+        '%(asctime)s %(levelname)s %(message)s').format(sent)
+
+
+def test_compact_record_is_smaller_than_pickled_one():
+    record = make_record()
+    pickled = logging.handlers.SocketHandler('localhost', 0).makePickle(record)
+    compact = CompactSocketHandler('localhost', 0).makePickle(record)
+    assert len(compact) < len(pickled) / 2
+    assert FRAME_LENGTH.unpack(compact[:4])[0] == len(compact) - 4
+
+
+def test_compact_handler_sends_exception_text():
+    try:
+        raise KeyError('night')
+    except KeyError:
+        record = make_record(exc_info=sys.exc_info())
+    data = CompactSocketHandler('localhost', 0).makePickle(record)
+    assert decode_record(data[4:]).exc_text.endswith("KeyError: 'night'")
+
+
+def test_decode_record_rejects_pickle():
+    pickled = pickle.dumps(make_record().__dict__, 1)
+    with pytest.raises(ValueError):
+        decode_record(pickled)
+    with pytest.raises(ValueError):
+        decode_record(encode_record(make_record()).rsplit(b'\0', 1)[0])
+
+
+def test_make_socket_handler_follows_env(monkeypatch):
+    monkeypatch.delenv('ETL_LOG_WIRE_FORMAT', raising=False)
+    assert type(make_socket_handler()) is logging.handlers.SocketHandler
+    monkeypatch.setenv('ETL_LOG_WIRE_FORMAT', 'compact')
+    assert type(make_socket_handler()) is CompactSocketHandler
+    monkeypatch.setenv('ETL_LOG_WIRE_FORMAT', 'json')
+    with pytest.raises(ValueError):
+        make_socket_handler()
+
+
+def test_compact_receiver_logs_records_sent(receiver_module):
+    server = receiver_module.LogRecordSocketReceiver(
+            port=0, handler=receiver_module.CompactLogRecordStreamHandler)
+    server.logname = 'test_wire_format'
+    received = []
+    catcher = logging.Handler()
+    catcher.emit = received.append
+    logging.getLogger('test_wire_format').addHandler(catcher)
+    thread = threading.Thread(target=server.serve_until_stopped)
+    thread.start()
+    try:
+        sender = CompactSocketHandler('localhost', server.server_address[1])
+        sender.handle(make_record())
+        sender.close()
+        for _ in range(50):
+            if received:
+                break
+            time.sleep(0.1)
+    finally:
+        server.abort = 1
+        thread.join()
+        server.server_close()
+        logging.getLogger('test_wire_format').removeHandler(catcher)
+    assert [record.getMessage() for record in received] == [
+        'night 2016-12-04 stored']
+
+
+@pytest.mark.parametrize('handler_name, sender_class', [
+    ('LogRecordStreamHandler', CompactSocketHandler),
+    ('CompactLogRecordStreamHandler', logging.handlers.SocketHandler)])
+def test_receiver_closes_connection_from_sender_in_other_format(
+        receiver_module, caplog, handler_name, sender_class):
+    handler_class = getattr(receiver_module, handler_name)
+    handler = handler_class.__new__(handler_class)  # not yet handling
+    handler.connection, sender = socket.socketpair()
+    sender.sendall(sender_class('localhost', 0).makePickle(make_record()))
+    sender.close()
+    try:
+        with caplog.at_level(logging.ERROR):
+            handler.handle()
+    finally:
+        handler.connection.close()
+    assert 'closing connection' in caplog.text
@@ -2,6 +2,21 @@ import sys
 import os
 import pytest
 from src.load.load import decimal_to_interval, setup_load_logger, main, connect
+from src.load.load import read_nights, batch_nights, BatchWriter, store_night
+from src.load.load import partition_nights, count_partition
+from src.load.load import read_nights_naps_partitioned, load_partition
+from src.load.load import night_fingerprint, diff_nights, summarise_night
+from src.load.load import night_sleep_periods, store_batch, merge_nights
+from src.load.load import CheckpointedStore, LoadStats, row_outcome
+from src.load.load import delete_nights, update_night
+from src.load.load import with_year_partitions, create_year_partitions
+from src.load.load import import_sqlalchemy
+
+
+@pytest.fixture(autouse=True)
+def sqlalchemy_names():
+    """The db functions need the names connect() would have bound"""
+    import_sqlalchemy()
 
 
 def test_decimal_to_interval():
@@ -31,3 +46,375 @@ def test_connect_exits_if_no_DB_URL_env_var(mocker):
     os.environ = {}
     connect()
     sys.exit.assert_called_once_with(1)
+
+
+def test_read_nights_groups_naps_with_their_night():
+    lines = ['NIGHT, 2016-12-04, 23:45, false, false\n',
+             'NAP, 23:45, 04.00\n',
+             'NAP, 04:45, 01.50\n',
+             'NIGHT, 2016-12-05, 23:15, false, false\n',
+             'NAP, 23:15, 02.75\n']
+    assert list(read_nights(lines)) == [lines[:3], lines[3:]]
+
+
+def test_read_nights_stops_at_unrecognized_line():
+    lines = ['NIGHT, 2016-12-04, 23:45, false, false\n',
+             '\n',
+             'NIGHT, 2016-12-05, 23:15, false, false\n']
+    assert list(read_nights(lines)) == [lines[:1]]
+
+
+def test_batch_nights_keeps_last_short_batch():
+    nights = [['NIGHT'] for _ in range(5)]
+    batches = list(batch_nights(nights, batch_size=2))
+    assert [len(b) for b in batches] == [2, 2, 1]
+
+
+def test_batch_writer_stores_batches_in_order():
+    stored = []
+    writer = BatchWriter('cnxn', max_in_flight=1,
+                         store_fn=lambda cnxn, batch: stored.append(batch))
+    writer.start()
+    for ix in range(10):
+        writer.put([ix])
+    writer.finish()
+    assert stored == [[ix] for ix in range(10)]
+
+
+def test_batch_writer_reraises_store_error_in_reading_thread():
+    def fail(cnxn, batch):
+        raise ValueError('bad batch')
+
+    writer = BatchWriter('cnxn', store_fn=fail)
+    writer.start()
+    writer.put([0])
+    with pytest.raises(ValueError):
+        writer.finish()
+
+
+def test_store_night_passes_returned_night_id_to_its_naps(mocker):
+    connection = mocker.Mock()
+    connection.execute.side_effect = [
+        [{'night_id_out': 42, 'mesg': 'sl_insert_night() succeeded'}],
+        [('sl_insert_nap() succeeded',)],
+        None,  # the sl_night_summary upsert
+    ]
+    sl_insert_nap = mocker.patch('sqlalchemy.func.sl_insert_nap')
+    store_night(connection, ['NIGHT, 2016-12-04, 23:45, false, false\n',
+                             'NAP, 23:45, 04.00\n'])
+    sl_insert_nap.assert_called_once_with(
+        '23:45', '04:00', 42, '[2016-12-04 23:45, 2016-12-05 03:45)',
+        '2016-12-04')
+
+
+def test_store_night_counts_row_outcomes(mocker):
+    stats = mocker.patch('src.load.load.load_stats', LoadStats())
+    connection = mocker.Mock()
+    connection.execute.side_effect = [
+        [{'night_id_out': 42, 'mesg': 'sl_insert_night() succeeded'}],
+        [('sl_insert_nap() failed: row already in table',)],
+        None,  # the sl_night_summary upsert
+    ]
+    mocker.patch('sqlalchemy.func.sl_insert_nap')
+    store_night(connection, ['NIGHT, 2016-12-04, 23:45, false, false\n',
+                             'NAP, 23:45, 04.00\n'])
+    assert stats.summary() == ('nights: 1 succeeded; '
+                               'naps: 1 already present')
+
+
+def test_store_night_skips_naps_with_no_night(mocker):
+    connection = mocker.Mock()
+    store_night(connection, ['NAP, 23:45, 04.00\n'])
+    connection.execute.assert_not_called()
+
+
+def test_partition_nights_groups_nights_by_month():
+    nights = [['NAP, 23:45, 04.00\n'],
+              ['NIGHT, 2016-11-30, 23:45, false, false\n'],
+              ['NIGHT, 2016-12-01, 23:15, false, false\n',
+               'NAP, 23:15, 02.75\n'],
+              ['NIGHT, 2016-12-31, 23:00, false, false\n'],
+              ['NIGHT, 2017-01-01, 22:45, false, false\n']]
+    partitions = list(partition_nights(nights))
+    assert partitions == [nights[:1], nights[1:2], nights[2:4], nights[4:]]
+
+
+def test_count_partition_counts_only_inserted_rows():
+    stats = LoadStats()
+    stats.record('nights', 'sl_insert_night() succeeded', '')
+    stats.record('nights', 'sl_insert_night() failed: row already in table',
+                 '')
+    stats.record('naps', 'sl_insert_nap() succeeded', '')
+    stats.record('naps', 'error inserting nap into db: SQLSTATE 23514', '')
+    nights = [['NAP, 23:45, 04.00\n'],
+              ['NIGHT, 2016-12-01, 23:15, false, false\n',
+               'NAP, 23:15, 02.75\n', 'NAP, 4:00, 01.50\n'],
+              ['NIGHT, 2016-12-02, 23:00, false, false\n']]
+    assert count_partition(nights, stats) == \
+        ('2016-12-01', '2016-12-02', 1, 1)
+
+
+def test_load_partition_does_not_expect_rows_of_failed_night(mocker):
+    stats = mocker.patch('src.load.load.load_stats', LoadStats())
+    mocker.patch('src.load.load.ld_logger')
+    connection = mocker.MagicMock()
+    eng = mocker.Mock()
+    eng.connect.return_value.__enter__ = mocker.Mock(return_value=connection)
+    eng.connect.return_value.__exit__ = mocker.Mock(return_value=False)
+    connection.execute.side_effect = [
+        [{'night_id_out': 42, 'mesg': 'sl_insert_night() succeeded'}],
+        [('sl_insert_nap() succeeded',)],
+        None,  # the sl_night_summary upsert
+        [{'night_id_out': None,
+          'mesg': 'error inserting night into db: SQLSTATE 23514'}],
+    ]
+    mocker.patch('sqlalchemy.func.sl_insert_nap')
+    nights = [['NIGHT, 2016-12-01, 23:15, false, false\n',
+               'NAP, 23:15, 02.75\n'],
+              ['NIGHT, 2016-12-02, 23:00, false, false\n',
+               'NAP, 23:00, 03.00\n']]
+    assert load_partition(eng, nights) == ('2016-12-01', '2016-12-02', 1, 1)
+    assert stats.summary() == ('nights: 1 error SQLSTATE 23514, '
+                               '1 succeeded; naps: 1 succeeded')
+
+
+def test_read_nights_naps_partitioned_loads_each_month(mocker, tmpdir):
+    infile = tmpdir.join('transformed.txt')
+    infile.write('NIGHT, 2016-11-30, 23:45, false, false\n'
+                 'NAP, 23:45, 04.00\n'
+                 'NIGHT, 2016-12-01, 23:15, false, false\n')
+    stats = LoadStats()
+    stats.record('nights', 'sl_insert_night() succeeded', '')
+    load_partition = mocker.patch('src.load.load.load_partition',
+                                  side_effect=lambda eng, nights, subject_id:
+                                  count_partition(nights, stats))
+    check = mocker.patch('src.load.load.check_partition_counts')
+    create = mocker.patch('src.load.load.create_year_partitions')
+    read_nights_naps_partitioned(mocker.MagicMock(), str(infile), 2)
+    create.assert_called_once_with(mocker.ANY, {2016})
+    assert load_partition.call_count == 2
+    assert sorted(check.call_args[0][1]) == [
+        ('2016-11-30', '2016-11-30', 1, 0),
+        ('2016-12-01', '2016-12-01', 1, 0)]
+
+
+def test_night_fingerprint_ignores_line_endings():
+    night = ['NIGHT, 2016-12-04, 23:45, false, false\n', 'NAP, 23:45, 04.00\n']
+    assert night_fingerprint(night) == night_fingerprint(
+        [line.rstrip() for line in night])
+
+
+def test_night_fingerprint_changes_with_naps():
+    night = ['NIGHT, 2016-12-04, 23:45, false, false\n', 'NAP, 23:45, 04.00\n']
+    assert night_fingerprint(night) != night_fingerprint(night[:1])
+
+
+def test_diff_nights_sorts_nights_into_insert_update_delete():
+    same = ['NIGHT, 2016-12-04, 23:45, false, false\n']
+    changed = ['NIGHT, 2016-12-05, 23:15, false, false\n',
+               'NAP, 23:15, 07.50\n']
+    new = ['NIGHT, 2016-12-06, 23:00, false, false\n']
+    in_input = {('2016-12-04', '23:45'): same,
+                ('2016-12-05', '23:15'): changed,
+                ('2016-12-06', '23:00'): new}
+    in_db = {('2016-12-04', '23:45'): (1, night_fingerprint(same)),
+             ('2016-12-05', '23:15'): (2, 'stale'),
+             ('2016-12-05', '04:00'): (3, 'gone')}
+    assert diff_nights(in_input, in_db) == ([new], [(2, changed)],
+                                            [(3, '2016-12-05')])
+
+
+def test_summarise_night():
+    night = ['NIGHT, 2016-12-04, 23:45, false, false\n',
+             'NAP, 23:45, 04.00\n',
+             'NAP, 04:45, 01.50\n',
+             'NAP, 11:30, 00.75\n']
+    assert summarise_night(night) == {'start_date': '2016-12-04',
+                                      'start_time': '23:45',
+                                      'total_sleep': '6:15',
+                                      'first_sleep_start': '23:45',
+                                      'first_sleep_duration': '4:00',
+                                      'nap_count': 3}
+
+
+def test_summarise_night_with_no_naps():
+    summary = summarise_night(['NIGHT, 2016-12-04, 23:45, true, false\n'])
+    assert summary['total_sleep'] == '0:00'
+    assert summary['first_sleep_start'] is None
+    assert summary['nap_count'] == 0
+
+
+def test_night_sleep_periods_places_naps_on_the_calendar():
+    night = ['NIGHT, 2016-12-07, 23:45, false, false\n',
+             'NAP, 23:45, 04.00\n',
+             'NAP, 04:45, 01.50\n']
+    assert night_sleep_periods(night) == [
+        None,
+        '[2016-12-07 23:45, 2016-12-08 03:45)',
+        '[2016-12-08 04:45, 2016-12-08 06:15)']
+
+
+def test_night_sleep_periods_of_naps_with_no_night_are_unknown():
+    assert night_sleep_periods(['NAP, 23:45, 04.00\n']) == [None]
+
+
+def test_with_year_partitions_adds_each_year_before_its_first_batch(mocker):
+    create = mocker.patch('src.load.load.create_year_partitions')
+    batches = [[['NAP, 23:45, 04.00\n'],
+                ['NIGHT, 2016-12-30, 23:15, false, false\n']],
+               [['NIGHT, 2016-12-31, 23:00, false, false\n']],
+               [['NIGHT, 2017-01-01, 22:45, false, false\n']]]
+    created = []
+    for batch in with_year_partitions(mocker.MagicMock(), batches):
+        created.append([call[0][1] for call in create.call_args_list])
+    assert created == [[{2016}], [{2016}], [{2016}, {2017}]]
+
+
+def test_create_year_partitions_commits_before_any_night_is_stored(mocker):
+    connection = mocker.MagicMock()
+    create = mocker.patch('sqlalchemy.func.sl_create_year_partitions')
+    create_year_partitions(connection, {2017, 2016})
+    assert create.call_args_list == [mocker.call(2016), mocker.call(2017)]
+    connection.begin.assert_called_once_with()
+
+
+def test_store_batch_stores_each_night(mocker):
+    store_night = mocker.patch('src.load.load.store_night')
+    batch = [['NAP, 23:45, 04.00\n'],
+             ['NIGHT, 2016-12-30, 23:15, false, false\n']]
+    store_batch(mocker.Mock(), batch, 3)
+    assert store_night.call_args_list == [
+        mocker.call(mocker.ANY, night, 3, None) for night in batch]
+
+
+def test_merge_nights_without_delete_keeps_nights_not_in_input(mocker):
+    mocker.patch('src.load.load.fetch_fingerprints',
+                 return_value={('2016-12-04', '23:45'): (7, 'old'),
+                               ('2016-12-05', '23:15'): (8, 'old')})
+    delete_nights = mocker.patch('src.load.load.delete_nights')
+    update_night = mocker.patch('src.load.load.update_night')
+    mocker.patch('src.load.load.store_batch')
+    night = ['NIGHT, 2016-12-04, 23:45, false, false\n', 'NAP, 23:45, 04.00\n']
+    assert merge_nights(mocker.MagicMock(), [night], delete=False) == (0, 1, 0)
+    delete_nights.assert_called_once_with(mocker.ANY, [])
+    update_night.assert_called_once_with(mocker.ANY, 7, night, 1)
+
+
+def test_checkpointed_store_saves_last_night_of_each_batch(mocker):
+    mocker.patch('src.load.load.store_batch')
+    save = mocker.patch('src.load.load.save_checkpoint')
+    store = CheckpointedStore('sheet.txt')
+    store(mocker.MagicMock(), [['NIGHT, 2016-12-04, 23:45, false, false\n'],
+                               ['NIGHT, 2016-12-05, 23:15, false, false\n']])
+    store(mocker.MagicMock(), [['NIGHT, 2016-12-06, 23:00, false, false\n']])
+    assert save.call_args_list == [
+        mocker.call(mocker.ANY, 'sheet.txt', '2016-12-05', 2),
+        mocker.call(mocker.ANY, 'sheet.txt', '2016-12-06', 3)]
+
+
+def test_skip_to_checkpoint_skips_committed_nights(mocker):
+    mocker.patch('src.load.load.fetch_checkpoint',
+                 return_value={'last_date': '2016-12-05', 'nights_done': 2})
+    nights = iter([['NIGHT, 2016-12-04, 23:45, false, false\n'],
+                   ['NIGHT, 2016-12-05, 23:15, false, false\n'],
+                   ['NIGHT, 2016-12-06, 23:00, false, false\n']])
+    store = CheckpointedStore('sheet.txt')
+    store.skip_to_checkpoint('cnxn', nights)
+    assert store.nights_done == 2
+    assert next(nights)[0].startswith('NIGHT, 2016-12-06')
+
+
+def test_skip_to_checkpoint_raises_if_input_does_not_match(mocker):
+    mocker.patch('src.load.load.fetch_checkpoint',
+                 return_value={'last_date': '2016-12-05', 'nights_done': 2})
+    nights = iter([['NIGHT, 2016-12-04, 23:45, false, false\n'],
+                   ['NIGHT, 2016-12-07, 23:15, false, false\n']])
+    with pytest.raises(RuntimeError):
+        CheckpointedStore('sheet.txt').skip_to_checkpoint('cnxn', nights)
+
+
+def test_row_outcome():
+    assert row_outcome('sl_insert_night() succeeded') == 'succeeded'
+    assert row_outcome('sl_insert_nap() failed: row already in table') == \
+        'already present'
+    assert row_outcome('error inserting nap into db: SQLSTATE 23503') == \
+        'error SQLSTATE 23503'
+    assert row_outcome('error inserting nap into db') == \
+        'error SQLSTATE unknown'
+
+
+def test_load_stats_samples_rows_but_logs_every_error(mocker):
+    ld_logger = mocker.patch('src.load.load.ld_logger')
+    stats = LoadStats(sample_every=10)
+    for _ in range(25):
+        stats.record('naps', 'sl_insert_nap() succeeded', 'NAP, 23:45, 04.00')
+    for _ in range(2):
+        stats.record('naps', 'error inserting nap into db: SQLSTATE 23503',
+                     'NAP, 23:45, 04.00')
+    assert ld_logger.debug.call_count == 3  # rows 1, 11, and 21
+    assert ld_logger.error.call_count == 2
+    assert stats.summary() == 'naps: 2 error SQLSTATE 23503, 25 succeeded'
+
+
+def test_merge_nights_compares_only_the_subjects_nights(mocker):
+    fetch = mocker.patch('src.load.load.fetch_fingerprints', return_value={})
+    store_batch = mocker.patch('src.load.load.store_batch')
+    night = ['NIGHT, 2016-12-04, 23:45, false, false\n']
+    assert merge_nights(mocker.MagicMock(), [night], subject_id=3) == \
+        (1, 0, 0)
+    fetch.assert_called_once_with(mocker.ANY, '2016-12-04', '2016-12-04', 3)
+    store_batch.assert_called_once_with(mocker.ANY, [night], 3)
+
+
+def test_store_night_passes_subject_to_sl_insert_night(mocker):
+    connection = mocker.Mock()
+    connection.execute.side_effect = [
+        [{'night_id_out': 42, 'mesg': 'sl_insert_night() succeeded'}],
+        None,  # the sl_night_summary upsert
+    ]
+    sl_insert_night = mocker.patch('sqlalchemy.func.sl_insert_night')
+    store_night(connection, ['NIGHT, 2016-12-04, 23:45, false, false\n'], 3)
+    assert sl_insert_night.call_args[0][-1] == 3
+    assert connection.execute.call_args[1]['subject_id'] == 3
+
+
+def test_checkpoint_source_names_the_subject():
+    assert CheckpointedStore('-').source == '-'
+    assert CheckpointedStore('-', subject_id=3).source == '3:-'
+
+
+def test_delete_nights_names_each_nights_start_date(mocker):
+    connection = mocker.Mock()
+    delete_nights(connection, [(3, '2016-12-05'), (9, '2017-01-02')])
+    assert connection.execute.call_count == 3
+    for call in connection.execute.call_args_list:
+        stmnt, params = call[0]
+        assert 'AND' in str(stmnt) and 'start_date = :start_date' in \
+            str(stmnt)
+        assert params == [{'night_id': 3, 'start_date': '2016-12-05'},
+                          {'night_id': 9, 'start_date': '2017-01-02'}]
+
+
+def test_update_night_names_the_nights_start_date(mocker):
+    connection = mocker.Mock()
+    mocker.patch('src.load.load.store_nights_naps')
+    mocker.patch('src.load.load.store_night_summary')
+    update_night(connection, 7,
+                 ['NIGHT, 2016-12-04, 23:45, false, false\n',
+                  'NAP, 23:45, 04.00\n'])
+    for call in connection.execute.call_args_list:
+        assert 'start_date = :start_date' in str(call[0][0])
+        assert call[1]['start_date'] == '2016-12-04'
+
+
+def test_merge_nights_adds_partitions_before_storing_new_nights(mocker):
+    mocker.patch('src.load.load.fetch_fingerprints', return_value={})
+    calls = mocker.Mock()
+    mocker.patch('src.load.load.create_year_partitions',
+                 calls.create_year_partitions)
+    mocker.patch('src.load.load.store_batch', calls.store_batch)
+    night = ['NIGHT, 2017-01-01, 22:45, false, false\n']
+    merge_nights(mocker.MagicMock(), [night])
+    assert [call[0] for call in calls.mock_calls] == ['create_year_partitions',
+                                                      'store_batch']
+    assert calls.create_year_partitions.call_args[0][1] == {2017}
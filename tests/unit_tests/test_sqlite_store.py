@@ -0,0 +1,113 @@
+import pytest
+
+from src.load.load import LoadStats, is_sqlite_url
+from src.load.sqlite_store import (connect_sqlite, load_sqlite, sqlite_path,
+                                   SqliteStore)
+
+
+NIGHTS = ['NIGHT, 2016-12-07, 23:45, false, true\n',
+          'NAP, 23:45, 04.00\n',
+          'NAP, 4:45, 01.50\n',
+          'NIGHT, 2016-12-08, 23:15, false, false\n',
+          'NAP, 23:15, 02.75\n']
+
+
+@pytest.fixture
+def db_url(tmpdir):
+    return 'sqlite:///' + str(tmpdir.join('sleep.db'))
+
+
+@pytest.fixture
+def infile(tmpdir):
+    path = tmpdir.join('transform_out.txt')
+    path.write(''.join(NIGHTS))
+    return str(path)
+
+
+def test_sqlite_path():
+    assert sqlite_path('sqlite:///sleep.db') == 'sleep.db'
+    assert sqlite_path('sqlite:////tmp/sleep.db') == '/tmp/sleep.db'
+    assert sqlite_path('sqlite://') == ':memory:'
+    with pytest.raises(ValueError):
+        sqlite_path('postgresql://localhost/sleep')
+
+
+def test_connect_sqlite_uses_wal(db_url):
+    connection = connect_sqlite(db_url)
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    connection.close()
+
+
+def test_load_sqlite_stores_nights_naps_and_summaries(db_url, infile):
+    stats = LoadStats()
+    load_sqlite(db_url, infile, stats=stats)
+    connection = connect_sqlite(db_url)
+    assert connection.execute(
+        'SELECT night_id, start_date, start_time, start_no_data, '
+        'end_no_data, subject_id FROM sl_night ORDER BY night_id'
+    ).fetchall() == [(1, '2016-12-07', '23:45', 0, 1, 1),
+                     (2, '2016-12-08', '23:15', 0, 0, 1)]
+    assert connection.execute(
+        'SELECT night_id, start_time, duration, sleep_start, sleep_end '
+        'FROM sl_nap ORDER BY nap_id').fetchall() == [
+        (1, '23:45', 240, '2016-12-07 23:45', '2016-12-08 03:45'),
+        (1, '04:45', 90, '2016-12-08 04:45', '2016-12-08 06:15'),
+        (2, '23:15', 165, '2016-12-08 23:15', '2016-12-09 02:00')]
+    assert connection.execute(
+        'SELECT night_id, total_sleep, first_sleep_start, nap_count '
+        'FROM sl_night_summary ORDER BY night_id').fetchall() == [
+        (1, 330, '23:45', 2), (2, 165, '23:15', 1)]
+    assert stats.summary() == 'nights: 2 succeeded; naps: 3 succeeded'
+
+
+def test_load_sqlite_twice_stores_each_row_once(db_url, infile):
+    load_sqlite(db_url, infile)
+    stats = LoadStats()
+    load_sqlite(db_url, infile, stats=stats)
+    connection = connect_sqlite(db_url)
+    assert connection.execute('SELECT count(*) FROM sl_night').fetchone() == \
+        (2,)
+    assert connection.execute('SELECT count(*) FROM sl_nap').fetchone() == \
+        (3,)
+    assert stats.summary() == \
+        'nights: 2 already present; naps: 3 already present'
+
+
+def test_load_sqlite_keeps_subjects_apart(db_url, infile):
+    load_sqlite(db_url, infile)
+    load_sqlite(db_url, infile, subject='ann')
+    connection = connect_sqlite(db_url)
+    assert connection.execute(
+        'SELECT sl_subject.name, count(*) FROM sl_night '
+        'JOIN sl_subject USING (subject_id) GROUP BY sl_subject.name '
+        'ORDER BY sl_subject.name').fetchall() == [('ann', 2), ('default', 2)]
+    assert connection.execute(
+        'SELECT min(night_id) FROM sl_night WHERE subject_id = 2'
+    ).fetchone() == (3,)
+
+
+def test_load_sqlite_rolls_back_on_error(db_url, tmpdir):
+    path = tmpdir.join('bad.txt')
+    path.write(''.join(NIGHTS) + 'NIGHT, 2016-12-09, 23:00, false, false\n'
+                                 'NAP, 23:00, 01.10\n')
+    with pytest.raises(KeyError):
+        load_sqlite(db_url, str(path))
+    connection = connect_sqlite(db_url)
+    assert connection.execute('SELECT count(*) FROM sl_night').fetchone() == \
+        (0,)
+
+
+def test_sqlite_store_counts_night_with_no_data_at_both_ends_as_error(db_url):
+    connection = connect_sqlite(db_url)
+    stats = LoadStats()
+    SqliteStore(connection, stats=stats)(
+        [['NIGHT, 2016-12-07, 23:45, true, true\n', 'NAP, 23:45, 04.00\n'],
+         ['NAP, 01:00, 01.00\n']])
+    assert connection.execute('SELECT count(*) FROM sl_nap').fetchone() == \
+        (0,)
+    assert stats.summary() == 'nights: 1 error SQLSTATE 23514'
+
+
+def test_is_sqlite_url():
+    assert is_sqlite_url('sqlite:///sleep.db')
+    assert not is_sqlite_url('postgresql://sp_etl@localhost:5432/sleep')